@@ -0,0 +1,327 @@
+"""bench_abuse measures the clients that log on and send requests at a steady rate while other clients abuse the server.
+
+Run from the repository root: `python -m benchmarks.bench_abuse [--clients 8] [--rate 100] [--duration 5]`.
+Three runs are made, each with a new server: 'baseline' without abuse, 'unlimited' with abuse against a server
+without limits, and 'limited' with abuse against a server started with --limits. The abusers flood requests on
+logged on connections, guess passwords, open and close connections and hold connections without logging on,
+each kind from its own loopback address (127.0.0.2 and on, so Linux is needed) and in its own processes so they
+are not slowed by the steady clients, which connect from 127.0.0.1. The throughput and latency of the steady
+clients are reported for each run, so it can be seen whether the limits keep them served, along with what the
+abusers got.
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import socket as sock
+import sys
+import threading
+import time
+
+import client
+from data import data
+from framing import negotiate_framing
+from benchmarks.bench_server import DEFAULT_MIX, PASSWORD, parse_mix, request_data, start_server, free_port, summarize
+
+# Limits of the server of the 'limited' run, the steady clients stay below them and the flooders do not.
+DEFAULT_LIMITS = '--client-rate 200 --address-rate 1000 --idle-timeout 2 --login-backoff 60'
+RUNS = ('baseline', 'unlimited', 'limited')
+# Loopback address of the steady clients and of each kind of abuser.
+CLIENT_ADDRESS = '127.0.0.1'
+ABUSER_ADDRESSES = {'flood': '127.0.0.2', 'guess': '127.0.0.3', 'churn': '127.0.0.4', 'idle': '127.0.0.5'}
+# Requests a flooder sends before reading their responses.
+FLOOD_WINDOW = 64
+# Counts each kind of abuser reports.
+ABUSE_COUNTS = {'flood': ('answered', 'limited', 'disconnected'),
+                'guess': ('checked', 'backoff', 'limited', 'disconnected'),
+                'churn': ('welcomed', 'refused'),
+                'idle': ('held', 'evicted', 'refused')}
+CONNECT_TIMEOUT = 5
+# Kind of the responses of a guesser, by their error code, the others are INVALIDPASS.
+GUESS_RESPONSES = {b'756': 'backoff', b'749': 'limited'}
+
+
+def connect(address: tuple, source: str) -> sock.socket:
+    """connect connects to the server from a loopback address and receives the welcome message.
+
+    Args:
+        address (tuple): (host, port) of the server.
+        source (str): the loopback address to connect from.
+
+    Raises:
+        ConnectionError: error is raised whenever the server closes the connection before welcoming it.
+
+    Returns:
+        sock.socket: the connected socket.
+    """
+    server_sock = sock.create_connection(address, timeout=CONNECT_TIMEOUT, source_address=(source, 0))
+    if not server_sock.recv(client.RECV_LARGE):  # Welcome message.
+        server_sock.close()
+        raise ConnectionError('The server has refused the connection.')
+    return server_sock
+
+
+def run_steady(address: tuple, weights: dict, db: data, rate: float, end_time: float, seed: int, results: list, errors: list) -> None:
+    """run_steady logs on and sends requests from the mix at a steady rate until end_time.
+
+    Each request is sent at its scheduled time, or right after the previous response if that came later,
+    and is timed from its scheduled time so a slow server shows in the latency as well as in the throughput.
+
+    Args:
+        address (tuple): (host, port) of the server.
+        weights (dict): weight of each code.
+        db (data): the catalogue the request data is picked from.
+        rate (float): requests per second.
+        end_time (float): time.perf_counter() value to stop at.
+        seed (int): seed of the client's random generator.
+        results (list): the client adds the list of latencies (seconds) of each code to it.
+        errors (list): the client adds a message to it if it fails.
+    """
+    rnd = random.Random(seed)
+    codes, code_weights = list(weights), list(weights.values())
+    try:
+        with connect(address, CLIENT_ADDRESS) as server_sock:
+            conn = negotiate_framing(server_sock)
+            conn.sendall(PASSWORD)
+            response = conn.recv(client.RECV_LARGE).decode()
+            if client.ERROR_PTRN.search(response) is not None:
+                raise ConnectionError(f'Login failed: {response}')
+
+            client_latencies = {code: [] for code in codes}
+            scheduled = time.perf_counter()
+            while scheduled < end_time:
+                time.sleep(max(scheduled - time.perf_counter(), 0))
+                code = rnd.choices(codes, code_weights)[0]
+                response = client.query(conn, code, request_data(code, db, rnd))
+                if response.startswith(('749', '735', '742')):
+                    raise ConnectionError(f'Request was refused: {response}')
+                client_latencies[code].append(time.perf_counter() - scheduled)
+                scheduled += 1 / rate
+        results.append(client_latencies)
+    except (OSError, ConnectionError) as err:
+        errors.append(str(err))
+
+
+def flood(address: tuple, db: data, end_time: float, seed: int, counts: dict) -> None:
+    """flood logs on and sends requests as fast as the server reads them, FLOOD_WINDOW at a time, until end_time.
+
+    Args:
+        address (tuple): (host, port) of the server.
+        db (data): the catalogue the request data is picked from.
+        end_time (float): time.perf_counter() value to stop at.
+        seed (int): seed of the random generator.
+        counts (dict): counts of the responses, by 'answered' and 'limited'.
+    """
+    rnd = random.Random(seed)
+    weights = parse_mix(DEFAULT_MIX)
+    codes, code_weights = list(weights), list(weights.values())
+    try:
+        with connect(address, ABUSER_ADDRESSES['flood']) as server_sock:
+            conn = negotiate_framing(server_sock)
+            conn.sendall(PASSWORD)
+            conn.recv()
+            while time.perf_counter() < end_time:
+                for code in rnd.choices(codes, code_weights, k=FLOOD_WINDOW):
+                    conn.sendall(client.ASIB_COMMANDS[code].format(request_data(code, db, rnd, True)).encode())
+                for _ in range(FLOOD_WINDOW):
+                    counts['limited' if conn.recv().startswith(b'749') else 'answered'] += 1
+    except (OSError, ConnectionError):
+        counts['disconnected'] += 1
+
+
+def guess(address: tuple, end_time: float, counts: dict) -> None:
+    """guess sends wrong passwords as fast as the server answers them until end_time, connecting again when disconnected.
+
+    Args:
+        address (tuple): (host, port) of the server.
+        end_time (float): time.perf_counter() value to stop at.
+        counts (dict): counts of the responses, by 'checked' (INVALIDPASS), 'backoff' and 'limited'.
+    """
+    while time.perf_counter() < end_time:
+        try:
+            with connect(address, ABUSER_ADDRESSES['guess']) as server_sock:
+                while time.perf_counter() < end_time:
+                    server_sock.sendall(b'guess%d' % counts['checked'])
+                    response = server_sock.recv(client.RECV_LARGE)
+                    if not response:
+                        break
+                    counts[GUESS_RESPONSES.get(response[:3], 'checked')] += 1
+        except (OSError, ConnectionError):
+            counts['disconnected'] += 1
+
+
+def churn(address: tuple, end_time: float, counts: dict) -> None:
+    """churn opens and closes connections as fast as it can until end_time.
+
+    Args:
+        address (tuple): (host, port) of the server.
+        end_time (float): time.perf_counter() value to stop at.
+        counts (dict): counts of the connections, by 'welcomed' and 'refused'.
+    """
+    while time.perf_counter() < end_time:
+        try:
+            connect(address, ABUSER_ADDRESSES['churn']).close()
+            counts['welcomed'] += 1
+        except (OSError, ConnectionError):
+            counts['refused'] += 1
+
+
+def hold_idle(address: tuple, count: int, end_time: float, counts: dict) -> None:
+    """hold_idle opens connections that never log on, and counts the ones the server has closed by end_time.
+
+    Args:
+        address (tuple): (host, port) of the server.
+        count (int): amount of connections.
+        end_time (float): time.perf_counter() value to stop at.
+        counts (dict): counts of the connections, by 'held', 'evicted' and 'refused'.
+    """
+    idle_socks = []
+    for _ in range(count):
+        try:
+            idle_socks.append(connect(address, ABUSER_ADDRESSES['idle']))
+        except (OSError, ConnectionError):
+            counts['refused'] += 1
+    time.sleep(max(end_time - time.perf_counter(), 0))
+    for idle_sock in idle_socks:
+        idle_sock.setblocking(False)
+        try:
+            closed = idle_sock.recv(client.RECV_LARGE) == b''
+        except BlockingIOError:
+            closed = False
+        except OSError:
+            closed = True
+        counts['evicted' if closed else 'held'] += 1
+        idle_sock.close()
+
+
+def run_abusers(kind: str, count: int, address: tuple, db: data, end_time: float, seed: int, queue: multiprocessing.Queue) -> None:
+    """run_abusers runs abusers of a kind in this process until end_time, and puts their counts in the queue.
+
+    Args:
+        kind (str): the kind of the abusers, one of ABUSE_COUNTS.
+        count (int): amount of abusers, or of connections for the 'idle' kind.
+        address (tuple): (host, port) of the server.
+        db (data): the catalogue the request data is picked from.
+        end_time (float): time.perf_counter() value to stop at, which is shared by the processes on Linux.
+        seed (int): seed of the random generators.
+        queue (multiprocessing.Queue): gets (kind, counts).
+    """
+    counts = dict.fromkeys(ABUSE_COUNTS[kind], 0)
+    if kind == 'idle':
+        targets = [(hold_idle, (address, count, end_time, counts))]
+    elif kind == 'flood':
+        targets = [(flood, (address, db, end_time, seed + i, counts)) for i in range(count)]
+    else:
+        targets = [(guess if kind == 'guess' else churn, (address, end_time, counts)) for _ in range(count)]
+    threads = [threading.Thread(target=target, args=target_args) for target, target_args in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    queue.put((kind, counts))
+
+
+def bench_run(name: str, args: argparse.Namespace, weights: dict, db: data) -> dict:
+    """bench_run starts a server for a run, runs the steady clients and the abusers of the run and stops the server.
+
+    Args:
+        name (str): the run, one of RUNS.
+        args (argparse.Namespace): the parsed arguments.
+        weights (dict): weight of each code of the steady clients.
+        db (data): the catalogue the request data is picked from.
+
+    Returns:
+        dict: the results of the steady clients, and the counts of each kind of abuser.
+    """
+    address = ('127.0.0.1', free_port())
+    server = start_server(address[1], args.engine, args.workers, extra_args=args.limits.split() if name == 'limited' else None)
+    try:
+        client_results = []
+        errors = []
+        end_time = time.perf_counter() + args.duration
+        threads = [threading.Thread(target=run_steady, args=(address, weights, db, args.rate, end_time, args.seed + i,
+                                                             client_results, errors))
+                   for i in range(args.clients)]
+        queue = multiprocessing.Queue()
+        abusers = []
+        if name != 'baseline':
+            # A process for each flooder, as they are the busiest.
+            kinds = [('flood', 1)] * args.flooders + [('guess', args.guessers), ('churn', 1), ('idle', args.idlers)]
+            abusers = [multiprocessing.Process(target=run_abusers, args=(kind, count, address, db, end_time, args.seed + i, queue))
+                       for i, (kind, count) in enumerate(kinds)]
+
+        start = time.perf_counter()
+        for process in abusers:
+            process.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - start
+
+        abuse = {kind: dict.fromkeys(ABUSE_COUNTS[kind], 0) for kind in ABUSE_COUNTS} if abusers else None
+        for _ in abusers:
+            kind, counts = queue.get()
+            for key, count in counts.items():
+                abuse[kind][key] += count
+        for process in abusers:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = {code: [] for code in weights}
+    for client_latencies in client_results:
+        for code, code_latencies in client_latencies.items():
+            latencies[code] += code_latencies
+    results = summarize(latencies, duration)
+    results['errors'] = errors
+    results['abuse'] = abuse
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Steady clients of the ASIB server while other clients abuse it.')
+    parser.add_argument('--clients', type=int, default=8, help='steady clients (default: 8).')
+    parser.add_argument('--rate', type=float, default=100, help='requests per second of each steady client (default: 100).')
+    parser.add_argument('--duration', type=float, default=5, help='seconds of each run (default: 5).')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'comma separated <code>:<weight> (default: {DEFAULT_MIX}).')
+    parser.add_argument('--flooders', type=int, default=4, help='connections flooding requests (default: 4).')
+    parser.add_argument('--guessers', type=int, default=4, help='connections guessing passwords (default: 4).')
+    parser.add_argument('--idlers', type=int, default=500, help='connections that never log on (default: 500).')
+    parser.add_argument('--limits', default=DEFAULT_LIMITS, help=f"arguments of the 'limited' server (default: '{DEFAULT_LIMITS}').")
+    parser.add_argument('--engine', default='select', help='engine of the started servers (default: select).')
+    parser.add_argument('--workers', type=int, default=0, help='worker processes of the started servers (default: 0).')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the clients random generators (default: 0).')
+    parser.add_argument('--output', help='save the results as json to this path.')
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    db = data()
+    results = {}
+    for name in RUNS:
+        print(f'{name} run...', file=sys.stderr)
+        results[name] = bench_run(name, args, weights, db)
+
+    target = args.clients * args.rate
+    print(f"steady clients: {args.clients} x {args.rate:g} req/s = {target:g} req/s")
+    print(f"{'run':>10} {'req/s':>10} {'of target':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, result in results.items():
+        total = result['total']
+        p50 = f"{total['p50']:>9.3f}" if total['count'] else f"{'-':>9}"
+        p99 = f"{total['p99']:>9.3f}" if total['count'] else f"{'-':>9}"
+        print(f"{name:>10} {total['throughput']:>10.1f} {total['throughput'] / target:>10.0%} {p50} {p99} {len(result['errors']):>7}")
+    for name, result in results.items():
+        if result['abuse'] is not None:
+            print(f'{name:>10} abusers: ' + ', '.join(f'{kind} {counts}' for kind, counts in result['abuse'].items()))
+
+    if args.output:
+        results['config'] = {'clients': args.clients, 'rate': args.rate, 'duration': args.duration, 'mix': args.mix,
+                             'flooders': args.flooders, 'guessers': args.guessers, 'idlers': args.idlers,
+                             'limits': args.limits, 'engine': args.engine, 'workers': args.workers}
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""bench_connections measures the server with many idle connections open while active clients keep sending requests.
+
+Run from the repository root: `python -m benchmarks.bench_connections [--idle 1000,5000,10000] [--active 16] [--duration 5]`.
+For each amount of idle connections a server is started (unless --address is given), the idle clients connect
+and log in, and then the active clients of bench_server send requests from the mix for --duration seconds.
+The time to open the idle connections, the failed connections and the throughput and latency of the active
+clients are reported for each amount, so engines and versions of the server can be compared as they scale.
+"""
+import argparse
+import json
+import socket as sock
+import sys
+import threading
+import time
+
+import client
+from data import data
+from benchmarks.bench_server import DEFAULT_MIX, PASSWORD, parse_mix, run_client, start_server, free_port, summarize
+
+DEFAULT_IDLE = '1000,5000,10000'
+CONNECT_TIMEOUT = 10
+# File descriptors kept for everything other than the idle connections.
+SPARE_FDS = 256
+
+
+def raise_fd_limit(needed: int) -> None:
+    """raise_fd_limit raises the soft limit of open files up to the hard limit, the started server inherits it.
+
+    Args:
+        needed (int): amount of files this process will open.
+    """
+    try:
+        import resource
+    except ImportError:
+        return  # Not a POSIX platform.
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard if hard == resource.RLIM_INFINITY else min(hard, max(needed, soft)), hard))
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        print(f'Only {soft} files may be opened, up to {needed} are needed.', file=sys.stderr)
+
+
+def open_idle(address: tuple, count: int) -> tuple:
+    """open_idle opens connections that log in and then stay idle.
+
+    Args:
+        address (tuple): (host, port) of the server.
+        count (int): amount of connections.
+
+    Returns:
+        tuple: (the logged in sockets, amount of connections that failed).
+    """
+    idle_socks = []
+    failed = 0
+    for _ in range(count):
+        try:
+            idle_sock = sock.create_connection(address, timeout=CONNECT_TIMEOUT)
+        except OSError:
+            failed += 1
+            continue
+        try:
+            idle_sock.recv(client.RECV_LARGE)  # Welcome message.
+            idle_sock.sendall(PASSWORD)
+            if not idle_sock.recv(client.RECV_LARGE).startswith(b'OK'):
+                raise ConnectionError('Login failed.')
+            idle_socks.append(idle_sock)
+        except (OSError, ConnectionError):
+            failed += 1
+            idle_sock.close()
+    return idle_socks, failed
+
+
+def bench_idle(address: tuple, idle: int, weights: dict, db: data, args: argparse.Namespace) -> dict:
+    """bench_idle opens the idle connections and runs the active clients.
+
+    Args:
+        address (tuple): (host, port) of the server.
+        idle (int): amount of idle connections.
+        weights (dict): weight of each code.
+        db (data): the catalogue the request data is picked from.
+        args (argparse.Namespace): the parsed arguments.
+
+    Returns:
+        dict: the connect time and failures of the idle connections and the results of the active clients.
+    """
+    start = time.perf_counter()
+    idle_socks, failed = open_idle(address, idle)
+    connect_s = time.perf_counter() - start
+
+    try:
+        client_results = []
+        errors = []
+        end_time = time.perf_counter() + args.duration
+        start = time.perf_counter()
+        threads = [threading.Thread(target=run_client, args=(address, weights, db, end_time, args.seed + i,
+                                                             True, client_results, errors))
+                   for i in range(args.active)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - start
+    finally:
+        for idle_sock in idle_socks:
+            idle_sock.close()
+
+    latencies = {code: [] for code in weights}
+    for client_latencies in client_results:
+        for code, code_latencies in client_latencies.items():
+            latencies[code] += code_latencies
+    results = summarize(latencies, duration)
+    results['idle'] = {'count': idle, 'failed': failed, 'connect_s': connect_s}
+    results['errors'] = errors
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Idle connections benchmark of the ASIB server.')
+    parser.add_argument('--idle', default=DEFAULT_IDLE, help=f'comma separated amounts of idle connections (default: {DEFAULT_IDLE}).')
+    parser.add_argument('--active', type=int, default=16, help='concurrent active clients (default: 16).')
+    parser.add_argument('--duration', type=float, default=5, help='seconds the active clients send requests for (default: 5).')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'comma separated <code>:<weight> (default: {DEFAULT_MIX}).')
+    parser.add_argument('--engine', default='select', help='engine of the started server (default: select).')
+    parser.add_argument('--workers', type=int, default=0, help='worker processes of the started server (default: 0).')
+    parser.add_argument('--address', help='<host>:<port> of a running server to use instead of starting one.')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the clients random generators (default: 0).')
+    parser.add_argument('--output', help='save the results as json to this path.')
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    idle_counts = [int(idle) for idle in args.idle.split(',')]
+    # The server and this process each hold a file for every connection.
+    raise_fd_limit(max(idle_counts) + args.active + SPARE_FDS)
+    db = data()
+
+    results = {}
+    for idle in idle_counts:
+        print(f'{idle} idle connections...', file=sys.stderr)
+        server = None
+        if args.address:
+            host, port = args.address.rsplit(':', 1)
+            address = (host, int(port))
+        else:
+            address = ('127.0.0.1', free_port())
+            server = start_server(address[1], args.engine, args.workers)
+        try:
+            results[idle] = bench_idle(address, idle, weights, db, args)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    print(f"{'idle':>7} {'failed':>7} {'connect s':>10} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for idle, result in results.items():
+        total = result['total']
+        p50 = f"{total['p50']:>9.3f}" if total['count'] else f"{'-':>9}"
+        p99 = f"{total['p99']:>9.3f}" if total['count'] else f"{'-':>9}"
+        print(f"{idle:>7} {result['idle']['failed']:>7} {result['idle']['connect_s']:>10.2f} {total['throughput']:>10.1f} "
+              f"{p50} {p99} {len(result['errors']):>7}")
+
+    if args.output:
+        results['config'] = {'active': args.active, 'duration': args.duration, 'mix': args.mix, 'engine': args.engine,
+                             'workers': args.workers, 'address': args.address}
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
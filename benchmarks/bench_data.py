@@ -0,0 +1,163 @@
+"""bench_data times every query method of data on synthetic catalogues of growing size, with their peak memory.
+
+Run from the repository root: `python -m benchmarks.bench_data [--scales 1,10,100,1000] [--output results.json]`.
+A catalogue of scale N holds N copies of every album of Pink_Floyd_DB.txt with renamed albums and songs,
+written in the same '#album::year' / '*song::writers::dur::lyrics' format and loaded in a temporary directory.
+Each method is timed as the median of its calls over a set of arguments, and its peak memory is the
+largest tracemalloc peak of a single call, so the scaling curve of each method can be seen and compared.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from data import data, parse_db, DB_SRC_PATH
+
+DEFAULT_SCALES = '1,10,100'
+# Keywords for songs_by_name and songs_by_lyr.
+KEYWORDS = ['the', 'love', 'ar', 'xyzzy', 'the wall']
+# Ranges for songs_by_dur.
+DURATION_RANGES = ['00:00-02:00', '03:00-05:00', '05:00-10:00', '10:00-30:00']
+CALLS_PER_METHOD = 20
+
+
+def generate_catalogue(src_path: str, dst_path: str, scale: int) -> None:
+    """generate_catalogue writes a catalogue with scale copies of every album of the source catalogue.
+
+    Args:
+        src_path (str): filepath to the source Pink_Floyd_DB.txt.
+        dst_path (str): filepath to write the catalogue to.
+        scale (int): amount of copies of every album.
+    """
+    errors = []
+    albums = list(parse_db(src_path, errors))
+    with open(dst_path, 'w') as dst:
+        for copy in range(scale):
+            for _, album, album_data in albums:
+                # The first copy keeps the original names.
+                suffix = f' {copy}' if copy else ''
+                dst.write(f"#{album}{suffix}::{album_data['Year']}\n")
+                for song, song_data in album_data['Songs'].items():
+                    lyrics = '\n'.join(song_data['Lyrics']).rstrip('\n')
+                    dst.write(f"*{song}{suffix}::{song_data['Writers']}::{song_data['Duration']}::{lyrics}\n")
+
+
+def measure(func, args: list) -> dict:
+    """measure times a method over its arguments and finds its peak memory.
+
+    Args:
+        func: the method.
+        args (list): the argument of each call.
+
+    Returns:
+        dict: median and max time of a call in milliseconds, peak memory of a call in KiB.
+    """
+    times = []
+    for arg in args:
+        start = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - start)
+
+    peak = 0
+    for arg in args[:3]:
+        tracemalloc.start()
+        func(arg)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {'median_ms': statistics.median(times) * 1000, 'max_ms': max(times) * 1000, 'peak_kib': peak / 1024}
+
+
+def bench_scale(src_path: str, scale: int) -> dict:
+    """bench_scale generates a catalogue of a scale, loads it and measures every query method on it.
+
+    Args:
+        src_path (str): filepath to the source Pink_Floyd_DB.txt.
+        scale (int): the scale of the catalogue.
+
+    Returns:
+        dict: the size of the catalogue and the measures of the load and of every method.
+    """
+    cwd = os.getcwd()
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        # data reads and writes its files in the working directory.
+        os.chdir(tmp_dir)
+        generate_catalogue(src_path, DB_SRC_PATH, scale)
+
+        # The first load parses the text file and builds the snapshot, the next loads read the snapshot.
+        start = time.perf_counter()
+        data()
+        build_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        db = data()
+        load_ms = (time.perf_counter() - start) * 1000
+        tracemalloc.start()
+        data()
+        load_peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+
+        albums = list(db.pink_floyd_db)
+        songs = list(db.song_index)
+        step_albums = albums[::max(1, len(albums) // CALLS_PER_METHOD)][:CALLS_PER_METHOD]
+        step_songs = songs[::max(1, len(songs) // CALLS_PER_METHOD)][:CALLS_PER_METHOD]
+        no_args = [None] * 5
+
+        methods = {
+            'get_albms': (db.get_albms, no_args),
+            'get_albm_songs': (db.get_albm_songs, step_albums),
+            'get_sng_dur': (db.get_sng_dur, step_songs),
+            'get_song_lyr': (db.get_song_lyr, step_songs),
+            'find_songs_albm': (db.find_songs_albm, step_songs),
+            'songs_by_name': (db.songs_by_name, KEYWORDS),
+            'songs_by_lyr': (db.songs_by_lyr, KEYWORDS),
+        'suggest_songs': (db.suggest_songs, KEYWORDS),
+            'fifty_most_common': (db.fifty_most_common, no_args),
+        'most_common_opts': (db.fifty_most_common, ['k=10', 'k=500;stopwords=1', f'album={albums[-1]};k=20',
+                                                     f'song={songs[-1]};stopwords=1']),
+            'albm_by_dur': (db.albm_by_dur, no_args),
+        'total_dur': (db.total_dur, no_args),
+        'songs_by_dur': (db.songs_by_dur, DURATION_RANGES),
+        'longest_songs': (db.longest_songs, ['1', '10', '100']),
+        'shortest_songs': (db.shortest_songs, ['1', '10', '100']),
+        }
+        results = {'albums': len(albums), 'songs': len(songs), 'source_bytes': os.path.getsize(DB_SRC_PATH),
+                   'build': {'ms': build_ms}, 'load': {'ms': load_ms, 'peak_kib': load_peak}, 'methods': {}}
+        for name, (func, args) in methods.items():
+            results['methods'][name] = measure(func, args)
+        return results
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark of the data query methods on synthetic catalogues.')
+    parser.add_argument('--scales', default=DEFAULT_SCALES, help=f'comma separated scales (default: {DEFAULT_SCALES}).')
+    parser.add_argument('--output', help='save the results as json to this path.')
+    args = parser.parse_args()
+
+    src_path = os.path.abspath(DB_SRC_PATH)
+    results = {}
+    for scale in (int(scale) for scale in args.scales.split(',')):
+        print(f'Scale {scale}x...', file=sys.stderr)
+        results[scale] = bench_scale(src_path, scale)
+
+    print(f"{'method':>18}" + ''.join(f'{f"{scale}x ms":>12}{f"{scale}x KiB":>12}' for scale in results))
+    print(f"{'build':>18}" + ''.join(f"{result['build']['ms']:>12.3f}{'':>12}" for result in results.values()))
+    print(f"{'load':>18}" + ''.join(f"{result['load']['ms']:>12.3f}{result['load']['peak_kib']:>12.0f}" for result in results.values()))
+    for name in next(iter(results.values()))['methods']:
+        print(f'{name:>18}' + ''.join(f"{result['methods'][name]['median_ms']:>12.3f}{result['methods'][name]['peak_kib']:>12.0f}"
+                                      for result in results.values()))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
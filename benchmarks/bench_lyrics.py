@@ -0,0 +1,128 @@
+"""bench_lyrics compares the startup time and memory of a db with its lyrics loaded against one with lazy lyrics.
+
+Run from the repository root: `python -m benchmarks.bench_lyrics [--scales 1,10,100] [--runs 5] [--output results.json]`.
+For each scale a catalogue is generated as in bench_data, and its snapshot and lyrics file are built once.
+Each load then runs in a new process so its startup time and memory are measured alone, the median of --runs
+loads is reported, along with the time to read the lyrics of every song. The query results of both modes are
+compared before anything is reported.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from data import data, DB_SRC_PATH
+from benchmarks.bench_data import generate_catalogue
+
+DEFAULT_SCALES = '1,10,100'
+MODES = ('eager', 'lazy')
+
+# Code run in each child process, prints the load time, the rss after loading, the peak rss
+# and the time to read the lyrics of every song.
+LOAD_CODE = """
+import json, os, resource, sys, time
+import data as data_module
+start = time.perf_counter()
+db = data_module.data(lazy_lyrics=sys.argv[1] == 'lazy')
+load_time = time.perf_counter() - start
+with open('/proc/self/statm') as statm:
+    rss = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+start = time.perf_counter()
+for song in db.song_index:
+    db.get_song_lyr(song)
+lyrics_time = time.perf_counter() - start
+print(json.dumps({'load_time': load_time, 'rss': rss, 'max_rss': max_rss, 'lyrics_time': lyrics_time}))
+"""
+
+# Code run in each child process, prints the results of every query of the db.
+QUERY_CODE = """
+import json, sys
+import data as data_module
+db = data_module.data(lazy_lyrics=sys.argv[1] == 'lazy')
+songs = list(db.song_index)
+results = [db.get_albms(), db.fifty_most_common(), db.albm_by_dur()]
+results += [db.get_albm_songs(album) for album in db.pink_floyd_db]
+results += [(db.get_sng_dur(song), db.get_song_lyr(song), db.find_songs_albm(song)) for song in songs]
+results += [(db.songs_by_name(word), db.songs_by_lyr(word)) for word in ('the', 'love', 'ar', ' ', 'sky ')]
+print(json.dumps(results))
+"""
+
+
+def run_child(code: str, mode: str) -> str:
+    """run_child runs code in a new python process in the working directory, with the repository importable.
+
+    Args:
+        code (str): the code to run.
+        mode (str): the lyrics mode passed to the code.
+
+    Returns:
+        str: the output of the process.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (root, os.environ.get('PYTHONPATH')))))
+    return subprocess.run([sys.executable, '-c', code, mode], check=True, capture_output=True, text=True, env=env).stdout
+
+
+def bench_scale(src_path: str, scale: int, runs: int) -> dict:
+    """bench_scale generates a catalogue of a scale and measures loading it in each mode.
+
+    Args:
+        src_path (str): filepath to the source Pink_Floyd_DB.txt.
+        scale (int): the scale of the catalogue.
+        runs (int): loads of each mode.
+
+    Returns:
+        dict: the size of the catalogue and the median measures of each mode.
+    """
+    cwd = os.getcwd()
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        # data reads and writes its files in the working directory.
+        os.chdir(tmp_dir)
+        generate_catalogue(src_path, DB_SRC_PATH, scale)
+        songs = len(data().song_index)  # Creates pink_db.json, the snapshot and the lyrics file.
+
+        if run_child(QUERY_CODE, 'eager') != run_child(QUERY_CODE, 'lazy'):
+            sys.exit(f'Lazy lyrics return different results than loaded lyrics at scale {scale}x.')
+
+        results = {'songs': songs}
+        for mode in MODES:
+            mode_runs = [json.loads(run_child(LOAD_CODE, mode)) for _ in range(runs)]
+            results[mode] = {key: sorted(run[key] for run in mode_runs)[len(mode_runs) // 2] for key in mode_runs[0]}
+        return results
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare loading the lyrics of the db against reading them lazily.')
+    parser.add_argument('--scales', default=DEFAULT_SCALES, help=f'comma separated scales (default: {DEFAULT_SCALES}).')
+    parser.add_argument('--runs', type=int, default=5, help='loads of each mode, the median is reported (default: 5).')
+    parser.add_argument('--output', help='save the results as json to this path.')
+    args = parser.parse_args()
+
+    src_path = os.path.abspath(DB_SRC_PATH)
+    results = {}
+    for scale in (int(scale) for scale in args.scales.split(',')):
+        print(f'Scale {scale}x...', file=sys.stderr)
+        results[scale] = bench_scale(src_path, scale, args.runs)
+
+    print(f"{'scale':>6} {'songs':>8} {'mode':>6} {'load ms':>9} {'rss MiB':>9} {'peak MiB':>9} {'all lyrics ms':>14}")
+    for scale, result in results.items():
+        for mode in MODES:
+            print(f"{scale:>6} {result['songs']:>8} {mode:>6} {result[mode]['load_time'] * 1000:>9.1f} "
+                  f"{result[mode]['rss'] / 2 ** 20:>9.2f} {result[mode]['max_rss'] / 2 ** 20:>9.2f} "
+                  f"{result[mode]['lyrics_time'] * 1000:>14.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""bench_memory compares the memory of the catalogue held as the nested dicts of pink_db.json and as album and song records.
+
+Run from the repository root: `python -m benchmarks.bench_memory [--scales 1,10,100] [--output results.json]`.
+For each scale a catalogue is generated as in bench_data, and its pink_db.json is loaded both ways.
+The memory held by each is measured with tracemalloc and reported per song, along with the memory
+of the whole db with its indexes, so the saving of the records can be seen as the catalogue grows.
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+from data import data, build_records, intern_strings, DB_SRC_PATH, DB_JSON_PATH
+from benchmarks.bench_data import generate_catalogue
+
+DEFAULT_SCALES = '1,10,100'
+# Each representation is measured this many times and the smallest is kept, as leftovers of earlier loads may be counted.
+RUNS = 3
+
+
+def traced_size(load) -> int:
+    """traced_size measures the memory held by what a function returns, the smallest of RUNS calls.
+
+    Args:
+        load: the function, called without arguments.
+
+    Returns:
+        int: the size in bytes.
+    """
+    sizes = []
+    for _ in range(RUNS):
+        gc.collect()
+        tracemalloc.start()
+        value = load()
+        sizes.append(tracemalloc.get_traced_memory()[0])
+        tracemalloc.stop()
+        del value
+    return min(sizes)
+
+
+def load_dicts() -> dict:
+    """load_dicts loads pink_db.json as nested dicts with interned strings, as the db was held before the records.
+
+    Returns:
+        dict: the catalogue.
+    """
+    with open(DB_JSON_PATH, 'r') as src_db:
+        return json.load(src_db, object_hook=intern_strings)
+
+
+def load_records() -> dict:
+    """load_records loads pink_db.json as album and song records, as data.load_db does.
+
+    Returns:
+        dict: the album_record of each album.
+    """
+    return build_records(load_dicts())
+
+
+def bench_scale(src_path: str, scale: int) -> dict:
+    """bench_scale generates a catalogue of a scale and measures it as dicts, as records and as a whole db.
+
+    Args:
+        src_path (str): filepath to the source Pink_Floyd_DB.txt.
+        scale (int): the scale of the catalogue.
+
+    Returns:
+        dict: the size of the catalogue and the memory of each representation, in bytes.
+    """
+    cwd = os.getcwd()
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        # data reads and writes its files in the working directory.
+        os.chdir(tmp_dir)
+        generate_catalogue(src_path, DB_SRC_PATH, scale)
+        data()  # Creates pink_db.json and the snapshot.
+
+        dicts = load_dicts()
+        albums = len(dicts)
+        songs = sum(len(album_data['Songs']) for album_data in dicts.values())
+        del dicts
+
+        dicts_bytes = traced_size(load_dicts)
+        records_bytes = traced_size(load_records)
+        db_bytes = traced_size(data)
+        return {'albums': albums, 'songs': songs, 'dicts_bytes': dicts_bytes,
+                'records_bytes': records_bytes, 'db_bytes': db_bytes}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory of the catalogue as nested dicts and as records.')
+    parser.add_argument('--scales', default=DEFAULT_SCALES, help=f'comma separated scales (default: {DEFAULT_SCALES}).')
+    parser.add_argument('--output', help='save the results as json to this path.')
+    args = parser.parse_args()
+
+    src_path = os.path.abspath(DB_SRC_PATH)
+    results = {}
+    for scale in (int(scale) for scale in args.scales.split(',')):
+        print(f'Scale {scale}x...', file=sys.stderr)
+        results[scale] = bench_scale(src_path, scale)
+
+    print(f"{'scale':>6} {'songs':>8} {'dicts B/song':>13} {'records B/song':>15} {'saved':>7} {'db KiB':>10}")
+    for scale, result in results.items():
+        print(f"{scale:>6} {result['songs']:>8} {result['dicts_bytes'] / result['songs']:>13.0f} "
+              f"{result['records_bytes'] / result['songs']:>15.0f} {1 - result['records_bytes'] / result['dicts_bytes']:>7.0%} "
+              f"{result['db_bytes'] / 1024:>10.0f}")
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+"""bench_server drives the ASIB server with concurrent simulated clients and reports throughput and latency per command.
+
+Run from the repository root: `python -m benchmarks.bench_server [--clients M] [--duration S] [--mix 214:5,221:3,...]`.
+By default a server is started on a free port with the given engine and workers, and stopped at the end.
+Each client logs in with the password flow of client.login_to_server and then sends requests from the mix
+one at a time, timing each from sending the request until its whole response is received.
+Results can be saved as json with --output and compared to an earlier run with --compare.
+"""
+import argparse
+import json
+import math
+import random
+import socket as sock
+import subprocess
+import sys
+import threading
+import time
+
+import client
+from data import data
+from framing import negotiate_framing
+
+PASSWORD = b'ItayComeHome'
+DEFAULT_MIX = '200:1,207:2,214:5,221:3,228:3,235:2,242:1,256:1,263:1'
+# Words used as the data of SNGBYNAME and SNGBYLYR requests.
+KEYWORDS = ['the', 'love', 'time', 'wall', 'money', 'sky', 'brick', 'dark', 'xyzzy']
+# Letters of the random keywords of --random-keywords, and their lengths.
+KEYWORD_LETTERS = 'aeinorst'
+KEYWORD_LENGTHS = (2, 3)
+# Ranges used as the data of SNGBYDUR requests.
+DURATION_RANGES = ['00:00-02:00', '03:00-05:00', '05:00-10:00', '10:00-30:00']
+PERCENTILES = (50, 95, 99)
+EXIT_CODE = 249
+SERVER_START_TIMEOUT = 30
+
+
+def parse_mix(mix: str) -> dict:
+    """parse_mix parses the request mix.
+
+    Args:
+        mix (str): comma separated '<code>:<weight>'.
+
+    Raises:
+        ValueError: error is raised whenever a code is not an ASIB command with a response.
+
+    Returns:
+        dict: weight of each code.
+    """
+    weights = {}
+    for item in mix.split(','):
+        code, weight = item.split(':')
+        if int(code) not in client.ASIB_COMMANDS or int(code) == EXIT_CODE:
+            raise ValueError(f'Unknown ASIB code {code}.')
+        weights[int(code)] = float(weight)
+    return weights
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """percentile gets a percentile of sorted values by the nearest rank.
+
+    Args:
+        sorted_values (list): the values, sorted ascending.
+        pct (float): the percentile, 0 to 100.
+
+    Returns:
+        float: the value at the percentile.
+    """
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def request_data(code: int, db: data, rnd: random.Random, random_keywords: bool = False) -> str:
+    """request_data picks the data of a request from the catalogue.
+
+    Args:
+        code (int): the ASIB code of the request.
+        db (data): the catalogue.
+        rnd (random.Random): the random generator of the client.
+        random_keywords (bool, optional): whether keywords are random letters instead of KEYWORDS. Defaults to False.
+
+    Returns:
+        str: the data of the request, '' for requests without data.
+    """
+    if code == 207:
+        return rnd.choice(list(db.pink_floyd_db))
+    if code in (214, 221, 228):
+        return rnd.choice(list(db.song_index))
+    if code in (235, 242):
+        if random_keywords:
+            return ''.join(rnd.choices(KEYWORD_LETTERS, k=rnd.choice(KEYWORD_LENGTHS)))
+        return rnd.choice(KEYWORDS)
+    if code == 291:
+        return rnd.choice(DURATION_RANGES)
+    if code in (298, 305):
+        return str(rnd.randint(1, 20))
+    return ''
+
+
+def run_client(address: tuple, weights: dict, db: data, end_time: float, seed: int, framing: bool, results: list, errors: list,
+               random_keywords: bool = False) -> None:
+    """run_client logs in to the server and sends requests from the mix until end_time.
+
+    Args:
+        address (tuple): (host, port) of the server.
+        weights (dict): weight of each code.
+        db (data): the catalogue the request data is picked from.
+        end_time (float): time.perf_counter() value to stop at.
+        seed (int): seed of the client's random generator.
+        framing (bool): whether to use the framing mode, so responses of any size are received whole.
+        results (list): the client adds the list of latencies (seconds) of each code to it.
+        errors (list): the client adds a message to it if it fails.
+        random_keywords (bool, optional): whether keywords are random letters instead of KEYWORDS. Defaults to False.
+    """
+    rnd = random.Random(seed)
+    codes, code_weights = list(weights), list(weights.values())
+    try:
+        with sock.create_connection(address) as server_sock:
+            server_sock.recv(client.RECV_LARGE)  # Welcome message.
+            conn = negotiate_framing(server_sock) if framing else server_sock
+
+            # The password flow of client.login_to_server.
+            conn.sendall(PASSWORD)
+            response = conn.recv(client.RECV_LARGE).decode()
+            if client.ERROR_PTRN.search(response) is not None:
+                raise ConnectionError(f'Login failed: {response}')
+
+            client_latencies = {code: [] for code in codes}
+            while time.perf_counter() < end_time:
+                code = rnd.choices(codes, code_weights)[0]
+                req_data = request_data(code, db, rnd, random_keywords)
+                start = time.perf_counter()
+                client.query(conn, code, req_data)
+                client_latencies[code].append(time.perf_counter() - start)
+
+        results.append(client_latencies)
+    except (OSError, ConnectionError) as err:
+        errors.append(str(err))
+
+
+def start_server(port: int, engine: str, workers: int, heavy_workers: int = None, extra_args: list = None) -> subprocess.Popen:
+    """start_server starts the server and waits until it accepts connections.
+
+    Args:
+        port (int): the port for the server.
+        engine (str): the engine of the server.
+        workers (int): the amount of worker processes of the server.
+        heavy_workers (int, optional): the threads of the heavy pool of the server, None for its default. Defaults to None.
+        extra_args (list, optional): more command line arguments of the server. Defaults to None.
+
+    Raises:
+        RuntimeError: error is raised whenever the server does not start in SERVER_START_TIMEOUT seconds.
+
+    Returns:
+        subprocess.Popen: the server process.
+    """
+    server_args = ['--port', str(port), '--engine', engine, '--workers', str(workers)]
+    if heavy_workers is not None:
+        server_args += ['--heavy-workers', str(heavy_workers)]
+    server_args += extra_args or []
+    server = subprocess.Popen([sys.executable, 'server.py'] + server_args,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'The server has exited with code {server.returncode}.')
+        try:
+            sock.create_connection(('127.0.0.1', port)).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError('The server has not started in time.')
+
+
+def free_port() -> int:
+    """free_port gets a port that is free to listen on.
+
+    Returns:
+        int: the port.
+    """
+    with sock.socket() as probe:
+        # The server listens on every address, so a port in use on another loopback address is not free for it.
+        probe.bind(('', 0))
+        return probe.getsockname()[1]
+
+
+def summarize(latencies: dict, duration: float) -> dict:
+    """summarize computes the throughput and latency percentiles of a run.
+
+    Args:
+        latencies (dict): list of latencies (seconds) of each code.
+        duration (float): duration of the run in seconds.
+
+    Returns:
+        dict: 'total' and 'commands' results, latencies in milliseconds.
+    """
+    commands = {}
+    for code, code_latencies in sorted(latencies.items()):
+        if not code_latencies:
+            continue
+        code_latencies.sort()
+        commands[str(code)] = {'count': len(code_latencies), 'throughput': len(code_latencies) / duration,
+                               'mean': sum(code_latencies) / len(code_latencies) * 1000,
+                               'max': code_latencies[-1] * 1000}
+        for pct in PERCENTILES:
+            commands[str(code)][f'p{pct}'] = percentile(code_latencies, pct) * 1000
+
+    all_latencies = sorted(latency for code_latencies in latencies.values() for latency in code_latencies)
+    total = {'count': len(all_latencies), 'throughput': len(all_latencies) / duration}
+    for pct in PERCENTILES:
+        total[f'p{pct}'] = percentile(all_latencies, pct) * 1000 if all_latencies else None
+    return {'total': total, 'commands': commands}
+
+
+def print_results(results: dict, baseline: dict = None) -> None:
+    """print_results prints the results table, with the change from a baseline run if given.
+
+    Args:
+        results (dict): the results of the run.
+        baseline (dict, optional): the results of an earlier run. Defaults to None.
+    """
+    def change(section: str, key: str, field: str) -> str:
+        try:
+            old = baseline[section][key][field] if key else baseline[section][field]
+            new = results[section][key][field] if key else results[section][field]
+            return f' ({(new - old) / old * 100:+.0f}%)'
+        except (TypeError, KeyError, ZeroDivisionError):
+            return ''
+
+    print(f"{'code':>6} {'count':>8} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for code, stats in results['commands'].items():
+        print(f"{code:>6} {stats['count']:>8} {stats['throughput']:>10.1f} {stats['p50']:>9.3f} {stats['p95']:>9.3f} "
+              f"{stats['p99']:>9.3f} {stats['max']:>9.3f}{change('commands', code, 'p99')}")
+    total = results['total']
+    print(f"{'total':>6} {total['count']:>8} {total['throughput']:>10.1f}{change('total', None, 'throughput')}")
+    if total['count']:
+        print(f"p50 {total['p50']:.3f} ms, p95 {total['p95']:.3f} ms, p99 {total['p99']:.3f} ms{change('total', None, 'p99')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load and latency benchmark of the ASIB server.')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent clients (default: 16).')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to send requests for (default: 10).')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'comma separated <code>:<weight> (default: {DEFAULT_MIX}).')
+    parser.add_argument('--engine', default='select', help='engine of the started server (default: select).')
+    parser.add_argument('--workers', type=int, default=0, help='worker processes of the started server (default: 0).')
+    parser.add_argument('--heavy-workers', type=int, help='heavy pool threads of the started server (default: the servers default).')
+    parser.add_argument('--address', help='<host>:<port> of a running server to use instead of starting one.')
+    parser.add_argument('--no-framing', action='store_true', help='send raw messages, large responses may be cut.')
+    parser.add_argument('--random-keywords', action='store_true',
+                        help='search random letters instead of common words, so most searches miss the response cache.')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the clients random generators (default: 0).')
+    parser.add_argument('--output', help='save the results as json to this path.')
+    parser.add_argument('--compare', help='json results of an earlier run to compare to.')
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    db = data()
+    server = None
+    if args.address:
+        host, port = args.address.rsplit(':', 1)
+        address = (host, int(port))
+    else:
+        address = ('127.0.0.1', free_port())
+        server = start_server(address[1], args.engine, args.workers, args.heavy_workers)
+
+    try:
+        client_results = []
+        errors = []
+        end_time = time.perf_counter() + args.duration
+        start = time.perf_counter()
+        threads = [threading.Thread(target=run_client, args=(address, weights, db, end_time, args.seed + i,
+                                                             not args.no_framing, client_results, errors, args.random_keywords))
+                   for i in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies = {code: [] for code in weights}
+    for client_latencies in client_results:
+        for code, code_latencies in client_latencies.items():
+            latencies[code] += code_latencies
+    results = summarize(latencies, duration)
+    results['config'] = {'clients': args.clients, 'duration': duration, 'mix': args.mix, 'engine': args.engine,
+                         'workers': args.workers, 'heavy_workers': args.heavy_workers, 'address': args.address, 'framing': not args.no_framing,
+                         'random_keywords': args.random_keywords, 'errors': errors}
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, baseline)
+    if errors:
+        print(f'{len(errors)} clients failed, first error: {errors[0]}')
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""bench_snapshot compares loading the db from its snapshot against loading it from pink_db.json.
+
+Run from the repository root: `python -m benchmarks.bench_snapshot [--runs N]`.
+Each load runs in a new process so its startup time and memory are measured alone.
+The query results of both loads are compared before anything is reported.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+# Code run in each child process, prints the load time, the rss after loading and the peak rss.
+LOAD_CODE = """
+import json, os, resource, sys, time
+import data as data_module
+if sys.argv[1] == 'json':
+    # Never read nor write the snapshot, so the db is loaded from pink_db.json and its indexes are built.
+    data_module.data.load_snapshot = lambda self, *args: False
+    data_module.data.save_snapshot = lambda self, *args: None
+start = time.perf_counter()
+db = data_module.data()
+load_time = time.perf_counter() - start
+with open('/proc/self/statm') as statm:
+    rss = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+print(json.dumps({'load_time': load_time, 'rss': rss, 'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}))
+"""
+
+# Code run in each child process, prints the results of every query of the db.
+QUERY_CODE = """
+import json, sys
+import data as data_module
+if sys.argv[1] == 'json':
+    data_module.data.load_snapshot = lambda self, *args: False
+    data_module.data.save_snapshot = lambda self, *args: None
+db = data_module.data()
+songs = list(db.song_index)
+results = [db.get_albms(), db.fifty_most_common(), db.albm_by_dur()]
+results += [db.get_albm_songs(album) for album in db.pink_floyd_db]
+results += [(db.get_sng_dur(song), db.get_song_lyr(song), db.find_songs_albm(song)) for song in songs]
+results += [(db.songs_by_name(word), db.songs_by_lyr(word)) for word in ('the', 'love', 'ar', ' ', 'sky ')]
+print(json.dumps(results))
+"""
+MODES = ('json', 'snapshot')
+
+
+def run_child(code: str, mode: str) -> str:
+    """run_child runs code in a new python process and returns its output.
+
+    Args:
+        code (str): the code to run.
+        mode (str): the load mode passed to the code.
+
+    Returns:
+        str: the output of the process.
+    """
+    return subprocess.run([sys.executable, '-c', code, mode], check=True, capture_output=True, text=True).stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare loading the db from its snapshot and from pink_db.json.')
+    parser.add_argument('--runs', type=int, default=10, help='loads of each mode, the median is reported (default: 10).')
+    args = parser.parse_args()
+
+    run_child(LOAD_CODE, 'snapshot')  # Make sure the snapshot is up to date before measuring.
+    if run_child(QUERY_CODE, 'json') != run_child(QUERY_CODE, 'snapshot'):
+        sys.exit('The snapshot returns different results than pink_db.json.')
+
+    results = {}
+    for mode in MODES:
+        runs = [json.loads(run_child(LOAD_CODE, mode)) for _ in range(args.runs)]
+        results[mode] = {key: sorted(run[key] for run in runs)[len(runs) // 2] for key in runs[0]}
+        print(f"{mode:>8}: load {results[mode]['load_time'] * 1000:8.2f} ms, "
+              f"rss {results[mode]['rss'] / 2 ** 20:7.2f} MiB, peak rss {results[mode]['max_rss'] / 2 ** 20:7.2f} MiB")
+
+    print(f"snapshot load is {results['json']['load_time'] / results['snapshot']['load_time']:.1f}x faster, "
+          f"rss saved {(results['json']['rss'] - results['snapshot']['rss']) / 2 ** 20:.2f} MiB.")
+
+
+if __name__ == '__main__':
+    main()
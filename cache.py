@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from typing import Callable, Hashable, Union # This module is used only for type hinting and no other purpose.
+
+class lru_cache():
+    """lru_cache keeps encoded responses up to a count of entries and a total size, evicting the least recently used."""
+    def __init__(self, max_entries : int, max_bytes : int, sizeof : Callable = len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof # Gives the size of a value in bytes.
+        self.entries = OrderedDict() # Ordered from the least recently used to the most recently used.
+        self.size = 0 # Total size of the cached values in bytes.
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key : Hashable) -> Union[bytes, object, None]:
+        """get gets the value of a key and marks it as the most recently used.
+
+        Args:
+            key (Hashable): the key of the value.
+
+        Returns:
+            Union[bytes, object, None]: bytes: the cached value.
+                                None: if the key is not cached.
+        """
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def __contains__(self, key : Hashable) -> bool:
+        """__contains__ checks if a key is cached, without counting it or marking it as used.
+
+        Args:
+            key (Hashable): the key of the value.
+
+        Returns:
+            bool: whether the key is cached.
+        """
+        return key in self.entries
+
+    def put(self, key : Hashable, value : Union[bytes, object]) -> None:
+        """put caches a value, evicting the least recently used values until it fits.
+
+        Values larger than max_bytes are not cached.
+
+        Args:
+            key (Hashable): the key of the value.
+            value (Union[bytes, object]): the value to cache, bytes unless the cache was made with sizeof.
+        """
+        if self.sizeof(value) > self.max_bytes:
+            return
+
+        if key in self.entries:
+            self.size -= self.sizeof(self.entries.pop(key))
+
+        self.entries[key] = value
+        self.size += self.sizeof(value)
+
+        # Evict the least recently used values until both limits are kept.
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= self.sizeof(evicted)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """clear removes all the cached values, the counters are kept."""
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        """stats gets the counters of the cache.
+
+        Returns:
+            dict: the hits, misses, evictions, entries and size (bytes) of the cache.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self.entries), 'bytes': self.size}
@@ -1,5 +1,12 @@
 import socket as sock
 import re
+import threading
+import asyncio
+import collections
+from abc import ABC, abstractmethod
+from framing import negotiate_framing, framed_socket, encode_frame, FRAME_HEADER, FRAMING_REQ, FRAMING_RES, FRAMING_VERSION, MAX_BATCH_REQUESTS
+from compression import negotiate_compression, compressed_socket, unpack_msg, COMPRESSION_REQ, COMPRESSION_RES, COMPRESSION_VERSION
+from typing import Callable, List, Union # This module is used only for type hinting and no other purpose.
 
 SERVER_ADDRESS = ('127.0.0.1', 7160)
 
@@ -14,10 +21,20 @@ ASIB_COMMAND_FORMATS = [
     '242:SNGBYLYR&{0}',
     '249:EXIT',
     '256:FIVEMOSTCOM',
-    '263:ABMBYDUR'
+    '263:ABMBYDUR',
+    '284:TOTALDUR',
+    '291:SNGBYDUR&{0}',
+    '298:LONGSNGS&{0}',
+    '305:SHORTSNGS&{0}'
 ]
 
-ASIB_SPECIAL_PRINT_TYPE = ['SNGLYR', 'FIVEMOSTCOM', 'ABMBYDUR']
+# ASIB command formats by their code, used by the programmatic API.
+ASIB_COMMANDS = {int(command_format[:3]): command_format for command_format in ASIB_COMMAND_FORMATS}
+BATCH_FORMAT = '270:BATCH&{0}'
+BATCH_SEPARATOR = '\n'
+BATCH_RES_HEADER = b'OK:BATCH&'
+
+ASIB_SPECIAL_PRINT_TYPE = ['SNGLYR', 'FIVEMOSTCOM', 'ABMBYDUR', 'TOTALDUR', 'LONGSNGS', 'SHORTSNGS']
 
 CHOICE_MENU = """Please choose one of the following actions:
 [1] - Get list of albums.
@@ -29,7 +46,11 @@ CHOICE_MENU = """Please choose one of the following actions:
 [7] - Get all songs that include the specified word in its lyrics.
 [8] - Exit.
 [9] - Get fifty most common words in all songs lyrics.
-[10] - Get ranking of each album based on its duration."""
+[10] - Get ranking of each album based on its duration.
+[11] - Get the total duration of all songs.
+[12] - Get all songs with a duration in the specified range.
+[13] - Get the longest songs.
+[14] - Get the shortest songs."""
 
 RESULT_PRINT_FORMAT = {
     'ABMLIST': 'Pink Floyd list of albums:\n{Res}.',
@@ -40,23 +61,31 @@ RESULT_PRINT_FORMAT = {
     'SNGBYNAME': 'All songs that include keyword {Req} are:\n{Res}.',
     'SNGBYLYR': 'All songs that include keyword {Req} in its lyrics are:\n{Res}.',
     'FIVEMOSTCOM': 'Fifty most common words in all songs lyrics are:\n{Res}',
-    'ABMBYDUR': "The ranking of the albums based on it's duration is:\n{Res}"
+    'ABMBYDUR': "The ranking of the albums based on it's duration is:\n{Res}",
+    'TOTALDUR': 'The total duration of all songs is: {Res}.',
+    'SNGBYDUR': 'All songs with a duration in {Req} are:\n{Res}.',
+    'LONGSNGS': 'The {Req} longest songs are:\n{Res}',
+    'SHORTSNGS': 'The {Req} shortest songs are:\n{Res}'
 }
 
 # The data passed may be bigger then the defualt recv size so we use a bigger buffer.
+# Only used if the server does not support the framing mode, where the whole message is always received.
 RECV_LARGE = 2048
 
 # Choice input msgs.
 CHOICE_INPUT_MSG = {
-    2: 'Please enter album name (case sensitive): ',
-    3: 'Please enter song name (case sensitive): ',
-    4: 'Please enter song name (case sensitive): ',
-    5: 'Please enter song name (case sensitive): ',
+    2: 'Please enter album name (case insensitive): ',
+    3: 'Please enter song name (case insensitive): ',
+    4: 'Please enter song name (case insensitive): ',
+    5: 'Please enter song name (case insensitive): ',
     6: 'Please enter your desired keyword to search by (case insensitive): ',
-    7: 'Please enter your desired keyword to search by (case insensitive): '
+    7: 'Please enter your desired keyword to search by (case insensitive): ',
+    12: 'Please enter the duration range (format MM:SS-MM:SS): ',
+    13: 'Please enter the amount of songs: ',
+    14: 'Please enter the amount of songs: '
 }
 EXIT_ACTION = 8
-BONUS_END_ACTION = 10
+BONUS_END_ACTION = 14
 
 # Regex patterns.
 """The pattern will match to a string if it has the following pattern:
@@ -95,6 +124,15 @@ FORTH_COMMA_PTRN = re.compile(r'(?:[^,]*(?:, )?){4}')
 
 MAX_PASS_ATTEMPTS = 3
 
+# Defaults of the programmatic API.
+POOL_SIZE = 4 # Most connections of a connection_pool.
+CLIENT_TIMEOUT = 10 # Seconds to wait for the server.
+CLIENT_RETRIES = 1 # Times a request is sent again on a new connection after its connection has failed.
+NOT_FOUND_CODE = 707 # Error code of names that weren't found, the typed methods return None for it.
+RANKING_SEPARATOR = '. '
+RANKING_VALUE_SEPARATOR = ': '
+LIST_SEPARATOR = ', '
+
 # These constants are only used for aestetic reasons, and has no effect in the codes structure.
 RED = '\033[91m'
 YELLOW = '\033[93m'
@@ -179,11 +217,91 @@ def print_response(requested_data: str, res: str) -> None:
         print(f'{GREEN}[SERVER]: {WHITE}{res}')
 
 
-def login_to_server(server_sock: sock.socket) -> bool:
+def query(server_sock: Union[sock.socket, framed_socket], code: int, data: str = '') -> str:
+    """query sends one ASIB request to the server and returns its response.
+
+    Args:
+        server_sock (Union[sock.socket, framed_socket]): the socket with the server, already logged on.
+        code (int): the ASIB code of the request.
+        data (str, optional): the data of the request. Defaults to ''.
+
+    Returns:
+        str: the server's ASIB response.
+    """
+    server_sock.sendall(ASIB_COMMANDS[code].format(data).encode())
+    return server_sock.recv(RECV_LARGE).decode()
+
+
+def query_many(server_sock: Union[sock.socket, framed_socket], requests: list) -> list:
+    """query_many sends many ASIB requests to the server in batch requests and returns their responses.
+
+    The requests are sent in batch requests of up to MAX_BATCH_REQUESTS requests, one after another.
+    Without the framing mode the batch response could be split between reads,
+    so the requests are sent one by one instead.
+
+    Args:
+        server_sock (Union[sock.socket, framed_socket]): the socket with the server, already logged on.
+        requests (list): (code, data) of each request, data may be omitted for requests without data.
+
+    Raises:
+        ValueError: error is raised whenever a requests data contains the batch separator or the response is malformed.
+
+    Returns:
+        list: the server's ASIB response to each request, in order.
+    """
+    requests = [(request[0], request[1] if len(request) > 1 else '') for request in requests]
+    if not isinstance(server_sock, (framed_socket, compressed_socket)):
+        return [query(server_sock, code, data) for code, data in requests]
+
+    sub_reqs = []
+    for code, data in requests:
+        if BATCH_SEPARATOR in data:
+            raise ValueError(f'Request data can not contain {BATCH_SEPARATOR!r}.')
+        sub_reqs.append(ASIB_COMMANDS[code].format(data))
+
+    responses = []
+    for start in range(0, len(sub_reqs), MAX_BATCH_REQUESTS):
+        responses += query_batch(server_sock, sub_reqs[start:start + MAX_BATCH_REQUESTS])
+    return responses
+
+
+def query_batch(server_sock: Union[framed_socket, compressed_socket], sub_reqs: list) -> list:
+    """query_batch sends one batch request and splits its response.
+
+    Args:
+        server_sock (Union[framed_socket, compressed_socket]): the socket with the server, already logged on.
+        sub_reqs (list): the ASIB requests, up to MAX_BATCH_REQUESTS.
+
+    Raises:
+        ValueError: error is raised whenever the response is malformed.
+
+    Returns:
+        list: the server's ASIB response to each request, in order.
+    """
+    server_sock.sendall(BATCH_FORMAT.format(BATCH_SEPARATOR.join(sub_reqs)).encode())
+    response = server_sock.recv()
+    if not response.startswith(BATCH_RES_HEADER):
+        raise ValueError(f'Unexpected batch response: {response[:100]!r}')
+
+    # Split the response into the '<length>:<response>' parts.
+    responses = []
+    pos = len(BATCH_RES_HEADER)
+    while pos < len(response):
+        length_end = response.index(b':', pos)
+        end = length_end + 1 + int(response[pos:length_end])
+        responses.append(response[length_end + 1:end].decode())
+        pos = end
+
+    if len(responses) != len(sub_reqs):
+        raise ValueError(f'Expected {len(sub_reqs)} responses, got {len(responses)}.')
+    return responses
+
+
+def login_to_server(server_sock: Union[sock.socket, framed_socket]) -> bool:
     """login_to_server requests user 3 times for a password and checks if the server returns a valid response.
 
     Args:
-        server_sock (sock.socket): the socket with the server.
+        server_sock (Union[sock.socket, framed_socket]): the socket with the server.
 
     Returns:
         bool: True if the client has guessed the correct password in three attempts. Otherwise False.
@@ -209,6 +327,500 @@ def login_to_server(server_sock: sock.socket) -> bool:
     return False
 
 
+class server_error(Exception):
+    """server_error is raised for an ASIB error response of the server."""
+    def __init__(self, response : str):
+        re_error = ERROR_PTRN.match(response)
+        self.code = int(re_error.group(1)) if re_error else None
+        self.type = re_error.group(2) if re_error else None
+        self.message = re_error.group(3) if re_error else response
+        super().__init__(response)
+
+
+def format_request(code: int, data: str = '') -> str:
+    """format_request creates an ASIB request, with the data only if there is any.
+
+    Args:
+        code (int): the ASIB code of the request.
+        data (str, optional): the data of the request. Defaults to ''.
+
+    Returns:
+        str: the ASIB request.
+    """
+    name = ASIB_COMMANDS[code].split('&')[0]
+    return f'{name}&{data}' if data else name
+
+
+def parse_response(response: str, parser: Callable) -> object:
+    """parse_response parses the data of an ASIB response.
+
+    Args:
+        response (str): the server's ASIB response.
+        parser (Callable): function that parses the data of the response.
+
+    Raises:
+        server_error: error is raised whenever the response is an error other than NOT_FOUND_CODE.
+
+    Returns:
+        object: the parsed data, None if the server has not found the requested name.
+    """
+    if not response.startswith('OK:'):
+        error = server_error(response)
+        if error.code == NOT_FOUND_CODE:
+            return None
+        raise error
+    return parser(response.partition('&')[2])
+
+
+def parse_list(res_data: str) -> List[str]:
+    """parse_list parses a response data of names separated by LIST_SEPARATOR."""
+    return res_data.split(LIST_SEPARATOR) if res_data else []
+
+
+def parse_ranking(res_data: str) -> List[tuple]:
+    """parse_ranking parses a response data of '<rank>. <name>: <value>' lines into a list of (name, value)."""
+    ranking = []
+    for line in res_data.splitlines():
+        name, _, value = line.partition(RANKING_SEPARATOR)[2].rpartition(RANKING_VALUE_SEPARATOR)
+        ranking.append((name, value))
+    return ranking
+
+
+def parse_count_ranking(res_data: str) -> List[tuple]:
+    """parse_count_ranking parses a response data of '<rank>. <word>: <count>' lines into a list of (word, count)."""
+    return [(word, int(count)) for word, count in parse_ranking(res_data)]
+
+
+def parse_text(res_data: str) -> str:
+    """parse_text returns a response data as is."""
+    return res_data
+
+
+class archive_api(ABC):
+    """archive_api has a typed method for each ASIB command, the subclasses send the requests in call."""
+    @abstractmethod
+    def call(self, code : int, data : str, parser : Callable):
+        """call sends an ASIB request and parses its response.
+
+        Args:
+            code (int): the ASIB code of the request.
+            data (str): the data of the request.
+            parser (Callable): function that parses the data of the response.
+        """
+
+    def albums(self) -> List[str]:
+        """albums gets the names of all albums."""
+        return self.call(200, '', parse_list)
+
+    def album_songs(self, album : str) -> Union[List[str], None]:
+        """album_songs gets the songs of an album, None if it isn't found."""
+        return self.call(207, album, parse_list)
+
+    def song_duration(self, song : str) -> Union[str, None]:
+        """song_duration gets the duration of a song as '<MM>:<SS>', None if it isn't found."""
+        return self.call(214, song, parse_text)
+
+    def song_lyrics(self, song : str) -> Union[str, None]:
+        """song_lyrics gets the lyrics of a song, None if it isn't found."""
+        return self.call(221, song, parse_text)
+
+    def song_album(self, song : str) -> Union[str, None]:
+        """song_album gets the album of a song, None if it isn't found."""
+        return self.call(228, song, parse_text)
+
+    def songs_by_name(self, keyword : str) -> Union[List[str], None]:
+        """songs_by_name gets the songs that contain a keyword in their name, None if there are none."""
+        return self.call(235, keyword, parse_list)
+
+    def songs_by_lyrics(self, keyword : str) -> Union[List[str], None]:
+        """songs_by_lyrics gets the songs that contain a keyword in their lyrics, None if there are none."""
+        return self.call(242, keyword, parse_list)
+
+    def most_common_words(self, k : int = None, album : str = None, song : str = None, stopwords : bool = False) -> Union[List[tuple], None]:
+        """most_common_words gets (word, occurrences) of the most common words in the lyrics, of all songs, an album or a song.
+
+        Returns None if the album or song isn't found.
+        """
+        options = {'k': k, 'album': album, 'song': song, 'stopwords': 1 if stopwords else None}
+        return self.call(256, ';'.join(f'{name}={value}' for name, value in options.items() if value is not None), parse_count_ranking)
+
+    def albums_by_duration(self) -> List[tuple]:
+        """albums_by_duration gets (album, '<HH>:<MM>:<SS>') of all albums from the longest."""
+        return self.call(263, '', parse_ranking)
+
+    def total_duration(self) -> str:
+        """total_duration gets the total duration of all songs as '<HH>:<MM>:<SS>'."""
+        return self.call(284, '', parse_text)
+
+    def songs_by_duration(self, shortest : str, longest : str) -> Union[List[str], None]:
+        """songs_by_duration gets the songs with a duration between two '<MM>:<SS>' durations, None if there are none."""
+        return self.call(291, f'{shortest}-{longest}', parse_list)
+
+    def longest_songs(self, count : int = None) -> List[tuple]:
+        """longest_songs gets (song, '<MM>:<SS>') of the longest songs, from the longest."""
+        return self.call(298, '' if count is None else str(count), parse_ranking)
+
+    def shortest_songs(self, count : int = None) -> List[tuple]:
+        """shortest_songs gets (song, '<MM>:<SS>') of the shortest songs, from the shortest."""
+        return self.call(305, '' if count is None else str(count), parse_ranking)
+
+
+class archive_connection():
+    """archive_connection is a connection with the server that has logged on, using the framing mode if the server supports it.
+
+    Without the framing mode responses longer than RECV_LARGE may be cut.
+    With compress the compression mode is asked for as well, if the server supports the framing mode.
+    """
+    def __init__(self, address : tuple, password : str, timeout : float, compress : bool = False):
+        self.sock = sock.create_connection(address, timeout=timeout)
+        try:
+            self.sock.recv(RECV_LARGE)  # Welcome message.
+            self.conn = negotiate_framing(self.sock)
+            if compress and isinstance(self.conn, framed_socket):
+                self.conn = negotiate_compression(self.conn)
+            self.conn.sendall(password.encode())
+            response = self.conn.recv(RECV_LARGE).decode()
+            if ERROR_PTRN.match(response) is not None:
+                raise server_error(response)
+        except BaseException:
+            self.sock.close()
+            raise
+
+    def request(self, code : int, data : str = '') -> str:
+        """request sends one ASIB request and receives its response.
+
+        Args:
+            code (int): the ASIB code of the request.
+            data (str, optional): the data of the request. Defaults to ''.
+
+        Raises:
+            ConnectionError: error is raised whenever the server has closed the connection.
+
+        Returns:
+            str: the server's ASIB response.
+        """
+        self.conn.sendall(format_request(code, data).encode())
+        response = self.conn.recv(RECV_LARGE)
+        if not response:
+            raise ConnectionError('The server has closed the connection.')
+        return response.decode()
+
+    def close(self) -> None:
+        """close closes the connection."""
+        self.sock.close()
+
+
+class connection_pool():
+    """connection_pool keeps up to size connections logged on to the server and lends them to threads, one thread at a time.
+
+    A request whose connection fails (including timeouts) is sent again on a new connection, that logs on again, up to retries times.
+    """
+    def __init__(self, address : tuple = SERVER_ADDRESS, password : str = '', size : int = POOL_SIZE,
+                 timeout : float = CLIENT_TIMEOUT, retries : int = CLIENT_RETRIES, compress : bool = False):
+        self.address = address
+        self.password = password
+        self.timeout = timeout
+        self.retries = retries
+        self.compress = compress
+        self.idle = [] # Connections that are not lent, the last one returned is lent first.
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(size)
+        self.closed = False
+
+    def acquire(self, fresh : bool = False) -> archive_connection:
+        """acquire lends a connection, connecting a new one if none is idle.
+
+        Args:
+            fresh (bool, optional): whether to connect a new connection even if one is idle. Defaults to False.
+
+        Raises:
+            TimeoutError: error is raised whenever no connection is returned to the pool in time.
+
+        Returns:
+            archive_connection: the connection, must be returned with release.
+        """
+        if self.closed:
+            raise ConnectionError('The pool is closed.')
+        if not self.slots.acquire(timeout=self.timeout):
+            raise TimeoutError('No connection of the pool became free in time.')
+
+        with self.lock:
+            conn = self.idle.pop() if self.idle and not fresh else None
+        if conn is None:
+            try:
+                conn = archive_connection(self.address, self.password, self.timeout, self.compress)
+            except BaseException:
+                self.slots.release()
+                raise
+        return conn
+
+    def release(self, conn : archive_connection, broken : bool = False) -> None:
+        """release returns a lent connection to the pool.
+
+        Args:
+            conn (archive_connection): the connection.
+            broken (bool, optional): whether the connection has failed, it is closed instead of being kept. Defaults to False.
+        """
+        if broken or self.closed:
+            conn.close()
+        else:
+            with self.lock:
+                self.idle.append(conn)
+        self.slots.release()
+
+    def request(self, code : int, data : str = '') -> str:
+        """request sends one ASIB request on a connection of the pool.
+
+        Args:
+            code (int): the ASIB code of the request.
+            data (str, optional): the data of the request. Defaults to ''.
+
+        Returns:
+            str: the server's ASIB response.
+        """
+        for attempt in range(self.retries + 1):
+            conn = None
+            try:
+                # The idle connections may have failed as well, so requests are sent again on new connections.
+                # Connecting and logging on again may fail as well, which counts as a failed attempt.
+                conn = self.acquire(fresh=attempt > 0)
+                response = conn.request(code, data)
+            except (OSError, ConnectionError):
+                if conn is not None:
+                    self.release(conn, broken=True)
+                if attempt == self.retries:
+                    raise
+                continue
+            self.release(conn)
+            return response
+
+    def close(self) -> None:
+        """close closes the idle connections, lent connections are closed when they are returned."""
+        self.closed = True
+        with self.lock:
+            for conn in self.idle:
+                conn.close()
+            self.idle.clear()
+
+
+class archive_client(archive_api):
+    """archive_client queries the server from any amount of threads through a connection_pool.
+
+    Example:
+        with archive_client(password='...') as archive:
+            print(archive.song_album('Money'))
+    """
+    def __init__(self, address : tuple = SERVER_ADDRESS, password : str = '', pool_size : int = POOL_SIZE,
+                 timeout : float = CLIENT_TIMEOUT, retries : int = CLIENT_RETRIES, compress : bool = False):
+        self.pool = connection_pool(address, password, pool_size, timeout, retries, compress)
+
+    def call(self, code : int, data : str, parser : Callable) -> object:
+        return parse_response(self.pool.request(code, data), parser)
+
+    def close(self) -> None:
+        """close closes the connections of the client."""
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class async_archive_connection():
+    """async_archive_connection is a connection with the server in the framing mode that has many requests in flight at once.
+
+    The server answers the requests of a connection in order, so each response resolves the oldest pending future.
+    """
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.pending = collections.deque() # Futures of the requests that were not answered yet, in order.
+        self.read_task = None
+        self.closed = False
+        self.compress = False # Whether the server has agreed to the compression mode.
+
+    async def open(self, address : tuple, password : str, compress : bool = False) -> None:
+        """open connects to the server, asks for the framing mode and logs on.
+
+        Args:
+            address (tuple): (host, port) of the server.
+            password (str): the password.
+            compress (bool, optional): whether to ask for the compression mode as well. Defaults to False.
+
+        Raises:
+            ConnectionError: error is raised whenever the server does not support the framing mode.
+            server_error: error is raised whenever the password is invalid.
+        """
+        self.reader, self.writer = await asyncio.open_connection(*address)
+        try:
+            await self.reader.read(RECV_LARGE)  # Welcome message.
+            self.writer.write(FRAMING_REQ.format(FRAMING_VERSION).encode())
+            if not (await self.reader.read(RECV_LARGE)).decode().startswith(FRAMING_RES.format('')):
+                raise ConnectionError('The server does not support the framing mode.')
+
+            if compress:
+                self.writer.write(encode_frame(COMPRESSION_REQ.format(COMPRESSION_VERSION).encode()))
+                (length,) = FRAME_HEADER.unpack(await self.reader.readexactly(FRAME_HEADER.size))
+                self.compress = (await self.reader.readexactly(length)).decode().startswith(COMPRESSION_RES.format(''))
+
+            self.read_task = asyncio.ensure_future(self.read_responses())
+            response = await self.request(password.encode())
+            if ERROR_PTRN.match(response) is not None:
+                raise server_error(response)
+        except BaseException:
+            self.close()
+            raise
+
+    def send(self, msg : bytes) -> asyncio.Future:
+        """send sends a message as a frame.
+
+        Args:
+            msg (bytes): the message.
+
+        Returns:
+            asyncio.Future: resolved with the decoded response.
+        """
+        if self.closed:
+            raise ConnectionError('The connection is closed.')
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append(future)
+        self.writer.write(encode_frame(msg))
+        return future
+
+    async def request(self, msg : bytes) -> str:
+        """request sends a message and waits for its response, waiting first if the servers receive window is full.
+
+        Args:
+            msg (bytes): the message.
+
+        Returns:
+            str: the decoded response.
+        """
+        future = self.send(msg)
+        await self.writer.drain()
+        return await future
+
+    async def read_responses(self) -> None:
+        """read_responses resolves the pending futures with the responses until the connection ends."""
+        try:
+            while True:
+                (length,) = FRAME_HEADER.unpack(await self.reader.readexactly(FRAME_HEADER.size))
+                response = await self.reader.readexactly(length)
+                response = (unpack_msg(response) if self.compress else response).decode()
+                future = self.pending.popleft()
+                if not future.done():  # The request may have timed out.
+                    future.set_result(response)
+        except (OSError, asyncio.IncompleteReadError, IndexError, ValueError) as err:
+            self.fail(ConnectionError(f'The connection with the server has ended: {err}'))
+
+    def fail(self, err : Exception) -> None:
+        """fail closes the connection and fails every pending request with an error."""
+        self.close()
+        while self.pending:
+            future = self.pending.popleft()
+            if not future.done():
+                future.set_exception(err)
+
+    def close(self) -> None:
+        """close closes the connection."""
+        self.closed = True
+        if self.writer is not None:
+            self.writer.close()
+        if self.read_task is not None and self.read_task is not asyncio.current_task():
+            self.read_task.cancel()
+
+
+class async_archive_client(archive_api):
+    """async_archive_client queries the server from asyncio, with any amount of requests in flight on its connections.
+
+    Its typed methods return coroutines. A request whose connection fails (including timeouts) is sent again
+    on a new connection, that logs on again, up to retries times.
+
+    Example:
+        async with async_archive_client(password='...') as archive:
+            albums = await asyncio.gather(*(archive.song_album(song) for song in songs))
+    """
+    def __init__(self, address : tuple = SERVER_ADDRESS, password : str = '', connections : int = 1,
+                 timeout : float = CLIENT_TIMEOUT, retries : int = CLIENT_RETRIES, compress : bool = False):
+        self.address = address
+        self.password = password
+        self.timeout = timeout
+        self.retries = retries
+        self.compress = compress
+        self.conns = [None] * connections
+        self.connecting = [None] * connections # Task of each connection that is being opened.
+        self.next_conn = 0
+
+    async def get_connection(self) -> async_archive_connection:
+        """get_connection picks the next connection in turn, opening it again if it was closed.
+
+        Returns:
+            async_archive_connection: the connection.
+        """
+        index = self.next_conn
+        self.next_conn = (self.next_conn + 1) % len(self.conns)
+        conn = self.conns[index]
+        if conn is not None and not conn.closed:
+            return conn
+
+        # Requests that need the connection at the same time wait for the same attempt.
+        if self.connecting[index] is None:
+            self.connecting[index] = asyncio.ensure_future(self.open_connection(index))
+        try:
+            return await asyncio.shield(self.connecting[index])
+        finally:
+            if self.connecting[index] is not None and self.connecting[index].done():
+                self.connecting[index] = None
+
+    async def open_connection(self, index : int) -> async_archive_connection:
+        conn = async_archive_connection()
+        await asyncio.wait_for(conn.open(self.address, self.password, self.compress), self.timeout)
+        self.conns[index] = conn
+        return conn
+
+    async def request(self, code : int, data : str = '') -> str:
+        """request sends one ASIB request on one of the connections.
+
+        Args:
+            code (int): the ASIB code of the request.
+            data (str, optional): the data of the request. Defaults to ''.
+
+        Returns:
+            str: the server's ASIB response.
+        """
+        for attempt in range(self.retries + 1):
+            conn = None
+            try:
+                conn = await self.get_connection()
+                return await asyncio.wait_for(conn.request(format_request(code, data).encode()), self.timeout)
+            except (OSError, ConnectionError, asyncio.TimeoutError) as err:
+                # The connection is closed so that the next attempt opens a new one, its other requests are sent again as well.
+                if conn is not None:
+                    conn.fail(ConnectionError(f'The connection with the server has failed: {err!r}'))
+                if attempt == self.retries:
+                    raise
+
+    def call(self, code : int, data : str, parser : Callable):
+        return self.parsed_request(code, data, parser)
+
+    async def parsed_request(self, code : int, data : str, parser : Callable) -> object:
+        return parse_response(await self.request(code, data), parser)
+
+    async def close(self) -> None:
+        """close closes the connections of the client."""
+        for conn in self.conns:
+            if conn is not None:
+                conn.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
 def main():
     with sock.socket(sock.AF_INET, sock.SOCK_STREAM) as server_sock:
         try:
@@ -218,6 +830,12 @@ def main():
             # Print Welcome Message.
             print(f'{GREEN}[SERVER]: {WHITE}{welcome}')
 
+            # Use the framing mode if the server supports it, so large responses are received whole.
+            server_sock = negotiate_framing(server_sock)
+            # Large responses such as lyrics are received compressed if the server supports it.
+            if isinstance(server_sock, framed_socket):
+                server_sock = negotiate_compression(server_sock)
+
             if not login_to_server(server_sock):
                 raise Exception('Too many attempts, please try again later.')
             while True:
@@ -0,0 +1,133 @@
+import re
+import zlib
+from typing import Union # This module is used only for type hinting and no other purpose.
+
+"""Compression mode of the ASIB protocol.
+
+In the framing mode, before logging on, the client may send COMPRESSION_REQ with the highest compression version
+it supports. A server that supports compression answers COMPRESSION_RES with the version it chose, and from then on
+every message the server sends starts with a flag byte: PLAIN_FLAG followed by the message, or ZLIB_FLAG followed by
+the message compressed with zlib. Messages shorter than COMPRESSION_THRESHOLD, or that zlib doesn't make smaller,
+are sent plain. The client keeps sending its messages as they are.
+A server without compression treats the request as an invalid password, and the messages are sent without flags.
+"""
+COMPRESSION_VERSION = 1
+COMPRESSION_REQ = 'ASIBZLIB:{0}'
+COMPRESSION_RES = 'OK:ASIBZLIB&{0}'
+PLAIN_FLAG = b'\x00'
+ZLIB_FLAG = b'\x01'
+# Messages shorter than this many bytes are not worth the time of compressing them.
+COMPRESSION_THRESHOLD = 512
+COMPRESSION_LEVEL = 6
+
+# Regex patterns.
+"""The pattern will match to a string if it has the following pattern:
+        `ASIBZLIB:` matches the characters 'ASIBZLIB:' (case sensitive).
+        First capturing group `(\d+)`:
+            `\d+` one or more digits.
+"""
+COMPRESSION_REQ_PTRN = re.compile(r'ASIBZLIB:(\d+)')
+
+
+def pack_msg(msg: bytes) -> bytes:
+    """pack_msg creates the flagged message of the compression mode, compressing it if it is worth it.
+
+    Args:
+        msg (bytes): the message.
+
+    Returns:
+        bytes: ZLIB_FLAG followed by the compressed message, or PLAIN_FLAG followed by the message.
+    """
+    if len(msg) >= COMPRESSION_THRESHOLD:
+        compressed = zlib.compress(msg, COMPRESSION_LEVEL)
+        if len(compressed) < len(msg):
+            return ZLIB_FLAG + compressed
+    return PLAIN_FLAG + msg
+
+
+def unpack_msg(msg: bytes) -> bytes:
+    """unpack_msg gets the message out of a flagged message of the compression mode.
+
+    Args:
+        msg (bytes): the flagged message.
+
+    Raises:
+        ValueError: error is raised whenever the flag is unknown or the message can't be decompressed.
+
+    Returns:
+        bytes: the message.
+    """
+    if msg[:1] == PLAIN_FLAG:
+        return msg[1:]
+    if msg[:1] == ZLIB_FLAG:
+        try:
+            return zlib.decompress(msg[1:])
+        except zlib.error as err:
+            raise ValueError(f'Compressed message is corrupted: {err}')
+    raise ValueError(f'Unknown compression flag {msg[:1]!r}.')
+
+
+def negotiate_version(req: bytes) -> Union[int, None]:
+    """negotiate_version checks if a message is a compression request and chooses the compression version for it.
+
+    Args:
+        req (bytes): the clients message.
+
+    Returns:
+        Union[int, None]: int: the compression version to use.
+                          None: if the message is not a compression request.
+    """
+    re_req = COMPRESSION_REQ_PTRN.fullmatch(req.decode(errors='replace'))
+    if re_req is None or int(re_req.group(1)) < 1:
+        return None
+    return min(int(re_req.group(1)), COMPRESSION_VERSION)
+
+
+class compressed_socket():
+    """compressed_socket receives the flagged messages of the compression mode over a framed_socket.
+
+    It has the sendall and recv methods of a socket so it can be used in place of one.
+    """
+    def __init__(self, framed_sock):
+        self.framed_sock = framed_sock
+
+    def sendall(self, msg : bytes) -> None:
+        """sendall sends a message, the client's messages are not compressed.
+
+        Args:
+            msg (bytes): the message.
+        """
+        self.framed_sock.sendall(msg)
+
+    def recv(self, bufsize : int = None) -> bytes:
+        """recv receives the next whole message and decompresses it.
+
+        Args:
+            bufsize: This argument is not used as the whole message is returned. Defaults to None.
+
+        Returns:
+            bytes: the message, b'' if the connection ended between messages.
+        """
+        msg = self.framed_sock.recv()
+        return unpack_msg(msg) if msg else msg
+
+    def close(self) -> None:
+        """close closes the socket."""
+        self.framed_sock.close()
+
+
+def negotiate_compression(framed_sock):
+    """negotiate_compression asks the server for the compression mode, should be called in the framing mode before logging on.
+
+    Args:
+        framed_sock (framed_socket): the framed socket with the server.
+
+    Returns:
+        Union[compressed_socket, framed_socket]: compressed_socket: if the server has agreed to the compression mode.
+                                                 framed_socket: the same socket if the server does not support it.
+    """
+    framed_sock.sendall(COMPRESSION_REQ.format(COMPRESSION_VERSION).encode())
+    response = framed_sock.recv().decode()
+    if response.startswith(COMPRESSION_RES.format('')):
+        return compressed_socket(framed_sock)
+    return framed_sock
@@ -1,25 +1,817 @@
 import json
 import os
-import datetime as dt
-from typing import Union # This module is used only for type hinting and no other purpose.
+import sys
+import marshal
+import mmap
+import struct
+import tempfile
+import bisect
+import heapq
+import itertools
+from array import array
+from typing import Iterator, Union # This module is used only for type hinting and no other purpose.
 
 ALBUM_PREFIX = '#'
 SONG_PREFIX = '*'
 SONG_DATA_SEPARATOR = '::'
-TIME_ZERO = dt.datetime.strptime('00:00:00', '%H:%M:%S') # Used when calculating time sum.
+# A line in the lyrics of a song that starts with ALBUM_PREFIX or SONG_PREFIX and contains this, the start of
+# SONG_DATA_SEPARATOR, is a malformed record such as '#<name>:<year>' rather than a line of the lyrics such as '*laughs*'.
+RECORD_MARK = SONG_DATA_SEPARATOR[0]
+DB_SRC_PATH = './Pink_Floyd_DB.txt'
+DB_JSON_PATH = 'pink_db.json'
+JSON_INDENT = 5
+DB_SNAPSHOT_PATH = 'pink_db.snapshot'
+# The snapshot is the header followed by the marshalled SNAPSHOT_FIELDS of the db, rebuilt whenever pink_db.json changes.
+SNAPSHOT_HEADER = struct.Struct('!4sH') # (magic, format version)
+SNAPSHOT_MAGIC = b'PFDB'
+SNAPSHOT_VERSION = 8
+# The albums and songs are saved as tuples of their fields, the records are made again when loading.
+# The lyrics are not part of the snapshot, they are saved in the lyrics file.
+SNAPSHOT_FIELDS = ('song_refs', 'song_positions', 'song_secs', 'secs_order', 'sorted_secs', 'album_secs', 'album_ranking',
+                   'lyr_index', 'word_ranking', 'album_word_ranking', 'song_word_ranking',
+                   'album_names', 'album_grams', 'album_prefixes', 'album_lower',
+                   'song_names', 'song_grams', 'song_prefixes', 'song_lower')
+# Fields kept as arrays, marshal can't save arrays so they are saved as bytes.
+SNAPSHOT_ARRAYS = {'song_secs': 'L', 'secs_order': 'L', 'sorted_secs': 'L'}
+DB_LYRICS_PATH = 'pink_db.lyrics'
+# The lyrics file is the header, the offset of each text followed by the end of the last one, and the texts:
+# the lyrics of every song in the order of the database and then their lowercased copies, in UTF-8.
+# It is written with the snapshot, and dbs with lazy lyrics map it instead of loading the lyrics.
+LYRICS_HEADER = struct.Struct('!4sHqqI') # (magic, format version, modification time and size of pink_db.json, amount of songs)
+LYRICS_MAGIC = b'PFLY'
+LYRICS_OFFSET_TYPE = 'Q' # Array type of the offsets of the texts in the lyrics file.
+DURATION_SEPARATOR = ':'
+LINE_SEPARATOR = '\n'
+WORD_SEPARATOR = ' '
+DURATION_RANGE_SEPARATOR = '-'
 TOP_COMMON_COUNT = 50
+# Options of the most common words query, format '<option>=<value>;<option>=<value>...'.
+COMMON_OPTION_SEPARATOR = ';'
+COMMON_OPTION_ASSIGN = '='
+COMMON_OPTIONS = ('k', 'album', 'song', 'stopwords')
+# Words left out of the most common words when the 'stopwords' option is on.
+STOPWORDS = frozenset('''a about after again all am an and any are as at be because been before being but by can could did do
+does doing down for from further had has have having he her here hers him his how i if in into is it its just me more most my
+no nor not now of off on once only or other our ours out over own same she should so some such than that the their theirs them
+then there these they this those through to too under until up very was we were what when where which while who whom why will
+with would you your yours'''.split())
+TOP_DURATION_COUNT = 10 # Default amount of songs of the longest and shortest songs queries.
+NGRAM_SIZE = 3 # Names are indexed by each of their lowercased substrings of up to this length.
+SUGGESTION_COUNT = 5 # Most names suggested for a name that wasn't found.
+
+def intern_strings(obj : dict) -> dict:
+    """intern_strings interns the keys and the string values of a dict loaded from json.
+
+    Args:
+        obj (dict): the loaded dict.
+
+    Returns:
+        dict: the dict with interned strings.
+    """
+    return {sys.intern(key): sys.intern(value) if isinstance(value, str) else value for key, value in obj.items()}
+
+
+def parse_duration(duration : str) -> Union[int, None]:
+    """parse_duration parses a songs duration to seconds.
+
+    Args:
+        duration (str): the duration, format '<minutes>:<seconds>'.
+
+    Returns:
+        Union[int, None]: int: the duration in seconds.
+                          None: if the duration is not in the format.
+    """
+    try:
+        minutes, seconds = duration.split(DURATION_SEPARATOR)
+        return int(minutes) * 60 + int(seconds)
+    except ValueError:
+        return None
+
+
+def query_grams(keyword : str) -> set:
+    """query_grams gets the n-grams a name must have to contain a lowercased keyword.
+
+    Args:
+        keyword (str): the lowercased keyword.
+
+    Returns:
+        set: the keyword itself if it is up to NGRAM_SIZE long, otherwise each of its substrings of NGRAM_SIZE.
+    """
+    if len(keyword) <= NGRAM_SIZE:
+        return {keyword}
+    return {keyword[i:i + NGRAM_SIZE] for i in range(len(keyword) - NGRAM_SIZE + 1)}
+
+
+def build_name_index(names : list) -> tuple:
+    """build_name_index builds the indexes used to search a list of names.
+
+    Args:
+        names (list): the names, may hold a name more than once.
+
+    Returns:
+        tuple: (grams, prefixes, lower) - the positions in names of the names that contain each n-gram (lowercased),
+               the sorted (lowercased name, name) of each name for prefix searches,
+               and the first name of each lowercased name for case insensitive matches.
+    """
+    grams = {}
+    lower = {}
+    for pos, name in enumerate(names):
+        name_lower = name.lower()
+        lower.setdefault(name_lower, name)
+        name_grams = {name_lower[i:i + size] for size in range(1, NGRAM_SIZE + 1) for i in range(len(name_lower) - size + 1)}
+        for gram in name_grams:
+            grams.setdefault(gram, []).append(pos)
+
+    prefixes = sorted({(name.lower(), name) for name in names})
+    return grams, prefixes, lower
+
+
+def search_names(keyword : str, names : list, grams : dict) -> list:
+    """search_names finds the names that contain a keyword (case insensitive) using their n-gram index.
+
+    Only the names that have every n-gram of the keyword are checked.
+
+    Args:
+        keyword (str): the keyword.
+        names (list): the names.
+        grams (dict): the n-gram index of the names, as built by build_name_index.
+
+    Returns:
+        list: the positions in names of the names that contain the keyword, in order.
+    """
+    keyword = keyword.lower()
+    postings = sorted((grams.get(gram, []) for gram in query_grams(keyword)), key=len)
+    candidates = set(postings[0])
+    for posting in postings[1:]:
+        candidates.intersection_update(posting)
+    return [pos for pos in sorted(candidates) if keyword in names[pos].lower()]
+
+
+def suggest_names(name : str, names : list, grams : dict, prefixes : list) -> list:
+    """suggest_names finds names close to a name that wasn't found, for 'did you mean' messages.
+
+    The names that start with it (case insensitive) are suggested first, otherwise the names
+    that share at least half of its n-grams, from the most shared.
+
+    Args:
+        name (str): the name that wasn't found.
+        names (list): the names.
+        grams (dict): the n-gram index of the names, as built by build_name_index.
+        prefixes (list): the prefix index of the names, as built by build_name_index.
+
+    Returns:
+        list: up to SUGGESTION_COUNT names.
+    """
+    name_lower = name.lower()
+    suggestions = []
+    # The names starting with the name are next to each other in the sorted prefixes.
+    for prefix, full_name in itertools.islice(prefixes, bisect.bisect_left(prefixes, (name_lower,)), None):
+        if not prefix.startswith(name_lower) or len(suggestions) == SUGGESTION_COUNT:
+            break
+        suggestions.append(full_name)
+    if suggestions:
+        return suggestions
+
+    name_grams = query_grams(name_lower)
+    shared = {}
+    for gram in name_grams:
+        for pos in grams.get(gram, []):
+            shared[names[pos]] = shared.get(names[pos], 0) + 1
+    similar = heapq.nlargest(SUGGESTION_COUNT, shared.items(), key=lambda item: item[1])
+    return [similar_name for similar_name, count in similar if count * 2 >= len(name_grams)]
+
+
+def format_duration(seconds : int, hours : bool = False) -> str:
+    """format_duration formats seconds as a duration.
+
+    Args:
+        seconds (int): the duration in seconds.
+        hours (bool, optional): whether to format as '<HH>:<MM>:<SS>', the hours are not limited to 24. Defaults to False.
+
+    Returns:
+        str: the duration, format '<MM>:<SS>' or '<HH>:<MM>:<SS>'.
+    """
+    minutes, seconds = divmod(seconds, 60)
+    if not hours:
+        return f'{minutes:02}:{seconds:02}'
+    return f'{minutes // 60:02}:{minutes % 60:02}:{seconds:02}'
+
+
+def split_album_header(line : str) -> Union[list, None]:
+    """split_album_header splits a line of the Pink_Floyd_DB.txt that has the shape of an album header.
+
+    Args:
+        line (str): the line, without its LINE_SEPARATOR.
+
+    Returns:
+        Union[list, None]: list: [name, year] of the album.
+                           None: if the line is not '<ALBUM_PREFIX><name>::<year>'.
+    """
+    if not line.startswith(ALBUM_PREFIX):
+        return None
+    album_info = line[len(ALBUM_PREFIX):].split(SONG_DATA_SEPARATOR)
+    try:
+        return [album_info[0], int(album_info[1])]
+    except (IndexError, ValueError):
+        return None
+
+
+def split_song_header(line : str) -> Union[list, None]:
+    """split_song_header splits a line of the Pink_Floyd_DB.txt that has the shape of a song header.
+
+    Args:
+        line (str): the line, without its LINE_SEPARATOR.
+
+    Returns:
+        Union[list, None]: list: [name, writers, duration, first line of lyrics] of the song.
+                           None: if the line is not '<SONG_PREFIX><name>::<writers>::<minutes>:<seconds>::<lyrics>'.
+    """
+    if not line.startswith(SONG_PREFIX):
+        return None
+    song_info = line[len(SONG_PREFIX):].split(SONG_DATA_SEPARATOR, 3)
+    return song_info if len(song_info) == 4 and parse_duration(song_info[2]) is not None else None
+
+
+def parse_db(filepath : str, errors : list) -> Iterator[tuple]:
+    """parse_db parses the Pink_Floyd_DB.txt line by line, yielding each album as soon as all its songs were read.
+
+    A line in the shape of an album header '#<name>::<year>' starts an album, a line in the shape of a song header
+    '*<name>::<writers>::<minutes>:<seconds>::<first line of lyrics>' starts a song and every other line is a line of
+    the lyrics of the last song, so lyrics lines may contain SONG_DATA_SEPARATOR, and may start with ALBUM_PREFIX or
+    SONG_PREFIX if they don't contain RECORD_MARK, such as '*laughs*'. Any other line starting with ALBUM_PREFIX or
+    SONG_PREFIX is a record, and is reported with its line number if it is malformed.
+
+    Args:
+        filepath (str): filepath to the Pink_Floyd_DB.txt.
+        errors (list): list that a message is added to for each malformed record, with its line number.
+
+    Yields:
+        Iterator[tuple]: (sort key, album name, album data) of each album, in the order of the file.
+    """
+    album = None # [sort key, name, year, songs] of the current album.
+    song = None # [name, writers, duration, lines of lyrics] of the current song.
+    skip_album = False # Set after a malformed album, until the next album starts.
+    skip_song = False # Set after a malformed record, until the next record starts.
+    line_ended = False
+
+    def end_album() -> tuple:
+        # Sort the songs as the old parser did, a repeated song name keeps its first position and its last data.
+        songs = {}
+        for name, writers, duration, lyrics in sorted(album[3], key=lambda song: song[:3] + [LINE_SEPARATOR.join(song[3])]):
+            songs[name] = {'Writers': writers, 'Duration': duration, 'Lyrics': lyrics}
+        return album[0], album[1], {'Year': album[2], 'Songs': songs}
+
+    with open(filepath, 'r') as file:
+        for line_no, line in enumerate(file, 1):
+            line_ended = line.endswith(LINE_SEPARATOR)
+            line = line[:-1] if line_ended else line
+
+            album_info = split_album_header(line)
+            song_info = split_song_header(line)
+            # In the lyrics of a song, a line with the prefix of a record but without RECORD_MARK is a line of the lyrics.
+            is_record = album_info is not None or song_info is not None or \
+                        (line.startswith((ALBUM_PREFIX, SONG_PREFIX)) and (song is None or RECORD_MARK in line))
+
+            if is_record:
+                # A new record ends the lyrics of the current song, that ended with a newline.
+                if song is not None:
+                    song[3].append('')
+                    album[3].append(song)
+                    song = None
+                skip_song = False
+
+            if is_record and line.startswith(ALBUM_PREFIX):
+                if album is not None:
+                    yield end_album()
+                    album = None
+
+                if album_info is not None:
+                    album = [line[len(ALBUM_PREFIX):] + LINE_SEPARATOR, album_info[0], album_info[1], []]
+                    skip_album = False
+                else:
+                    errors.append(f"line {line_no}: album should be '{ALBUM_PREFIX}<name>{SONG_DATA_SEPARATOR}<year>'.")
+                    skip_album = True
+
+            elif skip_album:
+                continue  # The records of a malformed album were already reported with it.
+
+            elif is_record:
+                if album is None:
+                    errors.append(f'line {line_no}: song is not in an album.')
+                    skip_song = True
+                elif song_info is None:
+                    errors.append(f"line {line_no}: song should be '{SONG_PREFIX}<name>{SONG_DATA_SEPARATOR}<writers>"
+                                  f"{SONG_DATA_SEPARATOR}<minutes>:<seconds>{SONG_DATA_SEPARATOR}<lyrics>'.")
+                    skip_song = True
+                else:
+                    song = song_info[:3] + [[song_info[3]]]
+
+            elif song is not None:
+                song[3].append(line)
+
+            elif line.strip() and not skip_song:
+                errors.append(f'line {line_no}: text is not part of a song.')
+                skip_song = True
+
+    if song is not None:
+        # The lyrics of the last song end with the file, which may not end with a newline.
+        if line_ended:
+            song[3].append('')
+        album[3].append(song)
+    if album is not None:
+        yield end_album()
+
+
+class album_record():
+    """album_record is an album of the database, with its songs in the order of the database."""
+    __slots__ = ('name', 'year', 'songs')
+
+    def __init__(self, name : str, year : int, songs : tuple):
+        self.name = name
+        self.year = year
+        self.songs = songs # Tuple of the song_record of each song.
+
+
+class song_record():
+    """song_record is a song of the database.
+
+    Its lyrics are kept as one string instead of a string per line,
+    and its duration in seconds as well as the duration text of the database, which is interned and shared between songs.
+    """
+    __slots__ = ('name', 'album', 'writers', 'duration', 'secs', 'lyrics')
+
+    def __init__(self, name : str, album : str, writers : str, duration : str, lyrics : str):
+        self.name = name
+        self.album = album # Name of the album the song is on.
+        self.writers = writers
+        self.duration = duration # The duration as in the database, format '<minutes>:<seconds>'.
+        self.secs = parse_duration(duration) or 0 # A duration that can't be parsed counts as 0 seconds.
+        self.lyrics = lyrics # The lines of the lyrics joined by LINE_SEPARATOR.
+
+    def lower_lyrics(self) -> str:
+        """lower_lyrics gets the lowercased lyrics, they are lowercased on each call instead of being kept.
+
+        Returns:
+            str: the lowercased lyrics.
+        """
+        return self.lyrics.lower()
+
+    def lines(self) -> list:
+        """lines gets the lines of the lyrics.
+
+        Returns:
+            list: each line, without LINE_SEPARATOR.
+        """
+        return self.lyrics.split(LINE_SEPARATOR)
+
+
+class stored_song_record(song_record):
+    """stored_song_record is a song_record whose lyrics stay in the lyrics file until they are read.
+
+    Its lyrics are read from the lyrics_store each time, so only the metadata of the song is held in memory.
+    """
+    __slots__ = ('store', 'pos')
+
+    def __init__(self, name : str, album : str, writers : str, duration : str, store : 'lyrics_store', pos : int):
+        self.name = name
+        self.album = album
+        self.writers = writers
+        self.duration = duration
+        self.secs = parse_duration(duration) or 0
+        self.store = store
+        self.pos = pos # Position of the song in the lyrics store.
+
+    @property
+    def lyrics(self) -> str:
+        return self.store.lyrics(self.pos)
+
+    def lower_lyrics(self) -> str:
+        """lower_lyrics reads the lowercased lyrics, which are saved in the lyrics file as well.
+
+        Returns:
+            str: the lowercased lyrics.
+        """
+        return self.store.lower(self.pos)
+
+
+class lyrics_store():
+    """lyrics_store reads the texts of a memory mapped lyrics file, only the pages of the texts that are read are loaded.
+
+    Each text is decoded from its own slice of the file, the whole file is never copied.
+    """
+    def __init__(self, lyrics_map : mmap.mmap, offsets : array, songs : int):
+        self.lyrics_map = lyrics_map
+        self.offsets = offsets # Offset of each text in the file, followed by the end of the last one.
+        self.songs = songs # Amount of songs, their lowercased lyrics come after the lyrics of all of them.
+
+    def text(self, index : int) -> str:
+        """text reads a text of the lyrics file.
+
+        Args:
+            index (int): the index of the text.
+
+        Returns:
+            str: the text.
+        """
+        return self.lyrics_map[self.offsets[index]:self.offsets[index + 1]].decode()
+
+    def lyrics(self, pos : int) -> str:
+        """lyrics reads the lyrics of a song.
+
+        Args:
+            pos (int): the position of the song in the database.
+
+        Returns:
+            str: the lines of the lyrics joined by LINE_SEPARATOR.
+        """
+        return self.text(pos)
+
+    def lower(self, pos : int) -> str:
+        """lower reads the lowercased lyrics of a song.
+
+        Args:
+            pos (int): the position of the song in the database.
+
+        Returns:
+            str: the lowercased lyrics.
+        """
+        return self.text(self.songs + pos)
+
+
+def open_lyrics(source_version : tuple, filepath : str = DB_LYRICS_PATH) -> Union[lyrics_store, None]:
+    """open_lyrics maps the lyrics file and reads its offsets.
+
+    Args:
+        source_version (tuple): (modification time, size) of the pink_db.json the lyrics file must have been made from.
+        filepath (str, optional): filepath to the lyrics file. Defaults to 'pink_db.lyrics'.
+
+    Returns:
+        Union[lyrics_store, None]: lyrics_store: the store of the lyrics file.
+                                   None: if the lyrics file is missing, of another format, not made from source_version or truncated.
+    """
+    try:
+        with open(filepath, 'rb') as lyrics_file:
+            # The map stays valid after the file is closed, or replaced by a newer lyrics file.
+            lyrics_map = mmap.mmap(lyrics_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None  # Missing or empty.
+
+    if len(lyrics_map) < LYRICS_HEADER.size:
+        return None
+    magic, version, mtime, size, songs = LYRICS_HEADER.unpack_from(lyrics_map)
+    if (magic, version, (mtime, size)) != (LYRICS_MAGIC, SNAPSHOT_VERSION, source_version):
+        return None
+
+    offsets = array(LYRICS_OFFSET_TYPE)
+    offsets_end = LYRICS_HEADER.size + (2 * songs + 1) * offsets.itemsize
+    if len(lyrics_map) < offsets_end:
+        return None
+    offsets.frombytes(lyrics_map[LYRICS_HEADER.size:offsets_end])
+    if offsets[-1] != len(lyrics_map):
+        return None
+    return lyrics_store(lyrics_map, offsets, songs)
+
+
+def build_records(db : dict) -> dict:
+    """build_records makes the records of the albums and songs of a database loaded from json.
+
+    Args:
+        db (dict): the database as in pink_db.json, with interned strings.
+
+    Returns:
+        dict: the album_record of each album name, in the order of the database.
+    """
+    return {album: album_record(album, album_data['Year'],
+                                tuple(song_record(song, album, song_data['Writers'], song_data['Duration'],
+                                                  LINE_SEPARATOR.join(song_data['Lyrics']))
+                                      for song, song_data in album_data['Songs'].items()))
+            for album, album_data in db.items()}
+
 
 class data(): # Approval from elinor.
-    """data class manages a db of pink_floyd with data from Pink_Floyd_DB.txt"""    
-    def __init__(self):
-        # Check if the json file exists.
-        if not os.path.exists('pink_db.json'):
+    """data class manages a db of pink_floyd with data from Pink_Floyd_DB.txt
+
+    With lazy_lyrics only the metadata and the indexes are loaded, the lyrics are read from the memory mapped lyrics file
+    when they are needed. The results are the same in both modes.
+    """    
+    def __init__(self, lazy_lyrics : bool = False):
+        self.lazy_lyrics = lazy_lyrics
+        # Check if the json file is missing or older than Pink_Floyd_DB.txt.
+        if self.json_outdated(self.get_db_version()):
             self.create_json()
 
-        with open('pink_db.json', 'r') as src_db:
-            self.pink_floyd_db = json.load(src_db)
+        self.load_db()
+
+    def get_db_version(self) -> tuple:
+        """get_db_version gets the version of the database files, it changes whenever one of them is modified.
+
+        Returns:
+            tuple: (modification time, size) of pink_db.json and of Pink_Floyd_DB.txt, None for a missing file.
+        """
+        version = []
+        for path in (DB_JSON_PATH, DB_SRC_PATH):
+            try:
+                stat = os.stat(path)
+                version.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                version.append(None)
+        return tuple(version)
+
+    def json_outdated(self, version : tuple) -> bool:
+        """json_outdated checks if pink_db.json has to be recreated from Pink_Floyd_DB.txt.
+
+        Args:
+            version (tuple): version of the database files, as returned by get_db_version.
+
+        Returns:
+            bool: True if pink_db.json is missing or Pink_Floyd_DB.txt is newer than it. Otherwise False.
+        """
+        json_version, src_version = version
+        return json_version is None or (src_version is not None and src_version[0] > json_version[0])
+
+    def load_db(self) -> None:
+        """load_db loads the database and all the indexes over it.
+
+        The snapshot is loaded if it was made from the current pink_db.json, otherwise the database
+        is loaded from pink_db.json, its indexes are built and the snapshot is rebuilt.
+        """
+        # Take the version before reading so a change made while loading is picked up by the next check of the server.
+        self.version = self.get_db_version()
+        if self.load_snapshot():
+            return
+
+        with open(DB_JSON_PATH, 'r') as src_db:
+            # Intern the strings so repeated names, writers and durations are stored once.
+            self.pink_floyd_db = build_records(json.load(src_db, object_hook=intern_strings))
+
+        self.build_durations()
+        self.build_song_index()
+        self.build_lyr_index()
+        self.build_word_rankings()
+        self.build_name_indexes()
+        self.save_snapshot()
+        if self.lazy_lyrics:
+            # Load the lyrics lazily from the lyrics file that was just saved, if saving it has failed they are kept loaded.
+            self.load_snapshot()
+
+    def load_snapshot(self, filepath : str = DB_SNAPSHOT_PATH, lyrics_path : str = DB_LYRICS_PATH) -> bool:
+        """load_snapshot loads the database and its indexes from the snapshot, in one read, and the lyrics from the lyrics file.
+
+        With lazy_lyrics the lyrics file is only mapped, and the songs are stored_song_records.
+
+        Args:
+            filepath (str, optional): filepath to the snapshot. Defaults to 'pink_db.snapshot'.
+            lyrics_path (str, optional): filepath to the lyrics file. Defaults to 'pink_db.lyrics'.
+
+        Returns:
+            bool: True if the snapshot was loaded. False if it or the lyrics file is missing, of another format
+                  or not made from the current pink_db.json.
+        """
+        try:
+            with open(filepath, 'rb') as snapshot_file:
+                snapshot = snapshot_file.read()
+        except FileNotFoundError:
+            return False
+
+        if len(snapshot) < SNAPSHOT_HEADER.size or SNAPSHOT_HEADER.unpack_from(snapshot) != (SNAPSHOT_MAGIC, SNAPSHOT_VERSION):
+            return False
+
+        try:
+            source_version, albums, fields = marshal.loads(memoryview(snapshot)[SNAPSHOT_HEADER.size:])
+        except (EOFError, ValueError, TypeError):
+            return False  # The snapshot is corrupted.
 
-    def create_json(self, filepath : str = './Pink_Floyd_DB.txt') -> None:
+        if source_version != self.version[0]:
+            return False
+        store = open_lyrics(source_version, lyrics_path)
+        if store is None:
+            return False
+
+        self.pink_floyd_db = {}
+        pos = 0
+        for album, year, songs in albums:
+            records = []
+            for song, writers, duration in songs:
+                if self.lazy_lyrics:
+                    records.append(stored_song_record(song, album, writers, duration, store, pos))
+                else:
+                    records.append(song_record(song, album, writers, duration, store.lyrics(pos)))
+                pos += 1
+            self.pink_floyd_db[album] = album_record(album, year, tuple(records))
+        for field, value in zip(SNAPSHOT_FIELDS, fields):
+            setattr(self, field, array(SNAPSHOT_ARRAYS[field], value) if field in SNAPSHOT_ARRAYS else value)
+        # The song index refers to the records, so it is built again instead of being saved.
+        self.build_song_index()
+        return True
+
+    def save_snapshot(self, filepath : str = DB_SNAPSHOT_PATH, lyrics_path : str = DB_LYRICS_PATH) -> None:
+        """save_snapshot saves the database and its indexes as a snapshot of the current pink_db.json, and the lyrics as its lyrics file.
+
+        Args:
+            filepath (str, optional): filepath to the snapshot. Defaults to 'pink_db.snapshot'.
+            lyrics_path (str, optional): filepath to the lyrics file. Defaults to 'pink_db.lyrics'.
+        """
+        # The lyrics file is saved first, a snapshot is only loaded with the lyrics file of the same pink_db.json.
+        if not self.save_lyrics(lyrics_path):
+            return
+
+        albums = tuple((album.name, album.year, tuple((song.name, song.writers, song.duration)
+                                                     for song in album.songs))
+                       for album in self.pink_floyd_db.values())
+        fields = tuple(getattr(self, field).tobytes() if field in SNAPSHOT_ARRAYS else getattr(self, field) for field in SNAPSHOT_FIELDS)
+        snapshot = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION) + marshal.dumps((self.version[0], albums, fields))
+
+        # Write to a temporary file first so a snapshot is never read half written.
+        tmp_path = f'{filepath}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as snapshot_file:
+                snapshot_file.write(snapshot)
+            os.replace(tmp_path, filepath)
+        except OSError:
+            # The snapshot only speeds up loading, the db works without it.
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def save_lyrics(self, filepath : str = DB_LYRICS_PATH) -> bool:
+        """save_lyrics saves the lyrics and the lowercased lyrics of every song as the lyrics file of the current pink_db.json.
+
+        Args:
+            filepath (str, optional): filepath to the lyrics file. Defaults to 'pink_db.lyrics'.
+
+        Returns:
+            bool: True if the lyrics file was saved. Otherwise False.
+        """
+        songs = [song for album in self.pink_floyd_db.values() for song in album.songs]
+        texts = [song.lyrics.encode() for song in songs] + [song.lyrics.lower().encode() for song in songs]
+        offsets = array(LYRICS_OFFSET_TYPE, [LYRICS_HEADER.size + (len(texts) + 1) * array(LYRICS_OFFSET_TYPE).itemsize])
+        for text in texts:
+            offsets.append(offsets[-1] + len(text))
+        header = LYRICS_HEADER.pack(LYRICS_MAGIC, SNAPSHOT_VERSION, *self.version[0], len(songs))
+
+        tmp_path = f'{filepath}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as lyrics_file:
+                lyrics_file.write(header)
+                lyrics_file.write(offsets.tobytes())
+                lyrics_file.writelines(texts)
+            os.replace(tmp_path, filepath)
+            return True
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+    def build_durations(self) -> None:
+        """build_durations parses the duration of every song once, and precomputes the album totals and the duration orders.
+
+        The song of each album (including song names that appear on several albums) is kept in self.song_refs
+        as (song, album), and its duration in seconds at the same position of the self.song_secs array.
+        """
+        self.song_refs = []
+        self.song_positions = {} # Positions of each song name in self.song_refs, the first is the song the name resolves to.
+        self.song_secs = array('L')
+        self.album_secs = {}
+
+        for album in self.pink_floyd_db.values():
+            start = len(self.song_secs)
+            for song in album.songs:
+                self.song_positions.setdefault(song.name, []).append(len(self.song_refs))
+                self.song_refs.append((song.name, album.name))
+                self.song_secs.append(song.secs)
+            self.album_secs[album.name] = sum(self.song_secs[start:])
+
+        # Albums from the longest to the shortest, albums of the same duration keep the order of the database.
+        self.album_ranking = sorted(self.album_secs, key=self.album_secs.get, reverse=True)
+        # Positions of the songs from the shortest to the longest and their durations, so ranges can be found by bisection.
+        self.secs_order = array('L', sorted(range(len(self.song_secs)), key=self.song_secs.__getitem__))
+        self.sorted_secs = array('L', (self.song_secs[pos] for pos in self.secs_order))
+
+    def build_song_index(self) -> None:
+        """build_song_index builds the lookup table of each song name to its song record.
+
+        A song name that appears on more than one album resolves to the first album (as sorted in the database),
+        the names and all their albums are kept in self.duplicate_songs.
+        """
+        self.song_index = {}
+        self.duplicate_songs = {}
+
+        for album in self.pink_floyd_db.values():
+            for song in album.songs:
+                if song.name in self.song_index:
+                    # Keep every album of the duplicated song, starting from the one it resolves to.
+                    self.duplicate_songs.setdefault(song.name, [self.song_index[song.name].album]).append(album.name)
+                    continue
+                self.song_index[song.name] = song
+
+    def build_lyr_index(self) -> None:
+        """build_lyr_index builds the inverted word index of all the lyrics in the database.
+
+        Each word (lowercased, as split by WORD_SEPARATOR in each line) is mapped to its postings,
+        a list of (song, album, positions) where positions are the indexes of the word in the song's lyrics.
+        """
+        self.lyr_index = {}
+
+        # Go over each word in each lyrics of each song in each album.
+        for album in self.pink_floyd_db.values():
+            for song in album.songs:
+                positions = {} # Positions of each word in the current song.
+                words = (word for line in song.lines() for word in line.split(WORD_SEPARATOR))
+                for pos, word in enumerate(words):
+                    if word:  # Empty words are created by consecutive separators.
+                        positions.setdefault(word.lower(), []).append(pos)
+
+                for word, word_pos in positions.items():
+                    self.lyr_index.setdefault(word, []).append((song.name, album.name, word_pos))
+
+    def build_word_rankings(self) -> None:
+        """build_word_rankings builds the word frequency rankings of all the lyrics, of each album and of each song.
+
+        Each ranking is a list of (word, occurrences) of the alphabetic words, from the most common, so the top K words
+        of any scope are its first K entries. Words of the same occurrences keep the order they first appear in.
+        A song name that appears on several albums is ranked by the song it resolves to.
+        """
+        word_counts = {}
+        album_counts = {album: {} for album in self.pink_floyd_db}
+        song_counts = {song: {} for song in self.song_index}
+
+        # Count the occurences of each alphabetic word from its postings in the lyrics index.
+        for word, postings in self.lyr_index.items():
+            if not word.isalpha():
+                continue
+            for song, album, word_pos in postings:
+                word_counts[word] = word_counts.get(word, 0) + len(word_pos)
+                album_counts[album][word] = album_counts[album].get(word, 0) + len(word_pos)
+                if self.song_index[song].album == album:
+                    song_counts[song][word] = len(word_pos)
+
+        def rank(counts: dict) -> list:
+            return sorted(counts.items(), key=lambda item: item[1], reverse=True)
+
+        self.word_ranking = rank(word_counts)
+        self.album_word_ranking = {album: rank(counts) for album, counts in album_counts.items()}
+        self.song_word_ranking = {song: rank(counts) for song, counts in song_counts.items()}
+
+    def build_name_indexes(self) -> None:
+        """build_name_indexes builds the n-gram, prefix and case insensitive indexes of the album names and the song names.
+
+        The song names are those of self.song_refs, so a song name that appears on several albums is there for each of them.
+        """
+        self.album_names = list(self.pink_floyd_db)
+        self.album_grams, self.album_prefixes, self.album_lower = build_name_index(self.album_names)
+        self.song_names = [song for song, _ in self.song_refs]
+        self.song_grams, self.song_prefixes, self.song_lower = build_name_index(self.song_names)
+
+    def find_album(self, album : str) -> Union[str, None]:
+        """find_album finds an album by its name, case insensitive if the exact name is not found.
+
+        Args:
+            album (str): the album name.
+
+        Returns:
+            Union[str, None]: str: the album name as in the database.
+                              None: if the album is not found in the database.
+        """
+        if album is None:
+            return None
+        return album if album in self.pink_floyd_db else self.album_lower.get(album.lower())
+
+    def find_song(self, song : str) -> Union[str, None]:
+        """find_song finds a song by its name, case insensitive if the exact name is not found.
+
+        Args:
+            song (str): the song name.
+
+        Returns:
+            Union[str, None]: str: the song name as in the database.
+                              None: if the song is not found in the database.
+        """
+        if song is None:
+            return None
+        return song if song in self.song_index else self.song_lower.get(song.lower())
+
+    def suggest_albums(self, album : str) -> list:
+        """suggest_albums finds album names close to an album name that wasn't found.
+
+        Args:
+            album (str): the album name.
+
+        Returns:
+            list: up to SUGGESTION_COUNT album names.
+        """
+        return suggest_names(album, self.album_names, self.album_grams, self.album_prefixes)
+
+    def suggest_songs(self, song : str) -> list:
+        """suggest_songs finds song names close to a song name that wasn't found.
+
+        Args:
+            song (str): the song name.
+
+        Returns:
+            list: up to SUGGESTION_COUNT song names.
+        """
+        return suggest_names(song, self.song_names, self.song_grams, self.song_prefixes)
+
+    def create_json(self, filepath : str = DB_SRC_PATH) -> None:
         """create_json creates a JSON file from the Pink_Floyd_DB.txt.
         
         Args:
@@ -27,35 +819,39 @@ class data(): # Approval from elinor.
 
         Raises:
             FileNotFoundError: error is raised whenever the database file has not been found.
+            ValueError: error is raised whenever the database file has malformed records, listing each with its line number.
         """
         if not os.path.exists(filepath):
             raise FileNotFoundError("Database hasn't been found in the path listed (Defaults to './Pink_Floyd_DB.txt'.")
 
-        formatted_db = {}
-        with open(filepath, 'r') as file:
-            # Split the files data based on '#' that is the prefix of each album.
-            album_list = sorted(file.read().split(ALBUM_PREFIX))
+        errors = []
+        albums = [] # (sort key, name, position in the spool, length) of each album.
+        # Each album is written to the spool as soon as it is parsed, so only one album is held in memory.
+        with tempfile.TemporaryFile('w+b') as spool:
+            for sort_key, album, album_data in parse_db(filepath, errors):
+                fragment = json.dumps(album_data, indent=JSON_INDENT).encode()
+                albums.append((sort_key, album, spool.tell(), len(fragment)))
+                spool.write(fragment)
 
-        del album_list[0] # delete the first index as its empty due to the file starting with '#'
+            if errors:
+                raise ValueError(f'Malformed records in {filepath}:\n' + '\n'.join(errors))
 
-        # Split each album into its songs based on '*' that is the prefix of each songs.
-        album_list = [album.split(SONG_PREFIX) for album in album_list]
-        # Split each song into its data based on '::' that seperates each data from one another.
-        album_list = [[song.split(SONG_DATA_SEPARATOR) for song in album] for album in album_list]
+            # Order the albums by their header, a repeated album name keeps its first position and its last data.
+            album_fragments = {}
+            for sort_key, album, position, length in sorted(albums):
+                album_fragments[album] = (position, length)
 
-        for album in album_list:
-            """We create a dict of all the songs in a given album.
-            song[0] is the name of the song, song[1] is a list of the writers of the song, song[2] is the duration of the song, song[3] are the lyrics of the song.
-            `song[3].split('\n')` - We take the lyrics of each song and split them at the newline.
-            `album[1:]` - We start from the second index because the first index contains the albums information."""
-            Songs = {song[0]: {'Writers': song[1], 'Duration': song[2], 'Lyrics': song[3].split('\n')} for song in sorted(album[1:])}
-            
-            # We add a new key album[0][0] aka album name, and add into it a dict with its year of release `int(album[0][1])` and its songs.
-            formatted_db[album[0][0]] = {'Year': int(album[0][1]), 'Songs': Songs}
-
-        with open('pink_db.json', 'w') as outfile:
-            # Convert the dict into json format and save into a file.
-            outfile.write(json.dumps(formatted_db, indent=5))
+            # Write to a temporary file first so pink_db.json is never read half written.
+            tmp_path = f'{DB_JSON_PATH}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as outfile:
+                # Write the albums as a json dict, in the same format as json.dumps(db, indent=JSON_INDENT).
+                outfile.write('{')
+                for cnt, (album, (position, length)) in enumerate(album_fragments.items()):
+                    spool.seek(position)
+                    fragment = spool.read(length).decode().replace('\n', '\n' + ' ' * JSON_INDENT)
+                    outfile.write('{0}\n{1}{2}: {3}'.format(',' if cnt else '', ' ' * JSON_INDENT, json.dumps(album), fragment))
+                outfile.write('\n}' if album_fragments else '}')
+            os.replace(tmp_path, DB_JSON_PATH)
 
     def get_albms(self, x = None) -> str:
         """get_albms gets all album names in the database.
@@ -78,7 +874,8 @@ class data(): # Approval from elinor.
             Union[str, None]: str: all songs in the album.
                                None: if the album is not found in the database.
         """        
-        return ', '.join(self.pink_floyd_db[album]['Songs'].keys()) if album in self.pink_floyd_db else None
+        album = self.find_album(album)
+        return ', '.join(song.name for song in self.pink_floyd_db[album].songs) if album is not None else None
 
     def get_sng_dur(self, song : str) -> Union[str, None]:
         """get_sng_dur gets a songs duration from a given song.
@@ -90,8 +887,8 @@ class data(): # Approval from elinor.
             Union[str, None]: str: the duration of the song.
                               None: if the song is not found in the database.
         """        
-        album = self.find_songs_albm(song)
-        return self.pink_floyd_db[album]['Songs'][song]['Duration'] if album is not None else None
+        song = self.find_song(song)
+        return self.song_index[song].duration if song is not None else None
 
     def get_song_lyr(self, song : str) -> Union[str, None]:
         """get_song_lyr gets a songs lyrics from a given song.
@@ -103,14 +900,8 @@ class data(): # Approval from elinor.
             Union[str, None]: str: the lyrics of the song.
                               None: if the song is not found in the database.
         """        
-        album = self.find_songs_albm(song)
-
-        if album is not None:
-            # Get the lyrics and convert it to a string.
-            lyrics = self.pink_floyd_db[album]['Songs'][song]['Lyrics']
-            return '\n'.join(lyrics) 
-        else:
-            return None
+        song = self.find_song(song)
+        return self.song_index[song].lyrics if song is not None else None
 
     def find_songs_albm(self, song : str) -> Union[str, None]:
         """find_songs_albm find the album for a given song.
@@ -122,12 +913,8 @@ class data(): # Approval from elinor.
             Union[str, None]: str: the album name.
                               None: if the song is not found associated to an album in the database.
         """
-        # Go over each song in each album.
-        for album in self.pink_floyd_db:
-            # Check if the song exists in the album.
-            if song in self.pink_floyd_db[album]['Songs']:
-                return album
-        return None
+        song = self.find_song(song)
+        return self.song_index[song].album if song is not None else None
 
     def songs_by_name(self, keyword : str) -> Union[str, None]:
         """songs_by_name finds all songs that contain the keyword in its name.
@@ -139,14 +926,10 @@ class data(): # Approval from elinor.
             Union[str, None]: str: str of songs that contain the keyword.
                                None: if no songs contain the keyword in the database.
         """        
-        songs = []
-        # Go over the name of each song in each album.
-        for album in self.pink_floyd_db:
-            for song in self.pink_floyd_db[album]['Songs']:
-                # Check if the name contain the keyword.
-                if keyword.lower() in song.lower():
-                    songs.append(song)
-
+        if keyword is None:
+            return None
+        # Find the song of each album that contain the keyword, in the order of the database.
+        songs = [self.song_names[pos] for pos in search_names(keyword, self.song_names, self.song_grams)]
         return None if not songs else ', '.join(songs)
 
     def songs_by_lyr(self, keyword : str) -> Union[str, None]:
@@ -159,48 +942,97 @@ class data(): # Approval from elinor.
             Union[str, None]: str: str of songs that contain the keyword in their lyrics.
                                None: if no songs are contain the keyword in their lyrics in the database.
         """        
-        songs = []
-        # Go over the lyrics of each song in each album.
-        for album in self.pink_floyd_db:
-            for song in self.pink_floyd_db[album]['Songs']:
-                # Check if the lyrics contain the keyword.
-                if keyword.lower() in self.get_song_lyr(song).lower():
-                    songs.append(song)
+        if keyword is None:
+            return None
+        keyword = keyword.lower()
+        # Every part of the keyword between separators must be inside a single word of the lyrics.
+        parts = [part for part in keyword.replace(LINE_SEPARATOR, WORD_SEPARATOR).split(WORD_SEPARATOR) if part]
+
+        # A song name is matched by the lyrics of the song it resolves to, so only the positions of those songs are candidates.
+        if parts:
+            candidates = None
+            for part in parts:
+                # Collect the songs that have a word containing the part, this also matches parts inside a word.
+                part_songs = {self.song_positions[song][0] for word, postings in self.lyr_index.items() if part in word
+                              for song, album, _ in postings if self.song_index[song].album == album}
+                candidates = part_songs if candidates is None else candidates & part_songs
+        else:  # The keyword is only separators so every song is a candidate.
+            candidates = (positions[0] for positions in self.song_positions.values())
+
+        # Check if the lyrics of each candidate contain the keyword, and list every position of its name in the order of the database.
+        matches = []
+        for candidate in candidates:
+            song = self.song_refs[candidate][0]
+            if keyword in self.song_index[song].lower_lyrics():
+                matches += self.song_positions[song]
+        songs = [self.song_refs[pos][0] for pos in sorted(matches)]
 
         return None if not songs else ', '.join(songs)
 
-    def fifty_most_common(self, x = None) -> str:
-        """fifty_most_common find the fifty most common words in each song in each album in the database.
-        
+    def fifty_most_common(self, options : str = None) -> Union[str, None]:
+        """fifty_most_common finds the most common words in the lyrics, fifty of all songs unless options are given.
+
+        The words are taken from the precomputed rankings, so the time depends on the amount of words and not on the lyrics.
+
         Args:
-            x: This argument is not used and is only made so we can pass an argument without error. Defaults to None.
-        
+            options (str, optional): options, format '<option>=<value>;...' with the options
+                                     'k' (amount of words), 'album' or 'song' (only count the lyrics of an album or a song)
+                                     and 'stopwords' (1 to leave out STOPWORDS). Defaults to None.
+
         Returns:
-            str: fifty most common words the lyrics of all songs in pink_floyd_db, format '<rank>. <word>:<occurence>'.
-        """     
-        common_words = {}
-        # Go over each word in each lyrics of each song in each album.
-        for album in self.pink_floyd_db:
-            for song, song_data in self.pink_floyd_db[album]['Songs'].items():
-                for line in song_data['Lyrics']:
-                    for word in line.split(' '):
-                        # Continue if the word is not alphanumeric.
-                        if not word.isalpha():
-                            continue
-                        # Try to add one to a key, if KeyError was raised set that key as one.
-                        try:
-                            common_words[word.lower()] += 1
-                        except KeyError:
-                            common_words[word.lower()] = 1
-        # Sort ascending the dictionary based on size of values.
-        top_50_common = dict(sorted(common_words.items(), key=lambda item: item[1], reverse=True)[:TOP_COMMON_COUNT])
-        
+            Union[str, None]: str: most common words, format '<rank>. <word>: <occurence>'.
+                              None: if the options are malformed, or the album or song is not found in the database.
+        """
+        options = self.parse_common_options(options)
+        if options is None:
+            return None
+
+        if 'album' in options:
+            ranking = self.album_word_ranking.get(self.find_album(options['album']))
+        elif 'song' in options:
+            ranking = self.song_word_ranking.get(self.find_song(options['song']))
+        else:
+            ranking = self.word_ranking
+        if ranking is None:
+            return None
+
         db_msg = [] # List of each ranking of words, used later to add easily the newlines.
-        # Create ranking msg for each word.
-        for cnt, (word, occur) in enumerate(top_50_common.items()):
-           db_msg += ['{0}. {1}: {2}'.format(cnt + 1, word, occur)]
+        # Create ranking msg for each word, until there are k words.
+        for word, occur in ranking:
+            if len(db_msg) == options['k']:
+                break
+            if options['stopwords'] and word in STOPWORDS:
+                continue
+            db_msg += ['{0}. {1}: {2}'.format(len(db_msg) + 1, word, occur)]
         return '\n'.join(db_msg) # Add the newline between each ranking.
-    
+
+    def parse_common_options(self, options : Union[str, None]) -> Union[dict, None]:
+        """parse_common_options parses the options of the most common words query.
+
+        Args:
+            options (Union[str, None]): the options, format '<option>=<value>;...', None for the defaults.
+
+        Returns:
+            Union[dict, None]: dict: the value of each given option, with 'k' and 'stopwords' always set.
+                               None: if an option is unknown, repeated or has an invalid value, or both 'album' and 'song' are given.
+        """
+        parsed = {}
+        for option in options.split(COMMON_OPTION_SEPARATOR) if options is not None else []:
+            name, assign, value = option.partition(COMMON_OPTION_ASSIGN)
+            name = name.strip().lower()
+            if not assign or name not in COMMON_OPTIONS or name in parsed:
+                return None
+            parsed[name] = value
+
+        if 'album' in parsed and 'song' in parsed:
+            return None
+        try:
+            parsed['k'] = int(parsed.get('k', TOP_COMMON_COUNT))
+            parsed['stopwords'] = bool(int(parsed.get('stopwords', 0)))
+        except ValueError:
+            return None
+        return parsed if parsed['k'] > 0 else None
+
     def albm_by_dur(self, x = None) -> str:
         """albm_by_dur gets each albums total duration and sorts them by size.
         
@@ -210,28 +1042,97 @@ class data(): # Approval from elinor.
         Returns:
             str: ranking of each album based on duration, format '<rank>. <album>:<duration>'.
         """        
-        album_durations = {}
-        # Go over the duration of each song in each album
-        for album in self.pink_floyd_db:
-            album_time = dt.datetime.strptime('00:00:00', '%H:%M:%S') # Empty the timestamp for the album.
-            for song, song_data in self.pink_floyd_db[album]['Songs'].items():
-                # Convert the duration to time() object.
-                cur_time = dt.datetime.strptime(song_data['Duration'], '%M:%S')
-                # Convert the time() object back to a string but with a new format.
-                cur_time = cur_time.strftime('%H:%M:%S')
-                # Convert the new string format back to a time() object.
-                cur_time = dt.datetime.strptime(cur_time, '%H:%M:%S')
-                
-                # Add the duration to the current duration sum of the album.
-                album_time = (album_time - TIME_ZERO + cur_time)
-            album_durations[album] = album_time # Add the album duration to the dict with its name as the key.
-        
-        # Sort ascending the dictionary based on size of values
-        album_durations = dict(sorted(album_durations.items(), key=lambda item: item[1], reverse=True))
-        
-        db_msg = []# List of each ranking of words, used later to add easily the newlines.
-        # Create ranking msg for each word.
-        for cnt, (album, album_dur) in enumerate(album_durations.items()):
-            db_msg += ['{0}. {1}: {2}'.format(cnt + 1, album, album_dur.strftime('%H:%M:%S'))]
-        return '\n'.join(db_msg) # Add the newline between each ranking.
+        return '\n'.join('{0}. {1}: {2}'.format(cnt + 1, album, format_duration(self.album_secs[album], hours=True))
+                         for cnt, album in enumerate(self.album_ranking))
+
+    def total_dur(self, x = None) -> str:
+        """total_dur gets the total duration of all songs in the database.
+
+        Args:
+            x: This argument is not used and is only made so we can pass an argument without error. Defaults to None.
+
+        Returns:
+            str: the total duration, format '<HH>:<MM>:<SS>'.
+        """
+        return format_duration(sum(self.album_secs.values()), hours=True)
 
+    def songs_by_dur(self, dur_range : Union[str, None]) -> Union[str, None]:
+        """songs_by_dur finds all songs with a duration in a range, from the shortest to the longest.
+
+        Args:
+            dur_range (Union[str, None]): the range, format '<MM>:<SS>-<MM>:<SS>' including both ends.
+
+        Returns:
+            Union[str, None]: str: str of songs in the range.
+                              None: if the range is missing or not in the format, or no songs are in the range.
+        """
+        if dur_range is None:
+            return None
+        bounds = [parse_duration(bound.strip()) for bound in dur_range.split(DURATION_RANGE_SEPARATOR)]
+        if len(bounds) != 2 or None in bounds:
+            return None
+
+        start = bisect.bisect_left(self.sorted_secs, bounds[0])
+        end = bisect.bisect_right(self.sorted_secs, bounds[1])
+        songs = [self.song_refs[pos][0] for pos in self.secs_order[start:end]]
+        return None if not songs else ', '.join(songs)
+
+    def longest_songs(self, count : str = None) -> Union[str, None]:
+        """longest_songs gets the longest songs in the database.
+
+        Args:
+            count (str, optional): amount of songs. Defaults to None, meaning TOP_DURATION_COUNT.
+
+        Returns:
+            Union[str, None]: str: ranking of the songs from the longest, format '<rank>. <song>: <duration>'.
+                              None: if count is not a positive number.
+        """
+        count = self.parse_count(count)
+        if count is None:
+            return None
+        return self.rank_songs(reversed(self.secs_order[max(len(self.secs_order) - count, 0):]))
+
+    def shortest_songs(self, count : str = None) -> Union[str, None]:
+        """shortest_songs gets the shortest songs in the database.
+
+        Args:
+            count (str, optional): amount of songs. Defaults to None, meaning TOP_DURATION_COUNT.
+
+        Returns:
+            Union[str, None]: str: ranking of the songs from the shortest, format '<rank>. <song>: <duration>'.
+                              None: if count is not a positive number.
+        """
+        count = self.parse_count(count)
+        if count is None:
+            return None
+        return self.rank_songs(self.secs_order[:count])
+
+    def parse_count(self, count : Union[str, None]) -> Union[int, None]:
+        """parse_count parses the amount of songs of the longest and shortest songs queries.
+
+        Args:
+            count (Union[str, None]): the amount, None for TOP_DURATION_COUNT.
+
+        Returns:
+            Union[int, None]: int: the amount.
+                              None: if the amount is not a positive number.
+        """
+        if count is None:
+            return TOP_DURATION_COUNT
+        try:
+            count = int(count)
+        except ValueError:
+            return None
+        return count if count > 0 else None
+
+    def rank_songs(self, positions : Iterator[int]) -> str:
+        """rank_songs creates the ranking of songs by their positions in self.song_refs.
+
+        Args:
+            positions (Iterator[int]): the positions of the songs, in the order of the ranking.
+
+        Returns:
+            str: the ranking, format '<rank>. <song>: <duration>'.
+        """
+        return '\n'.join('{0}. {1}: {2}'.format(cnt + 1, self.song_refs[pos][0], format_duration(self.song_secs[pos]))
+                         for cnt, pos in enumerate(positions))
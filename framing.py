@@ -0,0 +1,154 @@
+import re
+import socket as sock
+import struct
+from typing import List, Union # This module is used only for type hinting and no other purpose.
+
+"""Framing mode of the ASIB protocol.
+
+Right after the welcome message the client may send FRAMING_REQ with the highest framing version it supports.
+A server that supports framing answers FRAMING_RES with the version it chose, and from then on every message
+in both directions is sent as a frame: a FRAME_HEADER holding the length of the message, followed by the message.
+A server without framing treats the request as an invalid password, and both sides keep sending raw messages.
+"""
+FRAMING_VERSION = 1
+FRAMING_REQ = 'ASIBFRAME:{0}'
+FRAMING_RES = 'OK:ASIBFRAME&{0}'
+FRAME_HEADER = struct.Struct('!I') # Length of the message, 4 bytes big endian.
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+RECV_SIZE = 65536
+# Most requests a batch request may carry. Batch requests are sent in the framing mode, the server answers larger
+# ones with an error and the client splits its requests into batch requests of up to this.
+MAX_BATCH_REQUESTS = 256
+
+# Regex patterns.
+"""The pattern will match to a string if it has the following pattern:
+        `ASIBFRAME:` matches the characters 'ASIBFRAME:' (case sensitive).
+        First capturing group `(\d+)`:
+            `\d+` one or more digits.
+"""
+FRAMING_REQ_PTRN = re.compile(r'ASIBFRAME:(\d+)')
+
+
+def encode_frame(msg: bytes) -> bytes:
+    """encode_frame creates the frame of a message.
+
+    Args:
+        msg (bytes): the message.
+
+    Returns:
+        bytes: the length header followed by the message.
+    """
+    return FRAME_HEADER.pack(len(msg)) + msg
+
+
+def negotiate_version(req: bytes) -> Union[int, None]:
+    """negotiate_version checks if a message is a framing request and chooses the framing version for it.
+
+    Args:
+        req (bytes): the clients message.
+
+    Returns:
+        Union[int, None]: int: the framing version to use.
+                          None: if the message is not a framing request.
+    """
+    re_req = FRAMING_REQ_PTRN.fullmatch(req.decode(errors='replace'))
+    if re_req is None or int(re_req.group(1)) < 1:
+        return None
+    return min(int(re_req.group(1)), FRAMING_VERSION)
+
+
+class frame_reader():
+    """frame_reader buffers received bytes and splits them into whole messages, handling partial reads and several frames per read."""
+    def __init__(self, max_frame_size : int = MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self.buffer = bytearray()
+
+    def feed(self, data : bytes) -> List[bytes]:
+        """feed adds received bytes to the buffer and takes out every whole message in it.
+
+        Args:
+            data (bytes): the received bytes.
+
+        Raises:
+            ValueError: error is raised whenever a frame is larger than max_frame_size.
+
+        Returns:
+            List[bytes]: the whole messages received, in order.
+        """
+        self.buffer += data
+        msgs = []
+        start = 0
+        while len(self.buffer) - start >= FRAME_HEADER.size:
+            (length,) = FRAME_HEADER.unpack_from(self.buffer, start)
+            if length > self.max_frame_size:
+                raise ValueError(f'Frame of {length} bytes is larger than {self.max_frame_size} bytes.')
+
+            end = start + FRAME_HEADER.size + length
+            if end > len(self.buffer):  # The rest of the message has not been received yet.
+                break
+            msgs.append(bytes(self.buffer[start + FRAME_HEADER.size:end]))
+            start = end
+
+        del self.buffer[:start]
+        return msgs
+
+
+class framed_socket():
+    """framed_socket sends and receives whole messages over a socket in the framing mode.
+
+    It has the sendall and recv methods of a socket so it can be used in place of one.
+    """
+    def __init__(self, server_sock : sock.socket):
+        self.sock = server_sock
+        self.reader = frame_reader()
+        self.pending = [] # Messages that were received but not returned yet.
+
+    def sendall(self, msg : bytes) -> None:
+        """sendall sends a message as a frame.
+
+        Args:
+            msg (bytes): the message.
+        """
+        self.sock.sendall(encode_frame(msg))
+
+    def recv(self, bufsize : int = None) -> bytes:
+        """recv receives the next whole message.
+
+        Args:
+            bufsize: This argument is not used as the whole message is returned. Defaults to None.
+
+        Raises:
+            ConnectionError: error is raised whenever the connection ends in the middle of a message.
+
+        Returns:
+            bytes: the message, b'' if the connection ended between messages.
+        """
+        while not self.pending:
+            data = self.sock.recv(RECV_SIZE)
+            if not data:
+                if self.reader.buffer:
+                    raise ConnectionError('Connection ended in the middle of a message.')
+                return b''
+            self.pending += self.reader.feed(data)
+        return self.pending.pop(0)
+
+    def close(self) -> None:
+        """close closes the socket."""
+        self.sock.close()
+
+
+def negotiate_framing(server_sock : sock.socket) -> Union[framed_socket, sock.socket]:
+    """negotiate_framing asks the server for the framing mode, should be called right after receiving the welcome message.
+
+    Args:
+        server_sock (sock.socket): the socket with the server.
+
+    Returns:
+        Union[framed_socket, sock.socket]: framed_socket: if the server has agreed to the framing mode.
+                                           sock.socket: the same socket if the server does not support it.
+    """
+    server_sock.sendall(FRAMING_REQ.format(FRAMING_VERSION).encode())
+    response = server_sock.recv(RECV_SIZE).decode()
+    if response.startswith(FRAMING_RES.format('')):
+        return framed_socket(server_sock)
+    return server_sock
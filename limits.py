@@ -0,0 +1,270 @@
+from collections import OrderedDict
+from typing import Hashable, Union # This module is used only for type hinting and no other purpose.
+
+# Seconds of requests at its rate a token bucket holds, so a client may send short bursts above its rate.
+RATE_BURST_SECONDS = 1
+# Most addresses whose state is kept, the least recently seen ones are forgotten first.
+MAX_TRACKED_ADDRESSES = 65536
+# Failed logins of an address that are not delayed, as many as client.login_to_server allows.
+LOGIN_FREE_FAILURES = 3
+# Seconds an address waits after its first delayed failed login, doubled for each further failure up to the limiter's login_backoff.
+LOGIN_BACKOFF_BASE = 0.5
+# Seconds of each tick of the timer wheel of the idle connections, and its amount of slots.
+WHEEL_TICK = 1
+WHEEL_SLOTS = 512
+
+
+class token_bucket():
+    """token_bucket allows rate events per second on average, and bursts of up to burst events."""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate : float, burst : float, now : float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now : float, count : int = 1) -> bool:
+        """take takes the tokens of an event, refilling the tokens for the time since the last event.
+
+        An event is allowed while a token is left, even if it costs more tokens than the burst,
+        and the tokens it lacks are taken from the refill of the next events.
+
+        Args:
+            now (float): the time of the event, time.monotonic().
+            count (int, optional): the tokens the event costs. Defaults to 1.
+
+        Returns:
+            bool: True if the event is allowed. Otherwise False.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= count
+        return True
+
+
+class address_state():
+    """address_state is the state shared by the connections of one address."""
+    __slots__ = ('bucket', 'failures', 'retry_at')
+
+    def __init__(self, bucket : Union[token_bucket, None]):
+        self.bucket = bucket # Bucket of the requests and connections of the address, None if they are not limited.
+        self.failures = 0 # Failed logins since the last successful login.
+        self.retry_at = 0 # Time before which logins are refused.
+
+
+class client_state():
+    """client_state is the state of one connection kept by the limiter."""
+    __slots__ = ('owner', 'address', 'bucket', 'last_active', 'logged_on', 'closed')
+
+    def __init__(self, owner : object, address : address_state, bucket : Union[token_bucket, None], now : float):
+        self.owner = owner # The engine's object of the connection, returned when it is idle for too long.
+        self.address = address
+        self.bucket = bucket # Bucket of the requests of the connection, None if they are not limited.
+        self.last_active = now
+        self.logged_on = False
+        self.closed = False
+
+
+class timer_wheel():
+    """timer_wheel finds the items whose deadline has passed, in O(1) for each item added and each tick.
+
+    An item is kept in the slot of the tick of its deadline, so a deadline further away than the slots go around
+    is found early, and should be added again. Items are not removed, the caller skips the ones it no longer needs.
+    """
+    def __init__(self, tick : float, slot_count : int, now : float):
+        self.tick = tick
+        self.slots = [[] for _ in range(slot_count)]
+        self.next_tick = int(now // tick) # The first tick whose items were not returned yet.
+        self.size = 0
+
+    def add(self, item : object, deadline : float) -> None:
+        """add adds an item to the slot of its deadline.
+
+        Args:
+            item (object): the item.
+            deadline (float): the time the item is due.
+        """
+        tick = max(int(deadline // self.tick), self.next_tick)
+        self.slots[tick % len(self.slots)].append(item)
+        self.size += 1
+
+    def expire(self, now : float) -> list:
+        """expire takes the items of every tick that has ended by now.
+
+        Args:
+            now (float): the current time.
+
+        Returns:
+            list: the items, whose deadline has passed unless it is a slot count of ticks or more away.
+        """
+        end = int(now // self.tick)
+        due = []
+        # Each slot is visited at most once, even if the wheel was not expired for longer than it goes around.
+        for tick in range(self.next_tick, min(end, self.next_tick + len(self.slots))):
+            if not self.size:
+                break
+            slot = tick % len(self.slots)
+            due += self.slots[slot]
+            self.size -= len(self.slots[slot])
+            self.slots[slot] = []
+        self.next_tick = max(self.next_tick, end)
+        return due
+
+    def next_expiry(self) -> Union[float, None]:
+        """next_expiry gets the time expire should be called next.
+
+        Returns:
+            Union[float, None]: float: the end of the next tick.
+                                None: if the wheel is empty.
+        """
+        return (self.next_tick + 1) * self.tick if self.size else None
+
+
+class limiter():
+    """limiter applies the rate limits of the connections and of their addresses, the backoff of failed logins and the idle timeouts.
+
+    Handling each event is O(1), and the idle connections are found by a timer_wheel instead of going over all of them.
+    A rate, a timeout or a backoff of 0 disables it.
+    """
+    def __init__(self, client_rate : float = 0, address_rate : float = 0, idle_timeout : float = 0, login_timeout : float = 0,
+                 now : float = 0, login_backoff : float = 0):
+        self.client_rate = client_rate # Requests per second of each connection.
+        self.address_rate = address_rate # Requests and connections per second of each address.
+        self.idle_timeout = idle_timeout # Seconds a logged on connection may be idle.
+        self.login_timeout = login_timeout # Seconds a connection may be idle before logging on.
+        self.login_backoff = login_backoff # Most seconds an address waits to log on after failing too often.
+        self.addresses = OrderedDict() # State of each address, from the least recently seen.
+        self.wheel = timer_wheel(WHEEL_TICK, WHEEL_SLOTS, now)
+
+    def address(self, address : Hashable, now : float) -> address_state:
+        """address gets the state of an address, forgetting the least recently seen address if too many are kept.
+
+        Args:
+            address (Hashable): the address, the IP of the client.
+            now (float): the current time.
+
+        Returns:
+            address_state: the state.
+        """
+        state = self.addresses.get(address)
+        if state is not None:
+            self.addresses.move_to_end(address)
+            return state
+
+        bucket = token_bucket(self.address_rate, max(self.address_rate * RATE_BURST_SECONDS, 1), now) if self.address_rate else None
+        state = self.addresses[address] = address_state(bucket)
+        if len(self.addresses) > MAX_TRACKED_ADDRESSES:
+            self.addresses.popitem(last=False)
+        return state
+
+    def timeout(self, client : client_state) -> float:
+        """timeout gets the seconds a connection may be idle, 0 if it may be idle forever."""
+        return self.idle_timeout if client.logged_on else self.login_timeout
+
+    def connect(self, owner : object, address : Hashable, now : float) -> Union[client_state, None]:
+        """connect starts the state of a new connection, if its address has not used up its rate.
+
+        Args:
+            owner (object): the engine's object of the connection.
+            address (Hashable): the address, the IP of the client.
+            now (float): the current time.
+
+        Returns:
+            Union[client_state, None]: client_state: the state of the connection.
+                                       None: if the connection should be refused.
+        """
+        address = self.address(address, now)
+        if address.bucket is not None and not address.bucket.take(now):
+            return None
+
+        bucket = token_bucket(self.client_rate, max(self.client_rate * RATE_BURST_SECONDS, 1), now) if self.client_rate else None
+        client = client_state(owner, address, bucket, now)
+        if self.login_timeout or self.idle_timeout:
+            self.wheel.add(client, now + (self.login_timeout or self.idle_timeout))
+        return client
+
+    def allow(self, client : client_state, now : float, count : int = 1) -> bool:
+        """allow checks a message of a connection against the rate limits, and marks the connection active.
+
+        Args:
+            client (client_state): the state of the connection.
+            now (float): the current time.
+            count (int, optional): the requests the message carries. Defaults to 1.
+
+        Returns:
+            bool: True if the message should be handled. Otherwise False.
+        """
+        client.last_active = now
+        if client.bucket is not None and not client.bucket.take(now, count):
+            return False
+        return client.address.bucket is None or client.address.bucket.take(now, count)
+
+    def login_wait(self, client : client_state, now : float) -> float:
+        """login_wait gets the seconds until the address of a connection may try to log on again.
+
+        Args:
+            client (client_state): the state of the connection.
+            now (float): the current time.
+
+        Returns:
+            float: the seconds, 0 if it may try now.
+        """
+        return max(client.address.retry_at - now, 0)
+
+    def login_failed(self, client : client_state, now : float) -> None:
+        """login_failed counts a failed login of the address of a connection, and delays its next login once it failed too often.
+
+        Args:
+            client (client_state): the state of the connection.
+            now (float): the current time.
+        """
+        address = client.address
+        address.failures += 1
+        if self.login_backoff and address.failures > LOGIN_FREE_FAILURES:
+            # The exponent is capped so the delay never overflows a float.
+            delay = LOGIN_BACKOFF_BASE * 2 ** min(address.failures - LOGIN_FREE_FAILURES - 1, 32)
+            address.retry_at = now + min(delay, self.login_backoff)
+
+    def login_succeeded(self, client : client_state) -> None:
+        """login_succeeded resets the failed logins of the address of a connection, and gives the connection the idle timeout.
+
+        Args:
+            client (client_state): the state of the connection.
+        """
+        client.address.failures = 0
+        client.logged_on = True
+
+    def disconnect(self, client : client_state) -> None:
+        """disconnect ends the state of a connection, the timer wheel drops it when it is due."""
+        client.closed = True
+
+    def expire(self, now : float) -> list:
+        """expire finds the connections that have been idle for longer than their timeout.
+
+        Args:
+            now (float): the current time.
+
+        Returns:
+            list: the owner of each connection, the engine should disconnect them.
+        """
+        idle = []
+        for client in self.wheel.expire(now):
+            if client.closed:
+                continue
+            timeout = self.timeout(client)
+            if timeout and client.last_active + timeout <= now:
+                client.closed = True
+                idle.append(client.owner)
+            elif timeout:
+                self.wheel.add(client, client.last_active + timeout)
+            elif not client.logged_on and self.idle_timeout:
+                # Without a login timeout the connection is checked again, as it gets the idle timeout once it logs on.
+                self.wheel.add(client, now + self.idle_timeout)
+        return idle
+
+    def next_expiry(self) -> Union[float, None]:
+        """next_expiry gets the time expire should be called next, None if no connection has a timeout."""
+        return self.wheel.next_expiry()
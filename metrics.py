@@ -0,0 +1,145 @@
+import bisect
+import threading
+import time
+from typing import Callable # This module is used only for type hinting and no other purpose.
+
+# Upper bounds (seconds) of the latency histogram buckets, the last bucket holds everything slower.
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, float('inf'))
+PERCENTILES = (50, 95, 99)
+
+class histogram():
+    """histogram counts latencies in the LATENCY_BUCKETS, it is updated under the lock of its metrics."""
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds : float) -> None:
+        """observe adds a latency to the histogram.
+
+        Args:
+            seconds (float): the latency.
+        """
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, pct : float) -> float:
+        """percentile estimates a percentile as the upper bound of the bucket it falls in.
+
+        Args:
+            pct (float): the percentile, 0 to 100.
+
+        Returns:
+            float: the upper bound of the bucket in seconds.
+        """
+        rank = pct / 100 * self.count
+        seen = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return LATENCY_BUCKETS[-1]
+
+
+class metrics():
+    """metrics holds the counters, gauges and latency histograms of the server.
+
+    The requests and latencies are also recorded by the threads of the heavy pool, so they are updated and read under a lock.
+    The other counters are only updated by the engine's thread.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start_time = time.monotonic()
+        self.connections = 0 # Gauge of connected clients.
+        self.unapproved = 0 # Gauge of connected clients that have not logged on yet.
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.logins = 0
+        self.login_failures = 0
+        self.login_backoffs = 0 # Logins refused without checking the password, as their address has failed too often.
+        self.rate_limited = 0 # Messages answered with ERR_RATE.
+        self.connections_refused = 0 # Connections closed on accept, as their address has opened too many.
+        self.idle_evictions = 0 # Clients disconnected after being idle for too long.
+        self.requests = {} # Count of requests of each ASIB code.
+        self.errors = {} # Count of error responses of each ASIB code.
+        self.timers = {} # Latency histogram of each (hook, ASIB code).
+
+    def observe(self, hook : str, code : int, seconds : float) -> None:
+        """observe adds a latency to the histogram of a hook and code.
+
+        Args:
+            hook (str): the name of the timed function.
+            code (int): the ASIB code, None for hooks that are not per code.
+            seconds (float): the latency.
+        """
+        with self.lock:
+            timer = self.timers.get((hook, code))
+            if timer is None:
+                timer = self.timers[(hook, code)] = histogram()
+            timer.observe(seconds)
+
+    def timed(self, hook : str, code : int, func : Callable) -> Callable:
+        """timed wraps a function so the latency of each call is observed.
+
+        Args:
+            hook (str): the name of the timed function.
+            code (int): the ASIB code, None for hooks that are not per code.
+            func (Callable): the function.
+
+        Returns:
+            Callable: the wrapped function.
+        """
+        def timed_func(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe(hook, code, time.perf_counter() - start)
+        return timed_func
+
+    def count_request(self, code : int, response : bytes) -> None:
+        """count_request counts a request of an ASIB code, and its error response if it is one.
+
+        Args:
+            code (int): the ASIB code.
+            response (bytes): the response to the request.
+        """
+        with self.lock:
+            self.requests[code] = self.requests.get(code, 0) + 1
+            if not response.startswith(b'OK'):
+                self.errors[code] = self.errors.get(code, 0) + 1
+
+    def dump(self, cache_stats : dict) -> str:
+        """dump formats all the metrics as text, one '<name> <value>' per line.
+
+        Args:
+            cache_stats (dict): the counters of the response caches.
+
+        Returns:
+            str: the metrics.
+        """
+        lines = [f'uptime_seconds {time.monotonic() - self.start_time:.1f}',
+                 f'connections_active {self.connections}',
+                 f'connections_unapproved {self.unapproved}',
+                 f'bytes_in {self.bytes_in}',
+                 f'bytes_out {self.bytes_out}',
+                 f'logins {self.logins}',
+                 f'login_failures {self.login_failures}',
+                 f'login_backoffs {self.login_backoffs}',
+                 f'rate_limited {self.rate_limited}',
+                 f'connections_refused {self.connections_refused}',
+                 f'idle_evictions {self.idle_evictions}']
+        lines += [f'cache_{name} {value}' for name, value in cache_stats.items()]
+        with self.lock:
+            for code in sorted(self.requests):
+                lines.append(f'requests{{code={code}}} {self.requests[code]} errors={self.errors.get(code, 0)}')
+
+            for (hook, code), timer in sorted(self.timers.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+                name = hook if code is None else f'{hook}{{code={code}}}'
+                pcts = ' '.join(f'p{pct}<={timer.percentile(pct) * 1000:g}ms' for pct in PERCENTILES)
+                buckets = ','.join(f'{bound * 1000:g}:{count}' for bound, count in zip(LATENCY_BUCKETS, timer.counts) if count)
+                lines.append(f'{name} count={timer.count} mean={timer.total / timer.count * 1000:.3f}ms {pcts} le_ms={buckets}')
+        return '\n'.join(lines)
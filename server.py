@@ -1,23 +1,108 @@
 import socket as sock
-import select
+import selectors
+import asyncio
+import argparse
+import os
+import sys
+import gc
+import time
+import signal
 import re
 import hashlib
+import threading
+import heapq
+import collections
+import concurrent.futures
+from typing import Union # This module is used only for type hinting and no other purpose.
 from data import data
+from cache import lru_cache
+from metrics import metrics
+from framing import FRAMING_RES, FRAME_HEADER, MAX_BATCH_REQUESTS, encode_frame, negotiate_version, frame_reader
+from compression import COMPRESSION_RES, COMPRESSION_THRESHOLD, pack_msg, negotiate_version as negotiate_compression_version
+from limits import limiter, client_state, WHEEL_TICK, LOGIN_FREE_FAILURES, LOGIN_BACKOFF_BASE
 
 LISTEN_PORT = 7160
-MAX_CLIENTS = 5
+# Listen backlog of both engines, the system may lower it (net.core.somaxconn on Linux).
+LISTEN_BACKLOG = 4096
+# Most clients the select engine accepts at once before serving the connected ones.
+ACCEPT_BATCH = 64
+REQ_RECV_SIZE = 1024
+# Largest request frame accepted from a client in the framing mode.
+MAX_REQ_FRAME_SIZE = 1024 * 1024
+# Amount of buffered outgoing bytes per client before reading from it is paused, in both engines.
+WRITE_HIGH_WATER = 64 * 1024
+# Seconds to wait for the pending responses of the clients to be sent when stopping.
+CLOSE_TIMEOUT = 5
+ENGINES = ('select', 'asyncio')
+# A worker that crashes sooner than this after starting is restarted only after this delay, to avoid a crash loop.
+WORKER_RESTART_DELAY = 1
+# Seconds between the metrics dumps of --metrics-interval.
+METRICS_INTERVAL = 60
+# Seconds between the checks of the db files for changes, the default of --reload-interval.
+RELOAD_INTERVAL = 1
+# Limits of the cache of responses for requests with data.
+CACHE_MAX_ENTRIES = 1024
+CACHE_MAX_BYTES = 4 * 1024 * 1024
+# Threads of the heavy pool, the default of --heavy-workers. One is enough as they share the GIL with the engine.
+HEAVY_WORKERS = 1
+# Most heavy requests queued or running on the heavy pool, more are answered with ERR_BUSY.
+HEAVY_QUEUE_LIMIT = 64
+# Seconds a thread holds the GIL before handing it over while the heavy pool runs, shorter than Python's 5ms
+# default so the engine gets back to its clients soon after each blocking call while heavy requests run.
+HEAVY_SWITCH_INTERVAL = 0.0005
+# Requests per second of each connection and of each client address, the defaults of --client-rate and --address-rate, 0 for no limit.
+CLIENT_RATE = 0
+ADDRESS_RATE = 0
+# Seconds a logged on client may be idle before it is disconnected, the default of --idle-timeout, 0 to never disconnect it.
+# Off like the rates, as the interactive client waits on its user at the password prompt and at the menu.
+IDLE_TIMEOUT = 0
+# Seconds a client may be idle before logging on, up to the idle timeout.
+LOGIN_TIMEOUT = 30
+# Most seconds an address waits to log on after failing too often, the default of --login-backoff, 0 to never delay logins.
+# Off like the rates, as the clients behind a shared address would delay each other.
+LOGIN_BACKOFF = 0
 
-DB = data()  # Create the db object so we can create the list of commands.
+# The db the requests are answered from, loaded by main in the lyrics mode of --lazy-lyrics and replaced as a whole when its files change.
+DB: data = None
+# The commands of the db, called with the db and the request data.
 REQ_COMMANDS = {
-    200: DB.get_albms,
-    207: DB.get_albm_songs,
-    214: DB.get_sng_dur,
-    221: DB.get_song_lyr,
-    228: DB.find_songs_albm,
-    235: DB.songs_by_name,
-    242: DB.songs_by_lyr,
-    256: DB.fifty_most_common,
-    263: DB.albm_by_dur
+    200: data.get_albms,
+    207: data.get_albm_songs,
+    214: data.get_sng_dur,
+    221: data.get_song_lyr,
+    228: data.find_songs_albm,
+    235: data.songs_by_name,
+    242: data.songs_by_lyr,
+    256: data.fifty_most_common,
+    263: data.albm_by_dur,
+    284: data.total_dur,
+    291: data.songs_by_dur,
+    298: data.longest_songs,
+    305: data.shortest_songs
+}
+# Commands that scan the lyrics of the catalogue, run on the heavy pool so the engine keeps serving the other
+# requests meanwhile, with the seconds each may take before the client is answered with ERR_TIMEOUT.
+# A batch request with any of them runs on the heavy pool as a whole, and may take the sum of their timeouts.
+# The commands answered from indexes (235, 256 and 291) are answered inline, as their time is mostly building the
+# response, which a thread of the pool would not take off the engine.
+HEAVY_COMMANDS = {
+    242: 5
+}
+# Most seconds a heavy request may take, however many heavy requests a batch request carries.
+MAX_HEAVY_TIMEOUT = 30
+# Commands that look up a name, with the db method that suggests names when it isn't found.
+SUGGEST_COMMANDS = {
+    207: data.suggest_albums,
+    214: data.suggest_songs,
+    221: data.suggest_songs,
+    228: data.suggest_songs
+}
+# Commands whose responses without data are computed once per version of the db.
+STATIC_COMMANDS = {
+    200: 'ABMLIST',
+    256: 'FIVEMOSTCOM',
+    263: 'ABMBYDUR',
+    284: 'TOTALDUR'
 }
 
 WELCOME_MSG = 'Welcome to PinkFloyd Archive Server!\n'
@@ -26,9 +111,26 @@ RES_FORMAT = 'OK:{0}&{1}'
 
 ERR_SYNTAX = '700:ERROR:BADREQ:Invalid command was received.'
 ERR_DB_FORMAT = "707:ERROR:UNKNOWN:\"{0}\" wasn't found."
+ERR_DB_SUGGEST_FORMAT = "707:ERROR:UNKNOWN:\"{0}\" wasn't found, did you mean: {1}?"
 ERR_PASS = "714:ERROR:INVALIDPASS:Password is invalid."
+ERR_ADMIN = "721:ERROR:FORBIDDEN:Only an admin may request this."
+ERR_METRICS = "728:ERROR:DISABLED:Metrics are disabled, start the server with --metrics."
+ERR_BUSY = "735:ERROR:BUSY:The server is busy, try again later."
+ERR_TIMEOUT = "742:ERROR:TIMEOUT:The request has taken too long."
+ERR_RATE = "749:ERROR:RATELIMIT:Too many requests, slow down."
+ERR_BACKOFF = "756:ERROR:BACKOFF:Too many failed logins, try again in {0:.1f} seconds."
+ERR_INTERNAL = "763:ERROR:INTERNAL:The request has failed."
+ERR_BATCH_SIZE = "770:ERROR:TOOLARGE:A batch request may carry up to {0} requests."
 
 EXIT_CODE = 249
+# A batch request carries ASIB requests separated by BATCH_SEPARATOR as its data,
+# and its response carries each of their responses as '<length in bytes>:<response>'.
+BATCH_CODE = 270
+BATCH_SEPARATOR = '\n'
+BATCH_PART_FORMAT = '{0}:'
+BATCH_CODE_PREFIX = f'{BATCH_CODE}:'.encode()
+# Admin only request for the servers metrics.
+STATS_CODE = 277
 
 # Regex patterns.
 """The pattern will match to a string if it has the following pattern:
@@ -47,8 +149,42 @@ REQ_PTRN = re.compile(r'(\d{3}):([A-Z]+)(?:&(.+))?')
 
 # The password is ItayComeHome.
 HASH_PASSWORD = '7514b4069f27f8ca9080ec4ab6daedd0'
-# Global list of sockets that are not yet allowed to log on to the server.
-unapproved_list = []
+# The admin password is taken from the environment, without it no client can log on as an admin.
+ADMIN_PASS_ENV = 'PINK_FLOYD_ADMIN_PASS'
+ADMIN_HASH_PASSWORD = hashlib.md5(os.environ[ADMIN_PASS_ENV].encode()).hexdigest() if os.environ.get(ADMIN_PASS_ENV) else None
+# Access levels of a client.
+ACCESS_NONE = 0
+ACCESS_USER = 1
+ACCESS_ADMIN = 2
+# Global dict of the asyncio engine's connections, from each stream writer to its access level.
+async_connections = {}
+# Set by SIGTERM, the engines finish the requests they are handling and stop.
+stop_requested = False
+# Global dict of the encoded responses of STATIC_COMMANDS, made from DB.
+static_responses = {}
+# Global cache of the encoded responses of all other requests, keyed by (code, request name, data).
+response_cache = lru_cache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
+# Global cache of the responses packed for the compression mode, keyed as response_cache, as (response, packed response).
+# A packed response is only used for the very response it was made from, so it is compressed once while that response is cached.
+compressed_cache = lru_cache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, sizeof=lambda entry: len(entry[0]) + len(entry[1]))
+# A db loaded by the reload thread from changed files, swapped in by the engine before its next request.
+pending_db = None
+# Global metrics of the server, None when metrics are disabled so the engines skip counting.
+stats = None
+# Guards the response caches and the swap of the db, as heavy requests are answered on the threads of the heavy pool.
+cache_lock = threading.Lock()
+# The thread pool of the heavy requests, None when they are answered inline (--heavy-workers 0).
+heavy_pool = None
+# Slots of the heavy requests queued or running on heavy_pool, HEAVY_QUEUE_LIMIT of them.
+heavy_slots = threading.BoundedSemaphore(HEAVY_QUEUE_LIMIT)
+# Heavy requests of the select engine that have finished, as (connection, future), and the socket that wakes up its loop for them.
+finished_jobs = collections.deque()
+select_wakeup_sock = None
+# Heap of the deadlines of the heavy requests of the select engine, as (deadline, sequence number, connection, future).
+job_deadlines = []
+job_sequence = 0
+# The rate limits, login backoff and idle timeouts of the clients of each serving process, made by main.
+client_limiter = limiter()
 
 # These constants are only used for aestetic reasons, and has no effect in the codes structure.
 RED = '\033[91m'
@@ -57,21 +193,217 @@ WHITE = '\033[0m'
 GREEN = '\033[92m'
 
 
-def login(sock: sock.socket, client_pass: bytes) -> None:
-    """login verifies if the clients pass is valid.
+class connection():
+    """connection is the state of a client of the select engine, registered with its socket in the selector."""
+    __slots__ = ('sock', 'access', 'limits', 'reader', 'compress', 'send_buffer', 'events', 'waiting', 'job')
+
+    def __init__(self, client_sock : sock.socket):
+        self.sock = client_sock
+        self.access = ACCESS_NONE
+        self.limits = None # client_state of the client in client_limiter.
+        self.reader = None # frame_reader of the client once it uses the framing mode.
+        self.compress = False # Whether the client uses the compression mode.
+        self.send_buffer = bytearray() # Outgoing bytes that were not sent yet.
+        self.events = selectors.EVENT_READ # Events the socket is registered for.
+        self.waiting = collections.deque() # Received messages that were not handled yet, while a heavy request runs.
+        self.job = None # Future of the heavy request of the client that runs on the heavy pool.
+
 
-    If password found valid, then the client is removed from the unapproved_list.
-    Otherwise we continue as is.
+def login(client: client_state, client_pass: bytes) -> tuple:
+    """login verifies if the clients pass is valid, unless the clients address has to wait after failing too many times.
+
+    If password found valid, then the client gets the access level of the password.
+    Otherwise the failure is counted, and the address waits longer after each failure once it failed too often.
 
     Args:
-        sock (sock.socket): clients socket.
+        client (client_state): the clients state in client_limiter.
         client_pass (bytes): the clients password sent.
+
+    Returns:
+        tuple: (the access level of the client, ACCESS_NONE unless the password is valid, encoded response to the login attempt).
     """
-    if hashlib.md5(client_pass).hexdigest() == HASH_PASSWORD:
-        unapproved_list.remove(sock)
-        sock.sendall("OK".encode())
+    now = time.monotonic()
+    wait = client_limiter.login_wait(client, now)
+    if wait:
+        # The password is not even checked while the address waits.
+        if stats is not None:
+            stats.login_backoffs += 1
+        return ACCESS_NONE, ERR_BACKOFF.format(wait).encode()
+
+    access = check_password(client_pass)
+    if access:
+        client_limiter.login_succeeded(client)
+        if stats is not None:
+            stats.unapproved -= 1
+        return access, "OK".encode()
     else:
-        sock.sendall(ERR_PASS.encode())
+        client_limiter.login_failed(client, now)
+        return ACCESS_NONE, ERR_PASS.encode()
+
+
+def check_password(client_pass: bytes) -> int:
+    """check_password checks if the clients password is the servers password or the admin password.
+
+    Args:
+        client_pass (bytes): the clients password sent.
+
+    Returns:
+        int: ACCESS_USER or ACCESS_ADMIN if the password is valid. Otherwise ACCESS_NONE.
+    """
+    pass_hash = hashlib.md5(client_pass).hexdigest()
+    if pass_hash == HASH_PASSWORD:
+        return ACCESS_USER
+    if ADMIN_HASH_PASSWORD is not None and pass_hash == ADMIN_HASH_PASSWORD:
+        return ACCESS_ADMIN
+    return ACCESS_NONE
+
+
+def handle_request(req: bytes, admin: bool = False, compress: bool = False) -> bytes:
+    """handle_request creates the response for a request of a client that has logged on.
+
+    Args:
+        req (bytes): the clients request.
+        admin (bool, optional): whether the client has logged on as an admin. Defaults to False.
+        compress (bool, optional): whether the client uses the compression mode. Defaults to False.
+
+    Returns:
+        bytes: encoded response, an error if the request does not fit the ASIB protocol or ERR_INTERNAL if it has failed.
+               Packed by pack_msg in the compression mode.
+    """
+    # Check if the message received fits the requests of ASIB protocol, which a message that isn't UTF-8 does not.
+    try:
+        req = req.decode()
+    except UnicodeDecodeError:
+        return pack_msg(ERR_SYNTAX.encode()) if compress else ERR_SYNTAX.encode()
+    re_req = REQ_PTRN.search(req)
+
+    try:
+        if re_req is not None and int(re_req.group(1)) == BATCH_CODE:
+            sub_reqs = split_batch(req, re_req)
+            if len(sub_reqs) > MAX_BATCH_REQUESTS:
+                response = ERR_BATCH_SIZE.format(MAX_BATCH_REQUESTS).encode()
+            else:
+                response = create_batch_response(re_req.group(2), sub_reqs, admin)
+            return pack_msg(response) if compress else response
+
+        return compress_response(re_req, respond(re_req, admin)) if compress else respond(re_req, admin)
+    except Exception as err:
+        # A request that fails is answered with an error, the client and the others stay served.
+        print(f'{RED}[ERROR]: {WHITE}"{req}" has failed: {err!r}')
+        return pack_msg(ERR_INTERNAL.encode()) if compress else ERR_INTERNAL.encode()
+
+
+def respond(re_req: Union[re.Match, None], admin: bool = False) -> bytes:
+    """respond creates the response for an ASIB request that is not a batch request.
+
+    Args:
+        re_req (Union[re.Match, None]): the regex match of the clients ASIB request, None if it did not match.
+        admin (bool, optional): whether the client has logged on as an admin. Defaults to False.
+
+    Returns:
+        bytes: encoded response, an error if the request does not fit the ASIB protocol.
+    """
+    if re_req is None or int(re_req.group(1)) not in REQ_COMMANDS and int(re_req.group(1)) not in (EXIT_CODE, STATS_CODE):
+        return ERR_SYNTAX.encode()
+
+    if int(re_req.group(1)) == EXIT_CODE:
+        return GOODBYE_MSG.encode()
+
+    if int(re_req.group(1)) == STATS_CODE:
+        if not admin:
+            return ERR_ADMIN.encode()
+        if stats is None:
+            return ERR_METRICS.encode()
+        return RES_FORMAT.format(re_req.group(2), stats.dump(cache_stats())).encode()
+
+    # If all is well, send the client its requested data.
+    return create_response(re_req)
+
+
+def split_batch(req: str, re_req: re.Match) -> list:
+    """split_batch splits the data of a batch request into its ASIB requests.
+
+    Args:
+        req (str): the clients batch request.
+        re_req (re.Match): the regex match of the batch request.
+
+    Returns:
+        list: the ASIB requests in the batch request.
+    """
+    # The data of a batch request spans several lines, so it is taken as is from the start of the data.
+    return req[re_req.start(3):].split(BATCH_SEPARATOR) if re_req.group(3) is not None else []
+
+
+def request_count(req: bytes) -> int:
+    """request_count counts the ASIB requests a message carries for the rate limits, the requests of a batch request each count.
+
+    Args:
+        req (bytes): the clients message.
+
+    Returns:
+        int: the amount of requests, at least 1 and up to MAX_BATCH_REQUESTS.
+    """
+    if BATCH_CODE_PREFIX not in req:
+        return 1  # Most messages aren't batch requests, so they aren't decoded and matched.
+    try:
+        req = req.decode()
+    except UnicodeDecodeError:
+        return 1
+
+    re_req = REQ_PTRN.search(req)
+    if re_req is None or int(re_req.group(1)) != BATCH_CODE:
+        return 1
+    # A batch request with too many requests is answered with an error, but still costs as much as the largest one.
+    return min(max(len(split_batch(req, re_req)), 1), MAX_BATCH_REQUESTS)
+
+
+def create_batch_response(req_name: str, sub_reqs: list, admin: bool = False) -> bytes:
+    """create_batch_response creates the response for a batch request by responding to each of its requests.
+
+    Args:
+        req_name (str): the request name of the batch request.
+        sub_reqs (list): the ASIB requests in the batch request.
+        admin (bool, optional): whether the client has logged on as an admin. Defaults to False.
+
+    Returns:
+        bytes: encoded response, format 'OK:<name>&' followed by '<length>:<response>' for each request.
+    """
+    parts = [RES_FORMAT.format(req_name, '').encode()]
+    for sub_req in sub_reqs:
+        re_sub_req = REQ_PTRN.search(sub_req)
+        # Batch requests can't be nested.
+        if re_sub_req is not None and int(re_sub_req.group(1)) == BATCH_CODE:
+            re_sub_req = None
+
+        response = respond(re_sub_req, admin)
+        parts += [BATCH_PART_FORMAT.format(len(response)).encode(), response]
+    return b''.join(parts)
+
+
+def compress_response(re_req: Union[re.Match, None], response: bytes) -> bytes:
+    """compress_response packs a response for the compression mode, compressing the responses of the db commands once while they are cached.
+
+    Args:
+        re_req (Union[re.Match, None]): the regex match of the clients ASIB request, None if it did not match.
+        response (bytes): the encoded response.
+
+    Returns:
+        bytes: the response packed by pack_msg.
+    """
+    if re_req is None or int(re_req.group(1)) not in REQ_COMMANDS or len(response) < COMPRESSION_THRESHOLD:
+        return pack_msg(response)
+
+    key = re_req.group(1, 2, 3)
+    with cache_lock:
+        entry = compressed_cache.get(key)
+    # The entry may have been made from a response of an older db, or from a response that was not cached.
+    if entry is not None and entry[0] is response:
+        return entry[1]
+
+    packed = pack_msg(response)
+    with cache_lock:
+        compressed_cache.put(key, (response, packed))
+    return packed
 
 
 def create_response(re_req: re.Pattern[str]) -> bytes:
@@ -83,70 +415,918 @@ def create_response(re_req: re.Pattern[str]) -> bytes:
     Returns:
         bytes: encoded ASIB response.
     """
-    
+    code = int(re_req.group(1))
+    # Only the request names of STATIC_COMMANDS are cached, as the name is part of the response.
+    # Requests with data go to response_cache, as the data may be options (FIVEMOSTCOM).
+    static = STATIC_COMMANDS.get(code) == re_req.group(2) and re_req.group(3) is None
+    key = re_req.group(1, 2, 3)
+    with cache_lock:
+        # Swap in a reloaded db between requests, so every request is answered from one db.
+        if pending_db is not None:
+            swap_db()
+        db = DB
+        response = static_responses.get(code) if static else response_cache.get(key)
+    if response is not None:
+        return response
+
+    # The response is made outside of the lock, and is only cached if the db has not been swapped meanwhile.
+    response = RES_FORMAT.format(re_req.group(2), REQ_COMMANDS[code](db)).encode() if static else build_response(re_req, db)
+    with cache_lock:
+        if db is DB:
+            if static:
+                static_responses[code] = response
+            else:
+                response_cache.put(key, response)
+    return response
+
+
+def swap_db() -> None:
+    """swap_db replaces DB with the reloaded pending_db and drops every response made from the old db.
+
+    It is called with cache_lock held.
+    """
+    global DB, pending_db
+    DB, pending_db = pending_db, None
+    static_responses.clear()
+    response_cache.clear()
+    compressed_cache.clear()
+    print(f'{GREEN}[NOTICE]: {WHITE}Process {os.getpid()}: the db has been reloaded.')
+
+
+def watch_db(interval: float) -> None:
+    """watch_db checks the db files every interval seconds, and loads a new db when they change.
+
+    It runs in a daemon thread of each serving process. The new db is built while the engine keeps
+    answering from the old one, and is handed to the engine through pending_db.
+    Files that fail to load are reported once and skipped until they change again.
+
+    Args:
+        interval (float): seconds between the checks.
+    """
+    global pending_db
+    failed_version = None
+    while True:
+        time.sleep(interval)
+        current = pending_db or DB
+        version = current.get_db_version()
+        if version == current.version or version == failed_version:
+            continue
+
+        try:
+            pending_db = data(current.lazy_lyrics)
+        except (OSError, ValueError) as err:
+            failed_version = version
+            print(f'{RED}[ERROR]: {WHITE}Reloading the db has failed, keeping the loaded db: {err}')
+
+
+def build_response(re_req: re.Pattern[str], db: data) -> bytes:
+    """build_response runs the command of the ASIB request on the db and creates its response.
+
+    Args:
+        re_req (re.Pattern[str]): the regex match of the clients ASIB request.
+        db (data): the db to answer from.
+
+    Returns:
+        bytes: encoded ASIB response.
+    """
     # Run the command of the clients ASIB request type and request data.
-    db_data = REQ_COMMANDS.get(int(re_req.group(1)))(re_req.group(3))
+    db_data = REQ_COMMANDS.get(int(re_req.group(1)))(db, re_req.group(3))
 
     # If the db_data was received properly set the response accordingly.
     if db_data is not None:
         response = RES_FORMAT.format(re_req.group(2), db_data)
+    elif int(re_req.group(1)) in SUGGEST_COMMANDS and re_req.group(3) is not None:
+        # Otherwise set the response as an error response, suggesting the closest names if there are any.
+        suggestions = SUGGEST_COMMANDS[int(re_req.group(1))](db, re_req.group(3))
+        response = ERR_DB_SUGGEST_FORMAT.format(re_req.group(3), ', '.join(suggestions)) if suggestions else ERR_DB_FORMAT.format(re_req.group(3))
     else:  # Otherwise set the response as an error response.
         response = ERR_DB_FORMAT.format(re_req.group(3))
 
     return response.encode()
 
 
+def heavy_timeout(req: bytes) -> Union[float, None]:
+    """heavy_timeout checks if a request runs on the heavy pool, by the codes of HEAVY_COMMANDS in it.
+
+    Heavy requests whose responses are cached are answered inline.
+
+    Args:
+        req (bytes): the clients request.
+
+    Returns:
+        Union[float, None]: the seconds the request may take, None if it is answered inline.
+    """
+    if heavy_pool is None:
+        return None
+    try:
+        req = req.decode()
+    except UnicodeDecodeError:
+        return None  # handle_request answers it inline with ERR_SYNTAX.
+
+    re_req = REQ_PTRN.search(req)
+    if re_req is None:
+        return None
+    if int(re_req.group(1)) != BATCH_CODE:
+        re_reqs = [re_req]
+    else:
+        sub_reqs = split_batch(req, re_req)
+        if len(sub_reqs) > MAX_BATCH_REQUESTS:
+            return None  # handle_request answers it inline with ERR_BATCH_SIZE.
+        re_reqs = [re_sub_req for re_sub_req in map(REQ_PTRN.search, sub_reqs) if re_sub_req is not None]
+
+    timeouts = [HEAVY_COMMANDS[int(re_req.group(1))] for re_req in re_reqs
+                if int(re_req.group(1)) in HEAVY_COMMANDS and not is_cached(re_req)]
+    return min(sum(timeouts), MAX_HEAVY_TIMEOUT) if timeouts else None
+
+
+def is_cached(re_req: re.Pattern[str]) -> bool:
+    """is_cached checks if the response of an ASIB request is cached, without counting it in the cache counters.
+
+    Args:
+        re_req (re.Pattern[str]): the regex match of the clients ASIB request.
+
+    Returns:
+        bool: whether create_response answers the request from a cache.
+    """
+    if pending_db is not None:
+        return False  # The caches are cleared before the next request.
+    code = int(re_req.group(1))
+    if STATIC_COMMANDS.get(code) == re_req.group(2) and re_req.group(3) is None:
+        return code in static_responses
+    return re_req.group(1, 2, 3) in response_cache
+
+
+def submit_heavy(req: bytes, admin: bool = False, compress: bool = False) -> Union[concurrent.futures.Future, None]:
+    """submit_heavy queues a heavy request on the heavy pool, if it has a free slot.
+
+    Args:
+        req (bytes): the clients request.
+        admin (bool, optional): whether the client has logged on as an admin. Defaults to False.
+        compress (bool, optional): whether the client uses the compression mode. Defaults to False.
+
+    Returns:
+        Union[concurrent.futures.Future, None]: the future of the encoded response, None if HEAVY_QUEUE_LIMIT requests are queued or running.
+    """
+    if not heavy_slots.acquire(blocking=False):
+        return None
+    future = heavy_pool.submit(handle_request, req, admin, compress)
+    # The slot is freed once the request is done, even after its client has stopped waiting for it.
+    future.add_done_callback(lambda _: heavy_slots.release())
+    return future
+
+
+async def handle_async_request(req: bytes, admin: bool = False, compress: bool = False) -> bytes:
+    """handle_async_request creates the response for a request of a client of the asyncio engine.
+
+    Heavy requests are awaited on the heavy pool, so the event loop keeps serving the other clients.
+
+    Args:
+        req (bytes): the clients request.
+        admin (bool, optional): whether the client has logged on as an admin. Defaults to False.
+        compress (bool, optional): whether the client uses the compression mode. Defaults to False.
+
+    Returns:
+        bytes: encoded response, ERR_BUSY or ERR_TIMEOUT if a heavy request could not be answered.
+               Packed by pack_msg in the compression mode.
+    """
+    timeout = heavy_timeout(req)
+    if timeout is None:
+        return handle_request(req, admin, compress)
+
+    future = submit_heavy(req, admin, compress)
+    if future is None:
+        return pack_msg(ERR_BUSY.encode()) if compress else ERR_BUSY.encode()
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        return pack_msg(ERR_TIMEOUT.encode()) if compress else ERR_TIMEOUT.encode()
+
+
+async def handle_async_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """handle_async_client serves one client of the asyncio engine until it disconnects.
+
+    Each read is handled as one message, as in the select engine, and the next read waits
+    until the client has received enough of the previous responses (backpressure).
+
+    Args:
+        reader (asyncio.StreamReader): the clients stream reader.
+        writer (asyncio.StreamWriter): the clients stream writer.
+    """
+    peer = writer.get_extra_info('peername')
+    limits = client_limiter.connect(writer, peer[0] if peer else None, time.monotonic())
+    if limits is None:
+        # The address has opened too many connections, it is refused before any work is done for it.
+        if stats is not None:
+            stats.connections_refused += 1
+        writer.close()
+        return
+
+    print(f'{GREEN}[NOTICE]: {WHITE}User has connected to the server.')
+    writer.transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
+    async_connections[writer] = ACCESS_NONE
+    if stats is not None:
+        stats.connections += 1
+        stats.unapproved += 1
+    framed = False
+    compressed = False
+    try:
+        # Send Welcome message.
+        writer.write(WELCOME_MSG.encode())
+        await writer.drain()
+
+        while True:
+            if framed:
+                # Read the length header and then the whole message.
+                (length,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                if length > MAX_REQ_FRAME_SIZE:
+                    raise ValueError(f'Frame of {length} bytes is larger than {MAX_REQ_FRAME_SIZE} bytes.')
+                req = await reader.readexactly(length)
+            else:
+                req = await reader.read(REQ_RECV_SIZE)
+                if not req:  # The client has closed the connection.
+                    break
+            if stats is not None:
+                stats.bytes_in += len(req) + (FRAME_HEADER.size if framed else 0)
+
+            if not client_limiter.allow(limits, time.monotonic(), request_count(req)):
+                if stats is not None:
+                    stats.rate_limited += 1
+                response = pack_msg(ERR_RATE.encode()) if compressed else ERR_RATE.encode()
+            # Check if the client has not been accepted yet.
+            elif not async_connections[writer]:
+                # Check if the client asks for the framing mode before logging on.
+                version = None if framed else negotiate_version(req)
+                if version is not None:
+                    writer.write(FRAMING_RES.format(version).encode())
+                    await writer.drain()
+                    framed = True
+                    continue
+
+                # Check if the client asks for the compression mode, which needs the framing mode.
+                version = negotiate_compression_version(req) if framed and not compressed else None
+                if version is not None:
+                    writer.write(encode_frame(COMPRESSION_RES.format(version).encode()))
+                    await writer.drain()
+                    compressed = True
+                    continue
+
+                # Check if the client has sent a correct password.
+                async_connections[writer], response = login(limits, req)
+                if compressed:
+                    response = pack_msg(response)
+            else:
+                response = await handle_async_request(req, async_connections[writer] == ACCESS_ADMIN, compressed)
+
+            if framed:
+                response = encode_frame(response)
+            if stats is not None:
+                stats.bytes_out += len(response)
+            writer.write(response)
+            await writer.drain()
+    except asyncio.IncompleteReadError:
+        pass  # The client has closed the connection.
+    except (ConnectionError, UnicodeDecodeError, ValueError) as err:
+        print(f'{RED}[ERROR]: {WHITE}{err}')
+    finally:
+        print(f'{YELLOW}[NOTICE]: {WHITE}User has disconnected from the server.')
+        if stats is not None:
+            stats.connections -= 1
+            stats.unapproved -= not async_connections[writer]
+        client_limiter.disconnect(limits)
+        del async_connections[writer]
+        writer.close()
+
+
+async def expire_async_clients() -> None:
+    """expire_async_clients closes the connections of the asyncio engine that have been idle for too long, until it is cancelled."""
+    while True:
+        next_expiry = client_limiter.next_expiry()
+        await asyncio.sleep(WHEEL_TICK if next_expiry is None else max(next_expiry - time.monotonic(), 0))
+        for writer in client_limiter.expire(time.monotonic()):
+            print(f'{YELLOW}[NOTICE]: {WHITE}User has been idle for too long.')
+            if stats is not None:
+                stats.idle_evictions += 1
+            # Closing the writer ends the read of the clients handle_async_client, which cleans up after it.
+            writer.close()
+
+
+async def async_server(listening_sock: sock.socket) -> None:
+    """async_server runs the asyncio engine of the server until SIGTERM is received.
+
+    On SIGTERM it stops accepting clients and closes every connection after its pending responses are sent.
+
+    Args:
+        listening_sock (sock.socket): the listening socket, may be shared with other worker processes.
+    """
+    stop_event = asyncio.Event()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop_event.set)
+    except NotImplementedError:
+        pass  # Signal handlers are not supported by the event loop on this platform.
+
+    server = await asyncio.start_server(handle_async_client, sock=listening_sock)
+    expire_task = asyncio.ensure_future(expire_async_clients())
+    async with server:
+        await stop_event.wait()
+    expire_task.cancel()
+
+    # Closing a writer sends its pending responses first.
+    writers = list(async_connections)
+    for writer in writers:
+        writer.close()
+    if writers:
+        await asyncio.wait([asyncio.ensure_future(writer.wait_closed()) for writer in writers], timeout=CLOSE_TIMEOUT)
+
+
+def parse_args() -> argparse.Namespace:
+    """parse_args parses the servers command line arguments.
+
+    Returns:
+        argparse.Namespace: the parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description='PinkFloyd Archive Server.')
+    parser.add_argument('--engine', choices=ENGINES, default='select', help='the engine that serves the clients (default: select).')
+    parser.add_argument('--port', type=int, default=LISTEN_PORT, help=f'the port to listen on (default: {LISTEN_PORT}).')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='amount of worker processes sharing the listening socket, 0 serves in this process (default: 0).')
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_INTERVAL,
+                        help=f'seconds between the checks of the db files for changes, 0 disables reloading (default: {RELOAD_INTERVAL}).')
+    parser.add_argument('--metrics', action='store_true',
+                        help='count requests, bytes and latencies, admins can query them with the STATS command.')
+    parser.add_argument('--metrics-interval', type=float, default=0,
+                        help=f'also print the metrics every this many seconds, implies --metrics (e.g. {METRICS_INTERVAL}).')
+    parser.add_argument('--heavy-workers', type=int, default=HEAVY_WORKERS,
+                        help=f'threads of each serving process that answer the heavy commands, 0 answers them inline (default: {HEAVY_WORKERS}).')
+    parser.add_argument('--lazy-lyrics', action='store_true',
+                        help='keep the lyrics in the memory mapped lyrics file and read them when needed, instead of loading them.')
+    parser.add_argument('--client-rate', type=float, default=CLIENT_RATE,
+                        help='requests per second of each connection, more are answered with ERR_RATE, 0 for no limit (default: 0).')
+    parser.add_argument('--address-rate', type=float, default=ADDRESS_RATE,
+                        help='requests and connections per second of each client address, 0 for no limit (default: 0).')
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT,
+                        help=f'seconds a client may be idle before it is disconnected, up to {LOGIN_TIMEOUT} before logging on, '
+                             f'0 to never disconnect idle clients (default: {IDLE_TIMEOUT}).')
+    parser.add_argument('--login-backoff', type=float, default=LOGIN_BACKOFF,
+                        help=f'most seconds an address waits to log on after {LOGIN_FREE_FAILURES} failed logins in a row, the wait starts at '
+                             f'{LOGIN_BACKOFF_BASE} and doubles after each further failure, 0 to never delay logins (default: {LOGIN_BACKOFF}).')
+    args = parser.parse_args()
+
+    if args.reload_interval < 0:
+        parser.error('--reload-interval must not be negative.')
+    if args.metrics_interval < 0:
+        parser.error('--metrics-interval must not be negative.')
+    if args.workers < 0:
+        parser.error('--workers must not be negative.')
+    if args.heavy_workers < 0:
+        parser.error('--heavy-workers must not be negative.')
+    if args.client_rate < 0 or args.address_rate < 0:
+        parser.error('--client-rate and --address-rate must not be negative.')
+    if args.idle_timeout < 0:
+        parser.error('--idle-timeout must not be negative.')
+    if args.login_backoff < 0:
+        parser.error('--login-backoff must not be negative.')
+    if args.workers and not hasattr(os, 'fork'):
+        parser.error('--workers needs os.fork, which is not available on this platform.')
+    return args
+
+
+def create_listening_sock(port: int, backlog: int) -> sock.socket:
+    """create_listening_sock creates the non-blocking listening socket of the server.
+
+    Args:
+        port (int): the port to listen on.
+        backlog (int): the listen backlog.
+
+    Returns:
+        sock.socket: the listening socket.
+    """
+    listening_sock = sock.socket(sock.AF_INET, sock.SOCK_STREAM)
+    listening_sock.setsockopt(sock.SOL_SOCKET, sock.SO_REUSEADDR, 1)
+    listening_sock.setblocking(0)
+    listening_sock.bind(('', port))
+    listening_sock.listen(backlog)
+    return listening_sock
+
+
+def request_stop(signum: int, frame) -> None:
+    """request_stop is the SIGTERM handler of the select engine, it asks the engine to stop."""
+    global stop_requested
+    stop_requested = True
+
+
+def cache_stats() -> dict:
+    """cache_stats gets the counters of the response caches.
+
+    Returns:
+        dict: the counters of response_cache, the amount of static responses and the counters of compressed_cache.
+    """
+    return {**response_cache.stats(), 'static_entries': len(static_responses),
+            **{f'compressed_{name}': value for name, value in compressed_cache.stats().items()}}
+
+
+def instrument() -> None:
+    """instrument enables the metrics by wrapping the hot paths of the server with timers.
+
+    The functions are only wrapped when the metrics are enabled, so a server without them pays nothing.
+    Each request is timed by its code as a whole ('response') and in its db command ('command'),
+    and passwords checks are timed as 'login'.
+    """
+    global stats, create_response, check_password
+    stats = metrics()
+
+    for code, command in REQ_COMMANDS.items():
+        REQ_COMMANDS[code] = stats.timed('command', code, command)
+
+    timed_create_response = create_response
+    def create_response(re_req: re.Pattern[str]) -> bytes:
+        start = time.perf_counter()
+        response = timed_create_response(re_req)
+        stats.observe('response', int(re_req.group(1)), time.perf_counter() - start)
+        stats.count_request(int(re_req.group(1)), response)
+        return response
+
+    timed_check_password = stats.timed('login', None, check_password)
+    def check_password(client_pass: bytes) -> int:
+        access = timed_check_password(client_pass)
+        if access:
+            stats.logins += 1
+        else:
+            stats.login_failures += 1
+        return access
+
+
+def dump_metrics(interval: float) -> None:
+    """dump_metrics prints the metrics every interval seconds, it runs in a daemon thread of each serving process.
+
+    Args:
+        interval (float): seconds between the dumps.
+    """
+    while True:
+        time.sleep(interval)
+        print(f'{GREEN}[METRICS]: {WHITE}Process {os.getpid()}:\n{stats.dump(cache_stats())}')
+
+
+def run_engine(listening_sock: sock.socket, engine: str, reload_interval: float = 0, metrics_interval: float = 0,
+               heavy_workers: int = 0) -> None:
+    """run_engine serves clients on the listening socket with an engine until it is stopped.
+
+    Args:
+        listening_sock (sock.socket): the listening socket.
+        engine (str): one of ENGINES.
+        reload_interval (float, optional): seconds between the checks of the db files for changes, 0 for none. Defaults to 0.
+        metrics_interval (float, optional): seconds between the metrics dumps, 0 for none. Defaults to 0.
+        heavy_workers (int, optional): threads of the heavy pool, 0 answers the heavy commands inline. Defaults to 0.
+    """
+    global heavy_pool
+    if heavy_workers:
+        # The pool is started in each serving process, as threads don't survive a fork.
+        heavy_pool = concurrent.futures.ThreadPoolExecutor(heavy_workers, thread_name_prefix='heavy')
+        sys.setswitchinterval(HEAVY_SWITCH_INTERVAL)
+    if reload_interval:
+        threading.Thread(target=watch_db, args=(reload_interval,), daemon=True).start()
+    if metrics_interval:
+        threading.Thread(target=dump_metrics, args=(metrics_interval,), daemon=True).start()
+
+    try:
+        if engine == 'asyncio':
+            try:
+                asyncio.run(async_server(listening_sock))
+            except KeyboardInterrupt:
+                pass
+        else:
+            select_server(listening_sock)
+    finally:
+        if heavy_pool is not None:
+            heavy_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_worker(listening_sock: sock.socket, engine: str, reload_interval: float, metrics_interval: float, heavy_workers: int) -> None:
+    """run_worker runs in a forked worker process, serving clients until SIGTERM and then exiting.
+
+    Args:
+        listening_sock (sock.socket): the listening socket shared with the other workers.
+        engine (str): one of ENGINES.
+        reload_interval (float): seconds between the checks of the db files for changes, 0 for none.
+        metrics_interval (float): seconds between the metrics dumps, 0 for none.
+        heavy_workers (int): threads of the heavy pool, 0 answers the heavy commands inline.
+    """
+    # Ctrl+C reaches the whole process group, the supervisor handles it and stops the workers with SIGTERM.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    exit_code = 0
+    try:
+        run_engine(listening_sock, engine, reload_interval, metrics_interval, heavy_workers)
+    except BaseException as err:
+        print(f'{RED}[ERROR]: {WHITE}Worker {os.getpid()}: {err}')
+        exit_code = 1
+    finally:
+        # Never return into the supervisor's code.
+        os._exit(exit_code)
+
+
+def supervise(listening_sock: sock.socket, engine: str, worker_count: int, reload_interval: float = 0, metrics_interval: float = 0,
+              heavy_workers: int = 0) -> None:
+    """supervise forks the worker processes that share the listening socket and restarts any worker that exits.
+
+    SIGTERM or SIGINT stops the workers gracefully with SIGTERM and waits for them.
+    The db is loaded before forking, so the workers share its memory until they change it.
+    Each worker keeps its own metrics and reloads the db by itself.
+
+    Args:
+        listening_sock (sock.socket): the listening socket.
+        engine (str): the engine of the workers, one of ENGINES.
+        worker_count (int): amount of worker processes.
+        reload_interval (float, optional): seconds between the checks of the db files for changes, 0 for none. Defaults to 0.
+        metrics_interval (float, optional): seconds between the metrics dumps of each worker, 0 for none. Defaults to 0.
+        heavy_workers (int, optional): threads of the heavy pool of each worker, 0 answers the heavy commands inline. Defaults to 0.
+    """
+    workers = {} # Start time of each worker by its pid.
+    stopping = False
+
+    def stop(signum: int, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+
+    def start_worker() -> None:
+        pid = os.fork()
+        if pid == 0:
+            run_worker(listening_sock, engine, reload_interval, metrics_interval, heavy_workers)
+        workers[pid] = time.monotonic()
+
+    # Keep the loaded db out of the garbage collector, so collections don't copy its pages in each worker.
+    gc.freeze()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(worker_count):
+        start_worker()
+    print(f'{GREEN}[NOTICE]: {WHITE}Started {worker_count} {engine} workers.')
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+
+        print(f'{RED}[ERROR]: {WHITE}Worker {pid} has exited with status {os.waitstatus_to_exitcode(status)}, restarting it.')
+        if time.monotonic() - started < WORKER_RESTART_DELAY:
+            time.sleep(WORKER_RESTART_DELAY)
+        if not stopping:
+            start_worker()
+    print(f'{YELLOW}[NOTICE]: {WHITE}All workers have stopped.')
+
+
 def main():
-    with sock.socket(sock.AF_INET, sock.SOCK_STREAM) as listening_sock:
-        listening_sock.setblocking(0)
-        listening_sock.bind(('', LISTEN_PORT))
-        listening_sock.listen(MAX_CLIENTS)
-        connections_list = [listening_sock]
+    global DB, client_limiter
+    args = parse_args()
+    DB = data(args.lazy_lyrics)
+    # Made before forking, each worker keeps its own copy.
+    client_limiter = limiter(args.client_rate, args.address_rate, args.idle_timeout, min(LOGIN_TIMEOUT, args.idle_timeout), time.monotonic(),
+                             args.login_backoff)
+
+    # Warn about song names that can only be resolved to one of their albums.
+    for song, albums in DB.duplicate_songs.items():
+        print(f'{YELLOW}[WARNING]: {WHITE}"{song}" appears on {", ".join(albums)}, resolving to {albums[0]}.')
+
+    if args.metrics or args.metrics_interval:
+        instrument()
+
+    with create_listening_sock(args.port, LISTEN_BACKLOG) as listening_sock:
+        if args.workers:
+            supervise(listening_sock, args.engine, args.workers, args.reload_interval, args.metrics_interval, args.heavy_workers)
+        else:
+            run_engine(listening_sock, args.engine, args.reload_interval, args.metrics_interval, args.heavy_workers)
+
+
+def queue_send(conn: connection, msg: bytes) -> None:
+    """queue_send adds a message to the send buffer of a client of the select engine and sends as much of it as possible.
+
+    Args:
+        conn (connection): the clients connection, its socket is non-blocking.
+        msg (bytes): the message.
+    """
+    if stats is not None:
+        stats.bytes_out += len(msg)
+    conn.send_buffer += msg
+    flush_send(conn)
+
+
+def flush_send(conn: connection) -> None:
+    """flush_send sends as much of the send buffer of a client as the socket takes without blocking.
+
+    Args:
+        conn (connection): the clients connection, its socket is non-blocking.
+
+    Raises:
+        sock.error: error is raised whenever the connection has ended.
+    """
+    try:
+        while conn.send_buffer:
+            sent = conn.sock.send(conn.send_buffer)
+            del conn.send_buffer[:sent]
+    except BlockingIOError:
+        pass  # The clients receive window is full, the rest is sent when the socket is writable.
+
+
+def update_events(selector: selectors.BaseSelector, conn: connection) -> None:
+    """update_events registers the socket of a client for the events it waits for.
+
+    A client is written to while its send buffer is not empty, and is read from while the send buffer
+    holds up to WRITE_HIGH_WATER bytes, so a client that doesn't receive its responses stops being served.
+    A client is not read from while its heavy request runs either, its next messages wait for it.
+    A client that waits for no events is unregistered, as only epoll takes a socket registered for none,
+    and is registered again once it waits for some.
+
+    Args:
+        selector (selectors.BaseSelector): the selector of the select engine.
+        conn (connection): the clients connection.
+    """
+    events = (selectors.EVENT_READ if conn.job is None and len(conn.send_buffer) <= WRITE_HIGH_WATER else 0) | \
+             (selectors.EVENT_WRITE if conn.send_buffer else 0)
+    if events != conn.events:
+        if not events:
+            selector.unregister(conn.sock)
+        elif not conn.events:
+            selector.register(conn.sock, events, conn)
+        else:
+            selector.modify(conn.sock, events, conn)
+        conn.events = events
+
+
+def disconnect(selector: selectors.BaseSelector, conn: connection) -> None:
+    """disconnect closes the connection with a client of the select engine.
+
+    Args:
+        selector (selectors.BaseSelector): the selector of the select engine.
+        conn (connection): the clients connection.
+    """
+    print(f'{YELLOW}[NOTICE]: {WHITE}User has disconnected from the server.')
+    if conn.job is not None:
+        # A heavy request that is still queued is dropped, a running one is left to finish unanswered.
+        conn.job.cancel()
+        conn.job = None
+    if conn.events:
+        selector.unregister(conn.sock)
+    conn.sock.close()
+    client_limiter.disconnect(conn.limits)
+    if stats is not None:
+        stats.connections -= 1
+        stats.unapproved -= not conn.access
+
+
+def accept_clients(selector: selectors.BaseSelector, listening_sock: sock.socket) -> None:
+    """accept_clients accepts the clients waiting on the listening socket, up to ACCEPT_BATCH, and welcomes them.
+
+    Args:
+        selector (selectors.BaseSelector): the selector of the select engine.
+        listening_sock (sock.socket): the listening socket.
+    """
+    for _ in range(ACCEPT_BATCH):
         try:
-            while True:
-                try:
-                    read_sockets, write_sockets, error_sockets = select.select(connections_list, [], [])
-                    for read_sock in read_sockets:  # Move over each socket.
-                        if read_sock == listening_sock:
-                            client_sock, client_addr = listening_sock.accept()
-                            print(f'{GREEN}[NOTICE]: {WHITE}User has connected to the server.')
-                            # Send Welcome message.
-                            client_sock.sendall(WELCOME_MSG.encode())
-                            connections_list.append(client_sock)
-                            unapproved_list.append(client_sock)
-                        else:
-                            try:
-                                req = read_sock.recv(1024)
-
-                                # Check if the client has not been accepted yet.
-                                if read_sock in unapproved_list:
-                                    # Check if the client has sent a correct password.
-                                    login(read_sock, req)
-                                    continue
-
-                                # Check if the message received fits the requests of ASIB protocol.
-                                re_req = REQ_PTRN.search(req.decode())
-
-                                if re_req is None:  # If the message received does not match.
-                                    read_sock.sendall(ERR_SYNTAX.encode())
-                                    continue
-
-                                if int(re_req.group(1)) is EXIT_CODE:
-                                    read_sock.sendall(GOODBYE_MSG.encode())
-                                    continue
-
-                                # If all is well, send the client its requested data.
-                                read_sock.sendall(create_response(re_req))
-                            except sock.error:
-                                print(f'{YELLOW}[NOTICE]: {WHITE}User has disconnected from the server.')
-                                # End the socket as the user had disconnected.
-                                read_sock.close()
-                                connections_list.remove(read_sock)
-
-                except ConnectionResetError or ConnectionAbortedError or ConnectionRefusedError as err:
-                    print(f'{RED}[ERROR]: {WHITE}{err}')
+            client_sock, client_addr = listening_sock.accept()
+        except BlockingIOError:
+            return  # No more clients are waiting, or another worker sharing the listening socket has accepted them.
+
+        conn = connection(client_sock)
+        conn.limits = client_limiter.connect(conn, client_addr[0] if isinstance(client_addr, tuple) else None, time.monotonic())
+        if conn.limits is None:
+            # The address has opened too many connections, it is refused before any work is done for it.
+            if stats is not None:
+                stats.connections_refused += 1
+            client_sock.close()
+            continue
+
+        print(f'{GREEN}[NOTICE]: {WHITE}User has connected to the server.')
+        client_sock.setblocking(0)
+        selector.register(client_sock, conn.events, conn)
+        if stats is not None:
+            stats.connections += 1
+            stats.unapproved += 1
+        try:
+            # Send Welcome message.
+            queue_send(conn, WELCOME_MSG.encode())
+            update_events(selector, conn)
+        except sock.error:
+            disconnect(selector, conn)
+
+
+def handle_msgs(conn: connection, req: bytes) -> None:
+    """handle_msgs handles the bytes received from a client of the select engine and queues the responses.
+
+    Args:
+        conn (connection): the clients connection.
+        req (bytes): the received bytes.
+
+    Raises:
+        ValueError: error is raised whenever a frame is larger than MAX_REQ_FRAME_SIZE.
+    """
+    # Split the received bytes into whole messages if the client uses the framing mode.
+    conn.waiting.extend(conn.reader.feed(req) if conn.reader is not None else [req])
+    serve_waiting(conn)
+
+
+def serve_waiting(conn: connection) -> None:
+    """serve_waiting answers the waiting messages of a client of the select engine in order.
+
+    A heavy request is started on the heavy pool, and the messages after it wait until it is answered,
+    so the responses of a client are always sent in the order of its requests.
+
+    Args:
+        conn (connection): the clients connection.
+    """
+    global job_sequence
+    while conn.waiting and conn.job is None:
+        msg = conn.waiting.popleft()
+        if not client_limiter.allow(conn.limits, time.monotonic(), request_count(msg)):
+            if stats is not None:
+                stats.rate_limited += 1
+            response = pack_msg(ERR_RATE.encode()) if conn.compress else ERR_RATE.encode()
+        # Check if the client has not been accepted yet.
+        elif not conn.access:
+            # Check if the client asks for the framing mode before logging on.
+            version = None if conn.reader is not None else negotiate_version(msg)
+            if version is not None:
+                queue_send(conn, FRAMING_RES.format(version).encode())
+                conn.reader = frame_reader(MAX_REQ_FRAME_SIZE)
+                continue
+
+            # Check if the client asks for the compression mode, which needs the framing mode.
+            version = negotiate_compression_version(msg) if conn.reader is not None and not conn.compress else None
+            if version is not None:
+                queue_send(conn, encode_frame(COMPRESSION_RES.format(version).encode()))
+                conn.compress = True
+                continue
+
+            # Check if the client has sent a correct password.
+            conn.access, response = login(conn.limits, msg)
+            if conn.compress:
+                response = pack_msg(response)
+        else:
+            timeout = heavy_timeout(msg)
+            future = submit_heavy(msg, conn.access == ACCESS_ADMIN, conn.compress) if timeout is not None else None
+            if future is not None:
+                # The request is answered by answer_jobs once it finishes.
+                conn.job = future
+                job_sequence += 1
+                heapq.heappush(job_deadlines, (time.monotonic() + timeout, job_sequence, conn, future))
+                future.add_done_callback(lambda future, conn=conn: notify_finished(conn, future))
+                continue
+            if timeout is None:
+                response = handle_request(msg, conn.access == ACCESS_ADMIN, conn.compress)
+            else:
+                response = pack_msg(ERR_BUSY.encode()) if conn.compress else ERR_BUSY.encode()
+
+        queue_send(conn, encode_frame(response) if conn.reader is not None else response)
+
+
+def notify_finished(conn: connection, future: concurrent.futures.Future) -> None:
+    """notify_finished hands a finished heavy request to the select engine, it runs on the thread that finished it.
+
+    Args:
+        conn (connection): the connection of the client that sent the request.
+        future (concurrent.futures.Future): the future of the request.
+    """
+    finished_jobs.append((conn, future))
+    try:
+        select_wakeup_sock.send(b'\0')
+    except (BlockingIOError, AttributeError):
+        pass  # The loop will wake up anyway, or has stopped.
+
+
+def answer_job(selector: selectors.BaseSelector, conn: connection, response: Union[bytes, None] = None) -> None:
+    """answer_job sends the response of the heavy request of a client of the select engine, and serves its waiting messages.
+
+    Args:
+        selector (selectors.BaseSelector): the selector of the select engine.
+        conn (connection): the clients connection.
+        response (Union[bytes, None], optional): the response to send instead of the result of the request. Defaults to None.
+    """
+    try:
+        if response is None:
+            try:
+                response = conn.job.result()
+            except Exception as err:
+                print(f'{RED}[ERROR]: {WHITE}Heavy request has failed: {err!r}')
+                response = pack_msg(ERR_INTERNAL.encode()) if conn.compress else ERR_INTERNAL.encode()
+        conn.job = None
+        queue_send(conn, encode_frame(response) if conn.reader is not None else response)
+        serve_waiting(conn)
+        update_events(selector, conn)
+    except (sock.error, ValueError):
+        # End the socket as the user had disconnected.
+        disconnect(selector, conn)
+    except Exception as err:
+        # Only this client is disconnected, the engine keeps serving the others.
+        print(f'{RED}[ERROR]: {WHITE}{err!r}')
+        disconnect(selector, conn)
+
+
+def answer_jobs(selector: selectors.BaseSelector) -> None:
+    """answer_jobs answers the finished heavy requests, and the ones whose timeout has passed with ERR_TIMEOUT.
+
+    Args:
+        selector (selectors.BaseSelector): the selector of the select engine.
+    """
+    while finished_jobs:
+        conn, future = finished_jobs.popleft()
+        # The client may have disconnected or been answered with ERR_TIMEOUT meanwhile.
+        if conn.job is future:
+            answer_job(selector, conn)
+
+    now = time.monotonic()
+    while job_deadlines and job_deadlines[0][0] <= now:
+        _, _, conn, future = heapq.heappop(job_deadlines)
+        if conn.job is future:
+            future.cancel()
+            answer_job(selector, conn, pack_msg(ERR_TIMEOUT.encode()) if conn.compress else ERR_TIMEOUT.encode())
+
+
+def select_server(listening_sock: sock.socket):
+    """select_server runs the select engine, serving all clients in one selectors loop (epoll on Linux) until SIGTERM is received.
+
+    Args:
+        listening_sock (sock.socket): the listening socket, may be shared with other worker processes.
+    """
+    global select_wakeup_sock
+    # Any signal writes to wakeup_sock, so the selector returns and a stop requested by SIGTERM is noticed.
+    # The heavy pool writes to it too when a heavy request finishes.
+    stop_sock, wakeup_sock = sock.socketpair()
+    wakeup_sock.setblocking(0)
+    select_wakeup_sock = wakeup_sock
+    signal.set_wakeup_fd(wakeup_sock.fileno())
+    signal.signal(signal.SIGTERM, request_stop)
+    selector = selectors.DefaultSelector()
+    with selector, stop_sock, wakeup_sock:
+        # The listening socket and stop_sock are registered without a connection.
+        selector.register(listening_sock, selectors.EVENT_READ)
+        selector.register(stop_sock, selectors.EVENT_READ)
+        try:
+            while not stop_requested:
+                # Wake up for the earliest timeout of the heavy requests, or the next tick of the idle clients.
+                deadlines = [deadline for deadline in (job_deadlines[0][0] if job_deadlines else None, client_limiter.next_expiry())
+                             if deadline is not None]
+                timeout = max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+                for key, events in selector.select(timeout):
+                    conn = key.data
+                    if key.fileobj == stop_sock:
+                        stop_sock.recv(REQ_RECV_SIZE)
+                        continue
+                    if key.fileobj == listening_sock:
+                        accept_clients(selector, listening_sock)
+                        continue
+
+                    try:
+                        if events & selectors.EVENT_WRITE:
+                            flush_send(conn)
+                        if events & selectors.EVENT_READ:
+                            req = conn.sock.recv(REQ_RECV_SIZE)
+                            if not req:
+                                raise ConnectionAbortedError('User has closed the connection.')
+                            if stats is not None:
+                                stats.bytes_in += len(req)
+                            handle_msgs(conn, req)
+                        update_events(selector, conn)
+                    except BlockingIOError:
+                        pass  # Nothing to read after all.
+                    except (sock.error, ValueError):
+                        # End the socket as the user had disconnected.
+                        disconnect(selector, conn)
+                    except Exception as err:
+                        # Only this client is disconnected, the engine keeps serving the others.
+                        print(f'{RED}[ERROR]: {WHITE}{err!r}')
+                        disconnect(selector, conn)
+                answer_jobs(selector)
+                for conn in client_limiter.expire(time.monotonic()):
+                    print(f'{YELLOW}[NOTICE]: {WHITE}User has been idle for too long.')
+                    if stats is not None:
+                        stats.idle_evictions += 1
+                    disconnect(selector, conn)
         except Exception as err:
             print(f'{RED}[ERROR]: {WHITE}{err}')
+        finally:
+            signal.set_wakeup_fd(-1)
+            select_wakeup_sock = None
+            # The clients whose heavy request runs are not registered, but each of their requests has a deadline.
+            conns = {key.data for key in selector.get_map().values() if key.data is not None}
+            conns.update(conn for _, _, conn, future in job_deadlines if conn.job is future)
+            # Wait for the heavy requests that are running, the messages that wait behind them are left unanswered.
+            jobs = {conn.job: conn for conn in conns if conn.job is not None}
+            done, _ = concurrent.futures.wait(jobs, timeout=CLOSE_TIMEOUT)
+            for job in done:
+                if job.exception() is None:
+                    jobs[job].send_buffer += encode_frame(job.result()) if jobs[job].reader is not None else job.result()
+            # The requests that were received have been answered, send the pending responses and end the connections.
+            for conn in conns:
+                try:
+                    conn.sock.settimeout(CLOSE_TIMEOUT)
+                    conn.sock.sendall(conn.send_buffer)
+                except sock.error:
+                    pass
+                conn.sock.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,129 @@
+"""Tests of the db, run from the repository root: `python -m pytest`."""
+import os
+import shutil
+import pytest
+from data import data, parse_db, stored_song_record, DB_SRC_PATH
+
+# The bundled catalogue, copied into a temporary directory so its pink_db.json and snapshot are not touched.
+SRC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), DB_SRC_PATH)
+# Keywords of the name and lyrics queries, including ones that match everything, nothing and across words.
+KEYWORDS = ('the', 'love', 'ar', ' ', 'sky ', 'xyzzy', 'the wall', 'a\nb', "don't", 'MONEY')
+# Options of the word count query, a malformed one among them.
+COMMON_OPTIONS = (None, 'k=5', 'stopwords=1', 'k=10;stopwords=1', 'k=0', 'k=x')
+# Duration ranges, a malformed one among them.
+DURATION_RANGES = (None, '00:00-02:00', '03:00-05:00', '05:00-99:00', '05:00-03:00', 'bad')
+# Counts of the longest and shortest songs, malformed ones among them.
+COUNTS = (None, '1', '30', '1000', '0', '-1', 'x', '\u00b2')
+
+
+def parse(tmp_path, text: str) -> tuple:
+    """parse parses a db file of text, returning its albums by name and the errors."""
+    filepath = tmp_path / 'Pink_Floyd_DB.txt'
+    filepath.write_text(text)
+    errors = []
+    albums = {album: album_data for _, album, album_data in parse_db(str(filepath), errors)}
+    return albums, errors
+
+
+def test_parse_db_lyrics_with_prefixes(tmp_path):
+    albums, errors = parse(tmp_path, '#Album A::1970\n'
+                                     '*Song1::W::03:00::first\n'
+                                     '*laughs*\n'
+                                     '#1 in the charts\n'
+                                     'a line with :: in it\n'
+                                     '*Song2::W::04:00::hello\n')
+    assert errors == []
+    assert albums['Album A']['Songs']['Song1']['Lyrics'] == ['first', '*laughs*', '#1 in the charts', 'a line with :: in it', '']
+    assert albums['Album A']['Songs']['Song2']['Lyrics'] == ['hello', '']
+
+
+def test_parse_db_malformed_album_after_song(tmp_path):
+    albums, errors = parse(tmp_path, '#Album A::1970\n'
+                                     '*Song1::W::03:00::first\n'
+                                     '#Album B:1971\n'
+                                     '*Song2::W::04:00::hello\n')
+    assert errors == ["line 3: album should be '#<name>::<year>'."]
+    assert albums['Album A']['Songs']['Song1']['Lyrics'] == ['first', '']
+    assert list(albums['Album A']['Songs']) == ['Song1']
+
+
+def test_parse_db_malformed_song_after_song(tmp_path):
+    albums, errors = parse(tmp_path, '#Album A::1970\n'
+                                     '*Song1::W::03:00::first\n'
+                                     '*Song2::W::4m::bad\n'
+                                     'more lyrics\n'
+                                     '*Song3::W::04:00::hello\n')
+    assert errors == ["line 3: song should be '*<name>::<writers>::<minutes>:<seconds>::<lyrics>'."]
+    assert albums['Album A']['Songs']['Song1']['Lyrics'] == ['first', '']
+    assert list(albums['Album A']['Songs']) == ['Song1', 'Song3']
+
+
+def test_parse_db_reports_each_malformed_record(tmp_path):
+    _, errors = parse(tmp_path, '#Album A::1970\n'
+                                '*Song1::W::03:00::first\n'
+                                '#Album B:1971\n'
+                                '*Song2::W::04:00::hello\n'
+                                '#Album C::1972\n'
+                                '*Song3::W::4m::bad\n')
+    assert errors == ["line 3: album should be '#<name>::<year>'.",
+                      "line 6: song should be '*<name>::<writers>::<minutes>:<seconds>::<lyrics>'."]
+
+
+@pytest.fixture
+def db_dir(tmp_path, monkeypatch):
+    """db_dir runs a test in a temporary directory that holds a copy of the bundled catalogue."""
+    shutil.copy(SRC_PATH, tmp_path / DB_SRC_PATH)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def query_all(db: data) -> list:
+    """query_all gets the results of every query of the db, and the lyrics of every song."""
+    albums = list(db.pink_floyd_db)
+    songs = list(db.song_index)
+    results = [db.get_albms(), db.albm_by_dur(), db.total_dur(), sorted(db.duplicate_songs)]
+    results += [db.fifty_most_common(options) for options in COMMON_OPTIONS]
+    results += [(db.get_albm_songs(album), db.get_albm_songs(album.upper()), db.fifty_most_common(f'album={album};k=5'))
+                for album in albums]
+    results += [(db.get_sng_dur(song), db.get_song_lyr(song), db.find_songs_albm(song), db.get_sng_dur(song.lower()),
+                 db.fifty_most_common(f'song={song};k=5')) for song in songs]
+    results += [(db.get_albm_songs('nope'), db.get_sng_dur('nope'), db.get_song_lyr(None), db.find_songs_albm('nope'))]
+    results += [(db.songs_by_name(keyword), db.songs_by_lyr(keyword), db.suggest_songs(keyword), db.suggest_albums(keyword))
+                for keyword in KEYWORDS]
+    results += [(db.songs_by_name(None), db.songs_by_lyr(None))]
+    results += [db.songs_by_dur(dur_range) for dur_range in DURATION_RANGES]
+    results += [(db.longest_songs(count), db.shortest_songs(count)) for count in COUNTS]
+    results += [(song.name, song.album, song.writers, song.duration, song.lyrics, song.lines(), song.lower_lyrics())
+                for album in db.pink_floyd_db.values() for song in album.songs]
+    return results
+
+
+def load_from_json(monkeypatch) -> data:
+    """load_from_json loads the db from pink_db.json and builds its indexes, without reading nor writing the snapshot."""
+    with monkeypatch.context() as patch:
+        patch.setattr(data, 'load_snapshot', lambda self, *args: False)
+        patch.setattr(data, 'save_snapshot', lambda self, *args: None)
+        return data()
+
+
+@pytest.mark.parametrize('lazy_lyrics', [False, True])
+def test_snapshot_matches_json(db_dir, monkeypatch, lazy_lyrics):
+    expected = query_all(load_from_json(monkeypatch))
+    assert not os.path.exists('pink_db.snapshot')
+
+    data()  # Loads from pink_db.json and saves the snapshot.
+    db = data(lazy_lyrics)
+    assert db.load_snapshot()
+    assert isinstance(db.song_index['Money'], stored_song_record) == lazy_lyrics
+    assert query_all(db) == expected
+
+
+def test_snapshot_of_changed_json_is_not_loaded(db_dir, monkeypatch):
+    data()
+    with open(DB_SRC_PATH, 'a') as src:
+        src.write('\n*Extra Song::Roger Waters::01:00::extra lyrics\n')
+    os.utime(DB_SRC_PATH, ns=(os.stat('pink_db.json').st_mtime_ns + 10 ** 9,) * 2)
+
+    db = data()
+    assert db.get_sng_dur('Extra Song') == '01:00'
+    assert query_all(db) == query_all(load_from_json(monkeypatch))